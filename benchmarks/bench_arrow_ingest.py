@@ -0,0 +1,106 @@
+"""
+Benchmark: Arrow / Parquet ingest vs JSON /batch-predict
+
+Measures the time per row to turn a batch into model input (JSON decode +
+validation + encode_requests vs Arrow read + encode_arrow), then the
+end-to-end time per row through the ASGI app in-process for
+/batch-predict (JSON), and /batch-predict/arrow with Arrow IPC and
+Parquet bodies.
+
+Usage:
+    python benchmarks/bench_arrow_ingest.py [--batch-size 5000] [--repeat 5]
+
+Requires pyarrow (pip install pyarrow).
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi.testclient import TestClient
+
+import main
+from test_api import LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT
+
+
+def bench(label: str, func, repeat: int, rows: int) -> float:
+    """Time func and print microseconds per row"""
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+    per_row_us = seconds / rows * 1e6
+    print(f"  {label:<44} {per_row_us:>10.2f} µs/row")
+    return per_row_us
+
+
+def arrow_stream(table: pa.Table) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def parquet_file(table: pa.Table) -> bytes:
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    return buffer.getvalue()
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=5000, help='Patients per batch')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing runs (best is reported)')
+    args = parser.parse_args()
+
+    patients = [LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT]
+    records = [patients[i % len(patients)] for i in range(args.batch_size)]
+    json_body = json.dumps(records).encode()
+    table = pa.Table.from_pylist(records)
+    arrow_body = arrow_stream(table)
+    parquet_body = parquet_file(table)
+    n = args.batch_size
+
+    with TestClient(main.app) as client:
+        if main.model_registry.active is None:
+            print("✗ Model could not be loaded")
+            return 1
+        plan = main.feature_plan
+        schema = main.model_registry.active.request_schema
+
+        print("\n" + "=" * 80)
+        print(f"  Arrow / Parquet ingest vs JSON ({n} rows per batch)")
+        print("=" * 80)
+        print(f"\n  Body size: JSON {len(json_body) / 1024:.0f} KiB  |  Arrow {len(arrow_body) / 1024:.0f} KiB  |  "
+              f"Parquet {len(parquet_body) / 1024:.0f} KiB")
+
+        print("\nBody -> model input:")
+        bench("JSON: decode + validate + encode_requests", lambda: main.build_model_input(
+            plan, main.encode_requests(plan, schema.batch_adapter.validate_python(json.loads(json_body)))),
+            args.repeat, n)
+        bench("Arrow IPC: read + encode_arrow", lambda: main.build_model_input(
+            plan, main.encode_arrow(plan, pa.ipc.open_stream(arrow_body).read_all())), args.repeat, n)
+        bench("Parquet: read + encode_arrow", lambda: main.build_model_input(
+            plan, main.encode_arrow(plan, pq.read_table(pa.BufferReader(parquet_body)))), args.repeat, n)
+
+        print("\nEnd to end (in-process ASGI client):")
+        json_headers = {"content-type": "application/json"}
+        bench("/batch-predict (JSON)", lambda: client.post(
+            "/batch-predict", content=json_body, headers=json_headers), args.repeat, n)
+        bench("/batch-predict/arrow (Arrow IPC)", lambda: client.post(
+            "/batch-predict/arrow", content=arrow_body,
+            headers={"content-type": "application/vnd.apache.arrow.stream"}), args.repeat, n)
+        bench("/batch-predict/arrow (Parquet)", lambda: client.post(
+            "/batch-predict/arrow", content=parquet_body,
+            headers={"content-type": "application/vnd.apache.parquet"}), args.repeat, n)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main_bench())
@@ -0,0 +1,78 @@
+"""
+Micro-benchmark: compiled feature plan vs prepare_features
+
+Compares per-request preprocessing cost of the legacy pandas-based
+prepare_features() against encode_requests() with the feature plan built
+by load_model(), for single requests and for a batch.
+
+Usage:
+    python benchmarks/bench_feature_plan.py [--repeat 2000] [--batch-size 1000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import main
+from test_api import LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT
+
+
+def bench(label: str, func, repeat: int, per_call_rows: int = 1):
+    """Time func and print microseconds per row"""
+    seconds = min(timeit.repeat(func, number=repeat, repeat=3))
+    per_row_us = seconds / (repeat * per_call_rows) * 1e6
+    print(f"  {label:<44} {per_row_us:>10.2f} µs/row")
+    return per_row_us
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=2000, help='Calls per timing run (single request)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows per batch')
+    args = parser.parse_args()
+
+    if not main.load_model():
+        print("✗ Model could not be loaded")
+        return 1
+
+    plan = main.feature_plan
+    patients = [LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT]
+    requests = [main.PredictionRequest(**p) for p in patients]
+    request = requests[0]
+    batch = [requests[i % len(requests)] for i in range(args.batch_size)]
+    batch_repeat = max(1, args.repeat // args.batch_size * 10)
+
+    print("\n" + "=" * 80)
+    print(f"  Feature preprocessing ({plan.n_features} model features)")
+    print("=" * 80)
+
+    print("\nSingle request:")
+    legacy = bench("prepare_features(model_dump())",
+                   lambda: main.prepare_features(request.model_dump()), args.repeat)
+    encode = bench("encode_requests(plan, [request])",
+                   lambda: main.encode_requests(plan, [request]), args.repeat)
+    framed = bench("encode_requests + build_model_input",
+                   lambda: main.build_model_input(plan, main.encode_requests(plan, [request])),
+                   args.repeat)
+
+    print(f"\nBatch of {args.batch_size}:")
+    legacy_batch = bench("prepare_features_batch(model_dump())",
+                         lambda: main.prepare_features_batch([r.model_dump() for r in batch]),
+                         batch_repeat, args.batch_size)
+    encode_batch = bench("encode_requests(plan, batch)",
+                         lambda: main.encode_requests(plan, batch),
+                         batch_repeat, args.batch_size)
+
+    print("\nSpeedup:")
+    print(f"  single (encode only)   {legacy / encode:>6.1f}x")
+    print(f"  single (with frame)    {legacy / framed:>6.1f}x")
+    print(f"  batch  (encode only)   {legacy_batch / encode_batch:>6.1f}x")
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main_bench())
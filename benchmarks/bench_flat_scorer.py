@@ -0,0 +1,114 @@
+"""
+Benchmark: NumPy-only flat scorer vs CatBoost
+
+Compares cold import time, resident memory after loading and scoring, and
+per-row latency (single request and batch) of flat_scorer.FlatModel against
+CatBoostClassifier.predict_proba. Import time and memory are measured in
+fresh interpreter processes.
+
+Usage:
+    python export_model.py
+    python benchmarks/bench_flat_scorer.py [--flat catboost_cancer_progression_model.npz]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import main
+from flat_scorer import FlatModel
+from test_api import LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT
+
+# Run in a fresh interpreter: import, load, score one row, report seconds and
+# peak RSS (Linux)
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+{imports}
+imported = time.perf_counter() - started
+{load_and_score}
+# VmHWM: peak RSS of this process (ru_maxrss would include the parent's)
+peak_kb = next(int(line.split()[1]) for line in open('/proc/self/status') if line.startswith('VmHWM'))
+print(json.dumps({{"import_seconds": imported, "max_rss_mb": peak_kb / 1024}}))
+"""
+
+FLAT_PROBE = PROBE.format(
+    imports="from flat_scorer import FlatModel",
+    load_and_score="m = FlatModel.load(sys.argv[1]); m.score_records([json.loads(sys.argv[2])])",
+)
+
+CATBOOST_PROBE = PROBE.format(
+    imports="import main",
+    load_and_score="main.MODEL_PATH = sys.argv[1]; main.load_model(); "
+                   "main.score_requests([main.PredictionRequest(**json.loads(sys.argv[2]))])",
+)
+
+
+def probe(code: str, path: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, '-c', code, path, json.dumps(LOW_RISK_PATIENT)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench(label: str, func, repeat: int, per_call_rows: int = 1) -> float:
+    """Time func and print microseconds per row"""
+    seconds = min(timeit.repeat(func, number=repeat, repeat=3))
+    per_row_us = seconds / (repeat * per_call_rows) * 1e6
+    print(f"  {label:<36} {per_row_us:>10.2f} µs/row")
+    return per_row_us
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--flat', default=os.path.splitext(main.MODEL_PATH)[0] + '.npz', help='Exported flat model')
+    parser.add_argument('--repeat', type=int, default=500, help='Calls per timing run (single request)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows per batch')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.flat):
+        print(f"✗ {args.flat} not found (run export_model.py first)")
+        return 1
+    if not main.load_model():
+        print("✗ Model could not be loaded")
+        return 1
+
+    print("\n" + "=" * 80)
+    print("  Flat scorer vs CatBoost")
+    print("=" * 80)
+
+    print("\nCold start (fresh process, import + load + score one row):")
+    flat_probe = probe(FLAT_PROBE, os.path.abspath(args.flat))
+    catboost_probe = probe(CATBOOST_PROBE, os.path.abspath(main.MODEL_PATH))
+    for label, result in (("flat_scorer", flat_probe), ("catboost (main)", catboost_probe)):
+        print(f"  {label:<20} import {result['import_seconds']:>7.3f}s  |  max RSS {result['max_rss_mb']:>7.1f} MiB")
+
+    flat = FlatModel.load(args.flat)
+    plan = main.feature_plan
+    patients = [LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT]
+    request = [main.PredictionRequest(**LOW_RISK_PATIENT)]
+    batch = [main.PredictionRequest(**patients[i % len(patients)]) for i in range(args.batch_size)]
+    batch_repeat = max(1, args.repeat // 50)
+
+    print("\nSingle request (encode + score):")
+    bench("flat_scorer", lambda: flat.predict_proba(flat.encode_records([LOW_RISK_PATIENT])), args.repeat)
+    bench("catboost", lambda: main.score_features(
+        main.build_model_input(plan, main.encode_requests(plan, request))), args.repeat)
+
+    print(f"\nBatch of {args.batch_size} (score only):")
+    X = main.encode_requests(plan, batch)
+    bench("flat_scorer", lambda: flat.predict_proba(X), batch_repeat, args.batch_size)
+    bench("catboost", lambda: main.score_features(main.build_model_input(plan, X)), batch_repeat, args.batch_size)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main_bench())
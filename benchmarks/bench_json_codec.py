@@ -0,0 +1,113 @@
+"""
+Benchmark: fast JSON path vs standard FastAPI/pydantic request handling
+
+Measures the CPU cost of decoding + validating a /predict body and of
+encoding the response with both paths, then the end-to-end CPU time per
+request for /predict and /batch-predict with FAST_JSON_ENABLED off and on
+(each in a fresh process, through the ASGI app in-process).
+
+Usage:
+    python benchmarks/bench_json_codec.py [--requests 2000] [--batch-size 100]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import orjson
+
+import main
+from test_api import LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT
+
+# Runs in a fresh interpreter with FAST_JSON_ENABLED set by the parent:
+# CPU seconds (all threads) per request through the ASGI app
+E2E_PROBE = """
+import json, logging, sys, time
+logging.disable(logging.CRITICAL)
+import main
+from fastapi.testclient import TestClient
+path, n, body = sys.argv[1], int(sys.argv[2]), sys.stdin.buffer.read()
+headers = {"content-type": "application/json"}
+with TestClient(main.app) as client:
+    for _ in range(50):
+        client.post(path, content=body, headers=headers)
+    started = time.process_time()
+    for _ in range(n):
+        assert client.post(path, content=body, headers=headers).status_code == 200
+    print(json.dumps({"cpu_seconds": (time.process_time() - started) / n}))
+"""
+
+
+def bench(label: str, func, repeat: int) -> float:
+    """Time func and print microseconds per call"""
+    seconds = min(timeit.repeat(func, number=repeat, repeat=3))
+    per_call_us = seconds / repeat * 1e6
+    print(f"  {label:<44} {per_call_us:>10.2f} µs")
+    return per_call_us
+
+
+def end_to_end(path: str, body: bytes, n: int, fast: bool) -> float:
+    env = dict(os.environ, FAST_JSON_ENABLED='true' if fast else 'false')
+    output = subprocess.run(
+        [sys.executable, '-c', E2E_PROBE, path, str(n)],
+        input=body, cwd=ROOT, env=env, capture_output=True, check=True,
+    ).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])['cpu_seconds'] * 1e6
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per end-to-end run')
+    parser.add_argument('--batch-size', type=int, default=100, help='Patients per /batch-predict body')
+    parser.add_argument('--repeat', type=int, default=5000, help='Calls per component timing run')
+    args = parser.parse_args()
+
+    patients = [LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT]
+    body = json.dumps(LOW_RISK_PATIENT).encode()
+    batch_body = json.dumps([patients[i % len(patients)] for i in range(args.batch_size)]).encode()
+    payload = main.build_prediction_payload(0.25, 0, main.MODEL_VERSION)
+    if not main.load_model():
+        print("✗ Model could not be loaded")
+        return 1
+    schema = main.model_registry.active.request_schema
+
+    print("\n" + "=" * 80)
+    print("  Fast JSON path vs standard request handling")
+    print("=" * 80)
+
+    print("\nDecode + validate one /predict body:")
+    standard_in = bench("json.loads + request schema validation",
+                        lambda: schema.model.model_validate(json.loads(body)), args.repeat)
+    fast_in = bench("orjson.loads + fast_validate_request",
+                    lambda: main.fast_validate_request(orjson.loads(body), schema), args.repeat)
+
+    print("\nEncode one /predict response:")
+    standard_out = bench("PredictionResponse + model_dump + json.dumps",
+                         lambda: json.dumps(main.PredictionResponse(**payload).model_dump(mode='json')),
+                         args.repeat)
+    fast_out = bench("orjson.dumps(payload)", lambda: orjson.dumps(payload), args.repeat)
+
+    print(f"\nEnd-to-end CPU per request ({args.requests} requests, in-process ASGI client):")
+    for label, path, data, n in (("/predict", "/predict", body, args.requests),
+                                 (f"/batch-predict ({args.batch_size})", "/batch-predict", batch_body,
+                                  max(1, args.requests // 20))):
+        standard = end_to_end(path, data, n, fast=False)
+        fast = end_to_end(path, data, n, fast=True)
+        print(f"  {label:<24} standard {standard:>9.1f} µs  |  fast {fast:>9.1f} µs  |  "
+              f"saved {standard - fast:>8.1f} µs ({(standard - fast) / standard:.0%})")
+
+    print("\nComponent savings per /predict call:")
+    print(f"  decode + validate   {standard_in - fast_in:>8.2f} µs  ({standard_in / fast_in:.1f}x)")
+    print(f"  encode response     {standard_out - fast_out:>8.2f} µs  ({standard_out / fast_out:.1f}x)")
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main_bench())
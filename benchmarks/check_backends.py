@@ -0,0 +1,67 @@
+"""
+Inference backend parity check and timing
+
+Scores the test fixtures through the legacy prepare_features() path and
+through build_model_input() with every INFERENCE_BACKEND, then checks that
+all probabilities are bit-for-bit identical and reports per-call latency.
+
+Usage:
+    python benchmarks/check_backends.py [--repeat 500]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import main
+from test_api import LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT
+
+BACKENDS = ('pandas', 'pool')
+
+
+def main_check():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=500, help='Calls per timing run')
+    args = parser.parse_args()
+
+    if not main.load_model():
+        print("✗ Model could not be loaded")
+        return 1
+
+    plan = main.feature_plan
+    requests = [main.PredictionRequest(**p) for p in (LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT)]
+
+    print("\n" + "=" * 80)
+    print("  Inference backend parity")
+    print("=" * 80 + "\n")
+
+    legacy = main.model.predict_proba(main.prepare_features_batch([r.model_dump() for r in requests]))
+    encoded = main.encode_requests(plan, requests)
+
+    ok = True
+    for backend in BACKENDS:
+        probabilities = main.model.predict_proba(main.build_model_input(plan, encoded, backend))
+        same = np.array_equal(legacy, probabilities)
+        ok = ok and same
+        print(f"  {'✓' if same else '✗'} {backend:<8} matches prepare_features bit for bit: {same}")
+
+    print("\nSingle request latency (encode + input + predict_proba):")
+    request = requests[:1]
+    for backend in BACKENDS:
+        seconds = min(timeit.repeat(
+            lambda: main.model.predict_proba(main.build_model_input(plan, main.encode_requests(plan, request), backend)),
+            number=args.repeat, repeat=3,
+        ))
+        print(f"  {backend:<8} {seconds / args.repeat * 1e6:>10.1f} µs")
+    print()
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    exit(main_check())
@@ -0,0 +1,283 @@
+"""
+Load test: latency percentiles, throughput and CPU per request
+
+Drives /predict and /batch-predict (at several batch sizes) with a fixed
+number of concurrent clients, either in-process through the ASGI app or
+over a real socket against a uvicorn server (started here, or an already
+running one with --url). Payloads are the LOW/MEDIUM/HIGH_RISK_PATIENT
+fixtures from test_api.py, or the records of an NDJSON file
+(one PredictionRequest per line).
+
+Results are written as JSON so runs from different commits can be compared
+(--compare previous.json prints the change per scenario).
+
+Usage:
+    python benchmarks/load_test.py [--transport asgi|socket|both]
+        [--concurrency 1,8,32] [--batch-sizes 10,100] [--requests 500]
+        [--payloads records.jsonl] [--url http://host:8000]
+        [--output load_test.json] [--compare previous.json]
+
+Requires httpx (pip install httpx).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import httpx
+import numpy as np
+
+from test_api import LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT
+
+# Settings recorded with the results (they change what is being measured)
+RECORDED_ENV = (
+    'INFERENCE_BACKEND', 'INFERENCE_WORKERS', 'MICROBATCH_ENABLED', 'PREDICTION_CACHE_SIZE',
+    'FAST_JSON_ENABLED', 'MODEL_THREAD_COUNT', 'REQUEST_UNUSED_FIELDS',
+)
+
+
+def load_payloads(path: str = None) -> list:
+    """Fixture patients, or the records of an NDJSON file"""
+    if not path:
+        return [LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT]
+    with open(path) as f:
+        payloads = [json.loads(line) for line in f if line.strip()]
+    if not payloads:
+        raise ValueError(f"No records in {path}")
+    return payloads
+
+
+def build_bodies(payloads: list, batch_size: int = None, count: int = 16) -> list:
+    """Pre-encoded request bodies cycling through the payloads"""
+    if batch_size is None:
+        return [json.dumps(payloads[i % len(payloads)]).encode() for i in range(len(payloads))]
+    return [
+        json.dumps([payloads[(i * batch_size + j) % len(payloads)] for j in range(batch_size)]).encode()
+        for i in range(min(count, len(payloads)) or 1)
+    ]
+
+
+def process_cpu_seconds(pid: int = None) -> float:
+    """User + system CPU seconds of a process (this one by default)"""
+    if pid is None:
+        return time.process_time()
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+async def run_scenario(client: httpx.AsyncClient, path: str, bodies: list, n_requests: int,
+                       concurrency: int, cpu_pid: int = None) -> dict:
+    """
+    Send n_requests POSTs from `concurrency` concurrent clients
+
+    Returns:
+        Latency percentiles (ms), requests per second, errors and CPU
+        milliseconds per request (None when the server CPU cannot be read)
+    """
+    headers = {"content-type": "application/json"}
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < n_requests:
+            body = bodies[next_index % len(bodies)]
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, content=body, headers=headers)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    # Warm-up outside the measurement
+    for body in bodies[:3]:
+        await client.post(path, content=body, headers=headers)
+
+    cpu_started = process_cpu_seconds(cpu_pid)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    cpu = process_cpu_seconds(cpu_pid) - cpu_started
+
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99]).tolist()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+        "p99_ms": round(p99, 3),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 3),
+        "rps": round(len(latencies) / elapsed, 2),
+        "cpu_ms_per_request": round(cpu / len(latencies) * 1000, 3),
+    }
+
+
+async def run_transport(transport: str, client: httpx.AsyncClient, args, payloads: list,
+                        cpu_pid: int = None) -> list:
+    """All scenarios (endpoint x batch size x concurrency) for one transport"""
+    scenarios = [("/predict", None)] + [("/batch-predict", size) for size in args.batch_sizes]
+    results = []
+    for path, batch_size in scenarios:
+        bodies = build_bodies(payloads, batch_size)
+        # Batches cost ~batch_size single requests; keep run times comparable
+        n_requests = args.requests if batch_size is None else max(args.concurrency[-1], args.requests // batch_size)
+        for concurrency in args.concurrency:
+            result = await run_scenario(client, path, bodies, n_requests, concurrency, cpu_pid)
+            if transport == "socket" and cpu_pid is None:
+                result["cpu_ms_per_request"] = None
+            result = {"transport": transport, "endpoint": path, "batch_size": batch_size or 1,
+                      "concurrency": concurrency, **result}
+            result["rows_per_s"] = round(result["rps"] * result["batch_size"], 2)
+            results.append(result)
+            print(f"  {transport:<6} {path:<15} batch {result['batch_size']:>4}  conc {concurrency:>3}  "
+                  f"p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  p99 {result['p99_ms']:>8.2f} ms  "
+                  f"{result['rps']:>8.1f} req/s  "
+                  + (f"{result['cpu_ms_per_request']:>7.2f} ms CPU/req" if result['cpu_ms_per_request'] is not None else "")
+                  + (f"  ✗ {result['errors']} errors" if result['errors'] else ""))
+    return results
+
+
+async def run_asgi(args, payloads: list) -> list:
+    """In-process: no network; CPU includes the client side"""
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        if main.model_registry.active is None:
+            raise RuntimeError(f"Model could not be loaded from {main.MODEL_PATH}")
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://asgi", timeout=60) as client:
+            return await run_transport("asgi", client, args, payloads)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get("/health")
+            if response.status_code == 200 and response.json().get("model_loaded"):
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+async def run_socket(args, payloads: list) -> list:
+    """Over TCP against --url, or a uvicorn server started for the run (server CPU measured)"""
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+             '--log-level', 'warning', '--no-access-log'],
+            cwd=ROOT,
+        )
+        url = f"http://127.0.0.1:{port}"
+
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+            await wait_ready(client)
+            return await run_transport("socket", client, args, payloads, server.pid if server else None)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list, previous_path: str):
+    """Print p50/p99/RPS change against an earlier results file"""
+    with open(previous_path) as f:
+        previous = json.load(f)
+    key = lambda r: (r["transport"], r["endpoint"], r["batch_size"], r["concurrency"])
+    before = {key(r): r for r in previous["results"]}
+
+    print(f"\nChange vs {previous_path} (commit {previous.get('commit')}):")
+    for result in results:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        change = lambda field: (result[field] - old[field]) / old[field] if old[field] else 0.0
+        print(f"  {result['transport']:<6} {result['endpoint']:<15} batch {result['batch_size']:>4}  "
+              f"conc {result['concurrency']:>3}  p50 {change('p50_ms'):>+7.1%}  "
+              f"p99 {change('p99_ms'):>+7.1%}  rps {change('rps'):>+7.1%}")
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--transport', choices=['asgi', 'socket', 'both'], default='asgi')
+    parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated client counts')
+    parser.add_argument('--batch-sizes', default='10,100', help='Comma-separated /batch-predict sizes')
+    parser.add_argument('--requests', type=int, default=500, help='/predict requests per scenario')
+    parser.add_argument('--payloads', help='NDJSON file of PredictionRequest records (default: fixtures)')
+    parser.add_argument('--url', help='Running server for the socket transport (default: start uvicorn)')
+    parser.add_argument('--output', default='load_test.json', help='Results file')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args()
+    args.concurrency = sorted(int(c) for c in args.concurrency.split(','))
+    args.batch_sizes = [int(b) for b in args.batch_sizes.split(',') if b]
+
+    payloads = load_payloads(args.payloads)
+
+    print("\n" + "=" * 80)
+    print("  Load test")
+    print("=" * 80)
+    print(f"  {len(payloads)} payloads  |  concurrency {args.concurrency}  |  batch sizes {args.batch_sizes}\n")
+
+    results = []
+    if args.transport in ('asgi', 'both'):
+        results += asyncio.run(run_asgi(args, payloads))
+    if args.transport in ('socket', 'both'):
+        results += asyncio.run(run_socket(args, payloads))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "payloads": args.payloads or "fixtures",
+        "env": {name: os.environ[name] for name in RECORDED_ENV if name in os.environ},
+        "results": results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    print()
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    exit(main_bench())
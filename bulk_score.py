@@ -0,0 +1,275 @@
+"""
+Offline bulk scoring for Cancer Progression Prediction
+Scores CSV / Parquet / JSONL cohort files without going through the HTTP API
+
+Uses the same load_model() and feature plan as main.py. Input is read in
+chunks, each chunk is scored with one vectorized predict_proba call, and
+chunks are spread over worker processes. Progress is checkpointed after
+every chunk so an interrupted run can be resumed with --resume.
+
+Usage:
+    python bulk_score.py cohort.csv scores.csv
+    python bulk_score.py cohort.parquet scores.jsonl --workers 4 --chunk-size 20000
+    python bulk_score.py cohort.jsonl scores.csv --id-column case_id --resume
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import main
+
+INPUT_FORMATS = ('csv', 'parquet', 'jsonl')
+OUTPUT_FORMATS = ('csv', 'jsonl')
+
+
+# ============================================================================
+# INPUT
+# ============================================================================
+
+def detect_format(path: str, allowed: Tuple[str, ...]) -> str:
+    """Infer the file format from its extension"""
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    ext = {'ndjson': 'jsonl', 'pq': 'parquet'}.get(ext, ext)
+    if ext not in allowed:
+        raise ValueError(f"Unsupported file type '.{ext}' for {path} (expected one of: {', '.join(allowed)})")
+    return ext
+
+
+def normalize_columns(frame: pd.DataFrame) -> pd.DataFrame:
+    """Accept dotted (model) or underscored (request) column names"""
+    return frame.rename(columns=lambda name: str(name).replace('.', '_'))
+
+
+def read_chunks(path: str, fmt: str, chunk_size: int, skip_chunks: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Yield the input file as DataFrames of at most chunk_size rows
+
+    Args:
+        path: Input file
+        fmt: One of INPUT_FORMATS
+        chunk_size: Rows per chunk
+        skip_chunks: Leading chunks to skip (already scored)
+    """
+    if fmt == 'csv':
+        # Read as strings, like JSON request values; numeric fields are
+        # converted by the feature plan
+        chunks = pd.read_csv(path, chunksize=chunk_size, dtype=str)
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        chunks = (batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=chunk_size))
+    else:
+        def jsonl_chunks():
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = (line for line in f if line.strip())
+                while True:
+                    block = list(islice(lines, chunk_size))
+                    if not block:
+                        return
+                    yield pd.DataFrame([json.loads(line) for line in block])
+        chunks = jsonl_chunks()
+
+    for index, frame in enumerate(chunks):
+        if index < skip_chunks:
+            continue
+        yield normalize_columns(frame)
+
+
+# ============================================================================
+# SCORING
+# ============================================================================
+
+def init_worker(model_path: str):
+    """Load the model once per worker process"""
+    main.MODEL_PATH = model_path
+    # Bulk rows are rarely repeated; skip cache bookkeeping
+    main.prediction_cache = None
+    if not main.load_model() or main.feature_plan is None:
+        raise RuntimeError(f"Model could not be loaded from {model_path}")
+
+
+def score_chunk(args: Tuple[int, pd.DataFrame, Optional[str]]) -> pd.DataFrame:
+    """
+    Score one chunk with a single predict_proba call
+
+    Rows that cannot be scored get an error instead of failing the chunk.
+
+    Returns:
+        DataFrame with row, [id], prediction, probability, risk_level, label, error
+    """
+    first_row, frame, id_column = args
+    X = main.encode_frame(main.feature_plan, frame)
+    scored = main.score_encoded_isolated(X)
+
+    ok = [isinstance(result, tuple) for result in scored]
+    probabilities = np.array([r[0] if good else np.nan for r, good in zip(scored, ok)], dtype=np.float64)
+    predictions = pd.array([r[1] if good else None for r, good in zip(scored, ok)], dtype='Int64')
+
+    results = pd.DataFrame({'row': np.arange(first_row, first_row + len(frame))})
+    if id_column:
+        results[id_column] = frame[id_column].to_numpy() if id_column in frame.columns else None
+    results['prediction'] = predictions
+    results['probability'] = probabilities
+    results['risk_level'] = [main.get_risk_category(p) if good else None for p, good in zip(probabilities.tolist(), ok)]
+    results['label'] = [main.get_progression_label(int(p)) if good else None for p, good in zip(predictions, ok)]
+    results['error'] = [None if good else str(r) for r, good in zip(scored, ok)]
+    return results
+
+
+# ============================================================================
+# OUTPUT & PROGRESS
+# ============================================================================
+
+def write_results(f, fmt: str, results: pd.DataFrame, header: bool):
+    """Append scored records to the output file"""
+    if fmt == 'csv':
+        results.to_csv(f, header=header, index=False)
+    else:
+        records = results.astype(object).where(results.notna(), None).to_dict('records')
+        f.write(''.join(json.dumps(record) + '\n' for record in records))
+
+
+def load_progress(progress_path: str) -> Dict[str, Any]:
+    if not os.path.exists(progress_path):
+        return {}
+    with open(progress_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_progress(progress_path: str, progress: Dict[str, Any]):
+    """Atomically replace the progress checkpoint"""
+    tmp_path = progress_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(progress, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, progress_path)
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def bounded_map(executor: ProcessPoolExecutor, func, items: Iterator[Any], max_pending: int) -> Iterator[Any]:
+    """Like executor.map, but keeps at most max_pending items submitted"""
+    pending = []
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= max_pending:
+            yield pending.pop(0).result()
+    for future in pending:
+        yield future.result()
+
+
+def run(args: argparse.Namespace) -> int:
+    in_fmt = detect_format(args.input, INPUT_FORMATS)
+    out_fmt = detect_format(args.output, OUTPUT_FORMATS)
+    progress_path = args.output + '.progress.json'
+
+    if not os.path.exists(args.model):
+        print(f"✗ Model file not found at {args.model}")
+        return 1
+
+    progress = {}
+    if args.resume:
+        progress = load_progress(progress_path)
+        if progress and (progress.get('input') != os.path.abspath(args.input)
+                         or progress.get('chunk_size') != args.chunk_size):
+            print("✗ Progress file belongs to a different input or chunk size; refusing to resume")
+            return 1
+    elif os.path.exists(args.output):
+        print(f"✗ {args.output} already exists (use --resume to continue a previous run)")
+        return 1
+
+    chunks_done = progress.get('chunks_done', 0)
+    rows_done = progress.get('rows_done', 0)
+    if chunks_done:
+        print(f"✓ Resuming after {chunks_done} chunks ({rows_done} rows)")
+
+    # Drop anything written after the last checkpoint (e.g. a chunk that was
+    # being written when the previous run was interrupted)
+    mode = 'r+' if progress else 'w'
+    f = open(args.output, mode, encoding='utf-8', newline='')
+    f.truncate(progress.get('output_bytes', 0))
+    f.seek(0, os.SEEK_END)
+
+    workers = max(1, args.workers)
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(args.model,))
+    else:
+        init_worker(args.model)
+
+    def tasks():
+        first_row = rows_done
+        for frame in read_chunks(args.input, in_fmt, args.chunk_size, skip_chunks=chunks_done):
+            yield first_row, frame, args.id_column
+            first_row += len(frame)
+
+    started = time.perf_counter()
+    scored_rows = 0
+    errors = 0
+    try:
+        task_iter = tasks()
+        if executor is None:
+            results_iter = map(score_chunk, task_iter)
+        else:
+            # Keep at most 2 chunks per worker in flight to bound memory
+            results_iter = bounded_map(executor, score_chunk, task_iter, workers * 2)
+
+        for results in results_iter:
+            n_rows = len(results)
+            write_results(f, out_fmt, results, header=(out_fmt == 'csv' and f.tell() == 0))
+            f.flush()
+            os.fsync(f.fileno())
+
+            chunks_done += 1
+            rows_done += n_rows
+            scored_rows += n_rows
+            errors += int(results['error'].notna().sum())
+            save_progress(progress_path, {
+                'input': os.path.abspath(args.input),
+                'output': os.path.abspath(args.output),
+                'chunk_size': args.chunk_size,
+                'chunks_done': chunks_done,
+                'rows_done': rows_done,
+                'output_bytes': f.tell(),
+            })
+
+            elapsed = time.perf_counter() - started
+            print(f"  {rows_done:>12,} rows  |  {scored_rows / elapsed:>10,.0f} rows/sec  |  {errors} errors")
+    finally:
+        f.close()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    rate = scored_rows / elapsed if elapsed > 0 else 0.0
+    print(f"\n✓ Scored {scored_rows:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/sec, {errors} errors)")
+    print(f"✓ Results written to {args.output}")
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk-score a cohort file with the cancer progression model")
+    parser.add_argument('input', help="Input file (.csv, .parquet or .jsonl)")
+    parser.add_argument('output', help="Output file (.csv or .jsonl)")
+    parser.add_argument('--model', default=main.MODEL_PATH, help="Path to the .cbm model (default: MODEL_PATH)")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Rows per model call (default: 10000)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument('--id-column', default=None, help="Input column copied to the output to identify rows")
+    parser.add_argument('--resume', action='store_true', help="Continue an interrupted run from its checkpoint")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
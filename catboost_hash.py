@@ -0,0 +1,239 @@
+"""
+CatBoost categorical hashing for Cancer Progression Prediction
+CityHash64, CTR table keys and category normalization, shared by main.py
+and flat_scorer.py
+
+CatBoost hashes categorical values with CityHash64 (v1.0) and keeps the low
+32 bits; CTR hash tables are keyed by combining those value hashes. The API
+and the NumPy-only flat scorer need the exact same hashes and the same
+category normalization rules, so they live here with no dependencies beyond
+the standard library.
+"""
+
+import struct
+from functools import lru_cache
+from typing import Any, Dict, Sequence, Tuple
+
+
+# ============================================================================
+# CITYHASH
+# ============================================================================
+
+# CityHash64 v1.0 as used by CatBoost for categorical values, and the
+# multiplier CatBoost combines value hashes with for CTR table keys
+
+_MASK = 0xFFFFFFFFFFFFFFFF
+_K0 = 0xc3a5c85c97cb3127
+_K1 = 0xb492b66fbe98f273
+_K2 = 0x9ae16a3b2f90404f
+_K3 = 0xc949d7c7509e6557
+_KMUL = 0x9ddfea08eb382d69
+CTR_KEY_MULT = 0x4906ba494954cb65
+
+
+def _fetch64(s: bytes, i: int) -> int:
+    return struct.unpack_from('<Q', s, i)[0]
+
+
+def _fetch32(s: bytes, i: int) -> int:
+    return struct.unpack_from('<I', s, i)[0]
+
+
+def _rotate(v: int, shift: int) -> int:
+    return v if shift == 0 else ((v >> shift) | (v << (64 - shift))) & _MASK
+
+
+def _shift_mix(v: int) -> int:
+    return v ^ (v >> 47)
+
+
+def _hash_len16(u: int, v: int) -> int:
+    a = ((u ^ v) * _KMUL) & _MASK
+    a ^= a >> 47
+    b = ((v ^ a) * _KMUL) & _MASK
+    b ^= b >> 47
+    return (b * _KMUL) & _MASK
+
+
+def _hash_len0to16(s: bytes) -> int:
+    n = len(s)
+    if n > 8:
+        a = _fetch64(s, 0)
+        b = _fetch64(s, n - 8)
+        return _hash_len16(a, _rotate((b + n) & _MASK, n)) ^ b
+    if n >= 4:
+        a = _fetch32(s, 0)
+        return _hash_len16((n + (a << 3)) & _MASK, _fetch32(s, n - 4))
+    if n > 0:
+        y = (s[0] + (s[n >> 1] << 8)) & 0xFFFFFFFF
+        z = (n + (s[n - 1] << 2)) & 0xFFFFFFFF
+        return (_shift_mix(((y * _K2) ^ (z * _K3)) & _MASK) * _K2) & _MASK
+    return _K2
+
+
+def _hash_len17to32(s: bytes) -> int:
+    n = len(s)
+    a = (_fetch64(s, 0) * _K1) & _MASK
+    b = _fetch64(s, 8)
+    c = (_fetch64(s, n - 8) * _K2) & _MASK
+    d = (_fetch64(s, n - 16) * _K0) & _MASK
+    return _hash_len16(
+        (_rotate((a - b) & _MASK, 43) + _rotate(c, 30) + d) & _MASK,
+        (a + _rotate(b ^ _K3, 20) - c + n) & _MASK,
+    )
+
+
+def _hash_len33to64(s: bytes) -> int:
+    n = len(s)
+    z = _fetch64(s, 24)
+    a = (_fetch64(s, 0) + (n + _fetch64(s, n - 16)) * _K0) & _MASK
+    b = _rotate((a + z) & _MASK, 52)
+    c = _rotate(a, 37)
+    a = (a + _fetch64(s, 8)) & _MASK
+    c = (c + _rotate(a, 7)) & _MASK
+    a = (a + _fetch64(s, 16)) & _MASK
+    vf = (a + z) & _MASK
+    vs = (b + _rotate(a, 31) + c) & _MASK
+    a = (_fetch64(s, 16) + _fetch64(s, n - 32)) & _MASK
+    z = _fetch64(s, n - 8)
+    b = _rotate((a + z) & _MASK, 52)
+    c = _rotate(a, 37)
+    a = (a + _fetch64(s, n - 24)) & _MASK
+    c = (c + _rotate(a, 7)) & _MASK
+    a = (a + _fetch64(s, n - 16)) & _MASK
+    wf = (a + z) & _MASK
+    ws = (b + _rotate(a, 31) + c) & _MASK
+    r = _shift_mix(((vf + ws) * _K2 + (wf + vs) * _K0) & _MASK)
+    return (_shift_mix((r * _K0 + vs) & _MASK) * _K2) & _MASK
+
+
+def _weak_hash_len32_with_seeds(s: bytes, i: int, a: int, b: int) -> Tuple[int, int]:
+    w, x, y, z = _fetch64(s, i), _fetch64(s, i + 8), _fetch64(s, i + 16), _fetch64(s, i + 24)
+    a = (a + w) & _MASK
+    b = _rotate((b + a + z) & _MASK, 21)
+    c = a
+    a = (a + x + y) & _MASK
+    b = (b + _rotate(a, 44)) & _MASK
+    return (a + z) & _MASK, (b + c) & _MASK
+
+
+def cityhash64(s: bytes) -> int:
+    """CityHash64 (v1.0) of a byte string, as an unsigned 64-bit int"""
+    n = len(s)
+    if n <= 16:
+        return _hash_len0to16(s)
+    if n <= 32:
+        return _hash_len17to32(s)
+    if n <= 64:
+        return _hash_len33to64(s)
+
+    x = _fetch64(s, 0)
+    y = _fetch64(s, n - 16) ^ _K1
+    z = _fetch64(s, n - 56) ^ _K0
+    v = _weak_hash_len32_with_seeds(s, n - 64, n, y)
+    w = _weak_hash_len32_with_seeds(s, n - 32, (n * _K1) & _MASK, _K0)
+    z = (z + _shift_mix(v[1]) * _K1) & _MASK
+    x = (_rotate((z + x) & _MASK, 39) * _K1) & _MASK
+    y = (_rotate(y, 33) * _K1) & _MASK
+
+    remaining = (n - 1) & ~63
+    i = 0
+    while True:
+        x = (_rotate((x + y + v[0] + _fetch64(s, i + 16)) & _MASK, 37) * _K1) & _MASK
+        y = (_rotate((y + v[1] + _fetch64(s, i + 48)) & _MASK, 42) * _K1) & _MASK
+        x ^= w[1]
+        y ^= v[0]
+        z = _rotate(z ^ w[0], 33)
+        v = _weak_hash_len32_with_seeds(s, i, (v[1] * _K1) & _MASK, (x + w[0]) & _MASK)
+        w = _weak_hash_len32_with_seeds(s, i + 32, (z + w[1]) & _MASK, y)
+        z, x = x, z
+        i += 64
+        remaining -= 64
+        if remaining == 0:
+            break
+
+    return _hash_len16(
+        (_hash_len16(v[0], w[0]) + _shift_mix(y) * _K1 + z) & _MASK,
+        (_hash_len16(v[1], w[1]) + x) & _MASK,
+    )
+
+
+@lru_cache(maxsize=65536)
+def cat_feature_hash(value: str) -> int:
+    """
+    CatBoost's hash of a categorical value: the low 32 bits of CityHash64,
+    as a signed 32-bit int (the form used for one-hot values)
+    """
+    h = cityhash64(value.encode('utf-8')) & 0xFFFFFFFF
+    return h - (1 << 32) if h >= (1 << 31) else h
+
+
+def ctr_key(value_hashes: Sequence[int]) -> int:
+    """
+    Key of a combination of categorical values (cat_feature_hash results,
+    in projection order) in CatBoost's CTR hash tables
+    """
+    key = 0
+    for h in value_hashes:
+        key = (CTR_KEY_MULT * (key + CTR_KEY_MULT * (h & _MASK))) & _MASK
+    return key
+
+
+# ============================================================================
+# CATEGORY NORMALIZATION
+# ============================================================================
+
+class CategoryNormalizer:
+    """
+    Maps raw categorical inputs onto the spellings a model was trained on
+
+    A value the model knows is kept as-is. Otherwise whitespace is
+    collapsed and case and separator variants, then the column's synonyms
+    (main.CATEGORY_SYNONYMS), are tried; the first variant the model knows is used. A value with no known
+    variant is kept too, so a score only changes when the model previously
+    treated an input as an unseen category although it knows it under
+    another spelling. Results are memoized per (column, value) in a bounded
+    LRU cache, so repeated values cost one lookup.
+    """
+
+    def __init__(self, vocabulary: Dict[int, Tuple[frozenset, frozenset]],
+                 synonyms: Dict[int, Dict[str, str]], memo_size: int):
+        self.vocabulary = vocabulary
+        self.synonyms = synonyms
+        self.columns = frozenset(vocabulary)
+        self.canonical = lru_cache(maxsize=max(0, memo_size))(self._canonical)
+
+    def known(self, col: int, value: str) -> bool:
+        """Whether the model saw this exact value in column col"""
+        ctr_keys, one_hot = self.vocabulary[col]
+        value_hash = cat_feature_hash(value)
+        return value_hash in one_hot or ctr_key((value_hash,)) in ctr_keys
+
+    def _canonical(self, col: int, value: str) -> str:
+        if self.known(col, value):
+            return value
+
+        text = ' '.join(value.split())
+        candidates = [text]
+        if '_' in text:
+            candidates.append(text.replace('_', ' '))
+        for base in list(candidates):
+            candidates += [base.lower(), base.upper(), base.title(), base.capitalize()]
+        synonym = self.synonyms.get(col, {}).get(text.casefold())
+        if synonym is not None:
+            candidates.append(synonym)
+
+        for candidate in candidates:
+            if candidate != value and self.known(col, candidate):
+                return candidate
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        info = self.canonical.cache_info()
+        return {
+            "features": len(self.columns),
+            "memo_size": info.currsize,
+            "memo_max_size": info.maxsize,
+            "memo_hits": info.hits,
+            "memo_misses": info.misses,
+        }
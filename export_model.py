@@ -0,0 +1,326 @@
+"""
+Flat model export for Cancer Progression Prediction
+Exports the CatBoost model to NumPy arrays for flat_scorer.py
+
+The model loaded by main.load_bundle() is dumped through CatBoost's JSON
+format and converted into a single compressed .npz file: oblivious tree
+splits and leaf values, float feature borders, one-hot values, CTR settings
+and the CTR hash tables, plus the request feature plan and the category
+normalization vocabulary and synonyms. The export is then scored with
+flat_scorer.FlatModel and compared against predict_proba.
+
+Usage:
+    python export_model.py
+    python export_model.py --output model_flat.npz --verify-data cohort.csv
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from catboost import CatBoostError
+
+import main
+import flat_scorer
+from flat_scorer import FlatModel
+
+CTR_KINDS = {
+    'Borders': flat_scorer.CTR_BORDERS,
+    'Buckets': flat_scorer.CTR_BUCKETS,
+    'Counter': flat_scorer.CTR_COUNTER,
+    'FeatureFreq': flat_scorer.CTR_COUNTER,
+}
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def export_flat_model(bundle: main.ModelBundle) -> Dict[str, np.ndarray]:
+    """
+    Convert a loaded model into the flat array layout read by FlatModel
+
+    Binary features (split conditions) are numbered the way CatBoost numbers
+    them: float feature borders, then one-hot values, then CTR borders.
+
+    Raises:
+        ValueError: If the model uses features the flat scorer does not
+            support (multiclass, text/embedding features, feature-combination
+            CTRs or mean-target CTRs)
+    """
+    if bundle.plan is None:
+        raise ValueError("Model has no feature names; requests cannot be mapped onto it")
+
+    spec = main.dump_model_json(bundle.model)
+    features = spec['features_info']
+    unsupported = set(features) - {'float_features', 'categorical_features', 'ctrs'}
+    if unsupported:
+        raise ValueError(f"Unsupported feature types: {', '.join(sorted(unsupported))}")
+
+    scale, biases = spec['scale_and_bias']
+    if len(biases) != 1:
+        raise ValueError("Only binary classifiers can be exported")
+
+    float_features = sorted(features.get('float_features', []), key=lambda f: f['feature_index'])
+    cat_features = sorted(features.get('categorical_features', []), key=lambda f: f['feature_index'])
+    ctrs = features.get('ctrs', [])
+
+    # Categorical columns must reach the scorer as strings
+    for feature in cat_features:
+        if bundle.plan.type_codes[feature['flat_feature_index']] == main.FEATURE_NUMERIC:
+            raise ValueError(f"Categorical feature {feature['feature_id']} is encoded as a number")
+
+    bin_kind, bin_source, bin_border, bin_value, bin_nan_true = [], [], [], [], []
+
+    def add_bin(kind: int, source: int, border: float = 0.0, value: int = 0, nan_true: bool = False):
+        bin_kind.append(kind)
+        bin_source.append(source)
+        bin_border.append(border)
+        bin_value.append(value)
+        bin_nan_true.append(nan_true)
+
+    for feature in float_features:
+        nan_true = feature.get('nan_value_treatment') == 'AsTrue'
+        for border in feature.get('borders') or []:
+            add_bin(flat_scorer.BIN_FLOAT, feature['feature_index'], border=border, nan_true=nan_true)
+
+    for feature in cat_features:
+        for value in feature.get('values') or []:
+            add_bin(flat_scorer.BIN_ONE_HOT, feature['feature_index'], value=value)
+
+    # CTRs and their hash tables; several CTRs (priors) share one table
+    table_ids: Dict[str, int] = {}
+    ctr_kind, ctr_table, ctr_target_border, ctr_params, ctr_projections = [], [], [], [], []
+    for index, ctr in enumerate(ctrs):
+        if ctr['ctr_type'] not in CTR_KINDS:
+            raise ValueError(f"Unsupported CTR type: {ctr['ctr_type']}")
+        if any(element['combination_element'] != 'cat_feature_value' for element in ctr['elements']):
+            raise ValueError("CTRs over binarized feature combinations are not supported")
+
+        table_ids.setdefault(ctr['identifier'], len(table_ids))
+        ctr_kind.append(CTR_KINDS[ctr['ctr_type']])
+        ctr_table.append(table_ids[ctr['identifier']])
+        ctr_target_border.append(ctr.get('target_border_idx', 0))
+        ctr_params.append((ctr['prior_numerator'], ctr['prior_denomerator'], ctr['shift'], ctr['scale']))
+        ctr_projections.append([element['cat_feature_index'] for element in ctr['elements']])
+        for border in ctr['borders']:
+            add_bin(flat_scorer.BIN_CTR, index, border=border)
+
+    projection_width = max((len(p) for p in ctr_projections), default=1)
+    ctr_projection = np.full((len(ctrs), projection_width), -1, dtype=np.int32)
+    for index, projection in enumerate(ctr_projections):
+        ctr_projection[index, :len(projection)] = projection
+
+    # Hash tables: hash_map is a flat list of [hash, count, count, ...]
+    tables = []
+    for identifier in table_ids:
+        data = spec['ctr_data'][identifier]
+        stride = data['hash_stride']
+        hash_map = data['hash_map']
+        hashes = np.array([int(h) for h in hash_map[0::stride]], dtype=np.uint64)
+        counts = np.array(
+            [[int(c) for c in hash_map[i + 1:i + stride]] for i in range(0, len(hash_map), stride)],
+            dtype=np.int64,
+        ).reshape(len(hashes), stride - 1)
+        order = np.argsort(hashes)
+        tables.append((hashes[order], counts[order], data.get('counter_denominator', 0)))
+
+    count_width = max((counts.shape[1] for _, counts, _ in tables), default=1)
+    table_offsets = np.cumsum([0] + [len(hashes) for hashes, _, _ in tables]).astype(np.int64)
+    table_counts = np.zeros((int(table_offsets[-1]), count_width), dtype=np.int64)
+    for (_, counts, _), start in zip(tables, table_offsets):
+        table_counts[start:start + len(counts), :counts.shape[1]] = counts
+
+    # Oblivious trees: split i of a tree sets bit i of the leaf index
+    trees = spec['oblivious_trees']
+    depths = [len(tree['splits'] or []) for tree in trees]
+    tree_splits = np.full((len(trees), max(depths, default=0) or 1), -1, dtype=np.int32)
+    for t, tree in enumerate(trees):
+        for d, split in enumerate(tree['splits'] or []):
+            tree_splits[t, d] = split['split_index']
+    leaf_offsets = np.cumsum([0] + [1 << depth for depth in depths])[:-1].astype(np.int64)
+
+    # Category normalization: the API's vocabulary (hashes of the values each
+    # column saw in training) and synonyms, so the flat scorer maps inputs
+    # onto the same training spellings
+    categories = bundle.plan.categories
+    category_columns = sorted(categories.vocabulary) if categories is not None else []
+    category_ctr_offsets, category_ctr_keys = pack_hash_sets(
+        [categories.vocabulary[col][0] for col in category_columns], np.uint64)
+    category_one_hot_offsets, category_one_hot = pack_hash_sets(
+        [categories.vocabulary[col][1] for col in category_columns], np.int64)
+
+    meta = {
+        'format_version': flat_scorer.FLAT_FORMAT_VERSION,
+        'model_version': bundle.version,
+        'model_path': bundle.path,
+        'fingerprint': bundle.fingerprint,
+        'catboost_version': spec.get('model_info', {}).get('catboost_version_info', ''),
+        'exported_at': datetime.now().isoformat(),
+        'feature_names': list(bundle.plan.feature_names),
+        'request_keys': list(bundle.plan.request_keys),
+        'type_codes': list(bundle.plan.type_codes),
+        'category_synonyms': {
+            str(col): synonyms for col, synonyms in (categories.synonyms.items() if categories is not None else ())
+        },
+    }
+
+    return {
+        'meta': np.array(json.dumps(meta)),
+        'float_columns': np.array([f['flat_feature_index'] for f in float_features], dtype=np.int32),
+        'cat_columns': np.array([f['flat_feature_index'] for f in cat_features], dtype=np.int32),
+        'bin_kind': np.array(bin_kind, dtype=np.int8),
+        'bin_source': np.array(bin_source, dtype=np.int32),
+        'bin_border': np.array(bin_border, dtype=np.float32),
+        'bin_value': np.array(bin_value, dtype=np.int64),
+        'bin_nan_true': np.array(bin_nan_true, dtype=bool),
+        'ctr_kind': np.array(ctr_kind, dtype=np.int8),
+        'ctr_table': np.array(ctr_table, dtype=np.int32),
+        'ctr_target_border': np.array(ctr_target_border, dtype=np.int32),
+        'ctr_params': np.array(ctr_params, dtype=np.float32).reshape(len(ctrs), 4),
+        'ctr_projection': ctr_projection,
+        'table_offsets': table_offsets,
+        'table_hashes': np.concatenate([hashes for hashes, _, _ in tables]) if tables else np.zeros(0, dtype=np.uint64),
+        'table_counts': table_counts,
+        'table_denominators': np.array([denominator for _, _, denominator in tables], dtype=np.int64),
+        'tree_depths': np.array(depths, dtype=np.int32),
+        'tree_splits': tree_splits,
+        'leaf_offsets': leaf_offsets,
+        'leaf_values': np.array([v for tree in trees for v in tree['leaf_values']], dtype=np.float64),
+        'scale': np.array(scale, dtype=np.float64),
+        'bias': np.array(biases[0], dtype=np.float64),
+        'category_columns': np.array(category_columns, dtype=np.int32),
+        'category_ctr_offsets': category_ctr_offsets,
+        'category_ctr_keys': category_ctr_keys,
+        'category_one_hot_offsets': category_one_hot_offsets,
+        'category_one_hot': category_one_hot,
+    }
+
+
+def pack_hash_sets(sets: List[frozenset], dtype: type) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenate hash sets into (offsets, sorted values) arrays"""
+    offsets = np.cumsum([0] + [len(values) for values in sets]).astype(np.int64)
+    values = [v for hashes in sets for v in sorted(hashes)]
+    return offsets, np.array(values, dtype=dtype)
+
+
+# ============================================================================
+# VERIFICATION
+# ============================================================================
+
+def sample_requests(plan: main.FeaturePlan, n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Random patients recombined from the test fixtures
+
+    Each field takes a value from a random fixture, is left missing, or (for
+    text fields) gets a value the model has never seen. Fields the API
+    rejects when missing (model-categorical columns encoded as numeric
+    strings) are always filled, so every patient is scorable.
+    """
+    from test_api import LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT
+
+    example = main.PredictionRequest.model_config["json_schema_extra"]["example"]
+    fixtures = [example, LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT]
+    required = {key for _, key, code in plan.columns if code == main.FEATURE_NUMERIC_STRING}
+    rng = random.Random(seed)
+
+    requests = [dict(fixture) for fixture in fixtures]
+    for _ in range(n):
+        request = {}
+        for key in main.PredictionRequest.model_fields:
+            roll = rng.random()
+            if roll < 0.2 and key not in required:
+                continue
+            value = rng.choice(fixtures).get(key)
+            if roll < 0.25 and isinstance(value, str):
+                value = f"unseen-{rng.randrange(1000)}"
+            request[key] = value
+        requests.append(request)
+    return requests
+
+
+def frame_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Rows of a cohort frame as request dictionaries (missing values as None)"""
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+def verify(bundle: main.ModelBundle, flat: FlatModel, records: List[Dict[str, Any]], tolerance: float,
+           X: Optional[np.ndarray] = None) -> bool:
+    """
+    Compare flat scorer probabilities with CatBoost predict_proba, end to end
+
+    The flat scorer encodes the raw records itself (FlatModel.encode_records);
+    CatBoost scores the service's encoding of the same records (X, by default
+    main.encode_requests). Every row must score on both sides: a row either
+    side rejects fails the verification instead of being skipped.
+    """
+    if X is None:
+        X = main.encode_requests(bundle.plan, records)
+
+    try:
+        expected = bundle.model.predict_proba(main.build_model_input(bundle.plan, X))[:, 1]
+        actual = flat.score_records(records)
+    except (CatBoostError, ValueError) as e:
+        print(f"  ✗ {len(records):,} rows  |  scoring failed: {e}")
+        return False
+
+    diff = np.abs(expected - actual)
+    labels_agree = np.array_equal(main.predict_labels(expected), main.predict_labels(actual))
+    ok = bool(diff.max(initial=0.0) <= tolerance) and labels_agree
+
+    print(f"  {'✓' if ok else '✗'} {len(records):,} rows  |  max |Δp| {diff.max(initial=0.0):.3g}  |  "
+          f"mean |Δp| {diff.mean() if len(diff) else 0.0:.3g}  |  labels identical: {labels_agree}")
+    return ok
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def run(args: argparse.Namespace) -> int:
+    if not os.path.exists(args.model):
+        print(f"✗ Model file not found at {args.model}")
+        return 1
+
+    bundle = main.load_bundle(args.model, args.version or main.MODEL_VERSION)
+    arrays = export_flat_model(bundle)
+    np.savez_compressed(args.output, **arrays)
+    print(f"✓ Exported {len(arrays['tree_depths'])} trees, {len(arrays['bin_kind'])} binary features, "
+          f"{len(arrays['ctr_kind'])} CTRs to {args.output} ({os.path.getsize(args.output) / 1024:.1f} KiB)")
+
+    # Verify the file as written, not the in-memory arrays
+    flat = FlatModel.load(args.output)
+    print("\nParity with CatBoost predict_proba:")
+    ok = verify(bundle, flat, sample_requests(bundle.plan, args.samples), args.tolerance)
+
+    if args.verify_data:
+        from bulk_score import INPUT_FORMATS, detect_format, read_chunks
+        fmt = detect_format(args.verify_data, INPUT_FORMATS)
+        for frame in read_chunks(args.verify_data, fmt, chunk_size=10000):
+            records = frame_records(frame)
+            ok = verify(bundle, flat, records, args.tolerance, X=main.encode_frame(bundle.plan, frame)) and ok
+
+    print(f"\n{'✓ Export verified' if ok else '✗ Export does not match the model'}")
+    return 0 if ok else 1
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    default_output = os.path.splitext(main.MODEL_PATH)[0] + '.npz'
+    parser = argparse.ArgumentParser(description="Export the CatBoost model for the NumPy-only flat scorer")
+    parser.add_argument('--model', default=main.MODEL_PATH, help="Path to the .cbm model (default: MODEL_PATH)")
+    parser.add_argument('--output', default=default_output, help=f"Output .npz file (default: {default_output})")
+    parser.add_argument('--version', default=None, help="Version label stored in the export (default: MODEL_VERSION)")
+    parser.add_argument('--samples', type=int, default=2000, help="Random patients used for verification (default: 2000)")
+    parser.add_argument('--verify-data', default=None, help="Also verify on a .csv/.parquet/.jsonl cohort file")
+    parser.add_argument('--tolerance', type=float, default=1e-6, help="Max allowed probability difference (default: 1e-6)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
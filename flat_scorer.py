@@ -0,0 +1,281 @@
+"""
+Standalone scorer for Cancer Progression Prediction models
+Scores a model exported by export_model.py with NumPy only
+
+The exported file holds the model as flat arrays: oblivious tree splits and
+leaf values, float feature borders, one-hot values and the categorical CTR
+tables, plus the API's category normalization vocabulary and synonyms. Categorical values are hashed with CityHash64 exactly like CatBoost,
+so probabilities match CatBoostClassifier.predict_proba to float rounding.
+
+No catboost, pandas or FastAPI import is needed, which keeps edge and sidecar
+images small and start-up fast; ship catboost_hash.py alongside this file.
+
+Usage:
+    from flat_scorer import FlatModel
+
+    model = FlatModel.load('catboost_cancer_progression_model.npz')
+    probabilities = model.score_records([patient_dict, ...])
+"""
+
+import json
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from catboost_hash import CTR_KEY_MULT, CategoryNormalizer, cat_feature_hash
+
+FLAT_FORMAT_VERSION = 1
+
+# Request encoding type codes (same values as main.FEATURE_*)
+FEATURE_CATEGORICAL = 0
+FEATURE_NUMERIC = 1
+FEATURE_NUMERIC_STRING = 2
+
+# Binary feature kinds, in CatBoost's binary feature order
+BIN_FLOAT = 0
+BIN_ONE_HOT = 1
+BIN_CTR = 2
+
+# Memoized (feature, value) pairs for category normalization (as main.py)
+CATEGORY_MEMO_SIZE = 50000
+
+# CTR kinds
+CTR_BORDERS = 0     # binary target counts per bucket
+CTR_BUCKETS = 1     # per-class counts per bucket
+CTR_COUNTER = 2     # value frequency
+
+
+# ============================================================================
+# MODEL
+# ============================================================================
+
+_CTR_HASH_MULT = np.uint64(CTR_KEY_MULT)
+
+
+def _combine_hash(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """CatBoost's CalcHash(a, b) on uint64 arrays (wrapping arithmetic)"""
+    with np.errstate(over='ignore'):
+        return _CTR_HASH_MULT * (a + _CTR_HASH_MULT * b)
+
+
+class FlatModel:
+    """
+    CatBoost binary classifier evaluated from flat NumPy arrays
+
+    Create with FlatModel.load(); see export_model.py for the array layout.
+    Scoring is vectorized over rows, trees and CTRs; only categorical
+    hashing and CTR table lookups touch individual values.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        meta = json.loads(str(arrays['meta']))
+        if meta.get('format_version') != FLAT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported flat model format: {meta.get('format_version')}")
+
+        self.meta = meta
+        self.version: str = meta.get('model_version', '')
+        self.feature_names: List[str] = meta['feature_names']
+        self.request_keys: List[str] = meta['request_keys']
+        self.type_codes: List[int] = meta['type_codes']
+        self.n_features = len(self.feature_names)
+        self.columns = list(zip(range(self.n_features), self.request_keys, self.type_codes))
+
+        # Category normalization, as main.encode_requests applies it; exports
+        # made without it (or before it existed) carry no vocabulary
+        self.categories = None
+        category_columns = arrays.get('category_columns')
+        if category_columns is not None and len(category_columns):
+            ctr_offsets, ctr_keys = arrays['category_ctr_offsets'], arrays['category_ctr_keys'].tolist()
+            one_hot_offsets, one_hot = arrays['category_one_hot_offsets'], arrays['category_one_hot'].tolist()
+            vocabulary = {
+                col: (frozenset(ctr_keys[ctr_offsets[i]:ctr_offsets[i + 1]]),
+                      frozenset(one_hot[one_hot_offsets[i]:one_hot_offsets[i + 1]]))
+                for i, col in enumerate(category_columns.tolist())
+            }
+            synonyms = {int(col): mapping for col, mapping in meta.get('category_synonyms', {}).items()}
+            self.categories = CategoryNormalizer(vocabulary, synonyms, CATEGORY_MEMO_SIZE)
+
+        self.float_columns = arrays['float_columns']
+        self.cat_columns = arrays['cat_columns']
+
+        # Binary features by kind: output column, source column, threshold
+        kind = arrays['bin_kind']
+        self.n_bins = len(kind)
+        self.float_bins = np.flatnonzero(kind == BIN_FLOAT)
+        self.one_hot_bins = np.flatnonzero(kind == BIN_ONE_HOT)
+        self.ctr_bins = np.flatnonzero(kind == BIN_CTR)
+        self.bin_source = arrays['bin_source']
+        self.bin_border = arrays['bin_border']
+        self.bin_value = arrays['bin_value']
+        self.nan_true_bins = self.float_bins[arrays['bin_nan_true'][self.float_bins]]
+
+        # CTR tables: one dict per table from projection hash to a row of
+        # table_counts; a trailing zero row stands for unseen values
+        offsets = arrays['table_offsets']
+        table_hashes = arrays['table_hashes'].tolist()
+        self.table_index = [
+            {h: row for row, h in enumerate(table_hashes[offsets[t]:offsets[t + 1]], start=int(offsets[t]))}
+            for t in range(len(offsets) - 1)
+        ]
+        self.table_counts = np.vstack([arrays['table_counts'], np.zeros((1, arrays['table_counts'].shape[1]), dtype=np.int64)])
+        self.empty_bucket = len(self.table_counts) - 1
+
+        # Projection (cat positions, -1 padded) of each table, taken from its CTRs
+        ctr_kind = arrays['ctr_kind']
+        self.ctr_table = arrays['ctr_table']
+        self.table_projection = np.full((len(self.table_index), arrays['ctr_projection'].shape[1]), -1, dtype=np.int32)
+        self.table_projection[self.ctr_table] = arrays['ctr_projection']
+
+        # Per CTR: which count is "good" and whether the total is the table's
+        # counter denominator (Counter) or the bucket's count sum
+        self.ctr_good_column = np.where(
+            ctr_kind == CTR_COUNTER, 0,
+            np.where(ctr_kind == CTR_BORDERS, 1, arrays['ctr_target_border']),
+        )
+        self.ctr_is_counter = ctr_kind == CTR_COUNTER
+        self.ctr_denominator = arrays['table_denominators'][self.ctr_table].astype(np.float32)
+        prior_num, prior_denom, shift, scale = arrays['ctr_params'].T    # float32
+        self.ctr_prior_num, self.ctr_prior_denom, self.ctr_shift, self.ctr_scale = prior_num, prior_denom, shift, scale
+
+        # Trees: split slots of missing depth levels point at an always-false
+        # extra column (index n_bins) and carry zero weight
+        tree_splits = arrays['tree_splits']
+        self.tree_splits = np.where(tree_splits < 0, self.n_bins, tree_splits)
+        self.split_weights = np.where(tree_splits < 0, 0, 1 << np.arange(tree_splits.shape[1])).astype(np.int64)
+        self.leaf_offsets = arrays['leaf_offsets']
+        self.leaf_values = arrays['leaf_values']
+        self.tree_count = len(self.leaf_offsets)
+        self.scale = float(arrays['scale'])
+        self.bias = float(arrays['bias'])
+
+    @classmethod
+    def load(cls, path: str) -> 'FlatModel':
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+
+    def encode_records(self, records: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """
+        Encode request dictionaries into a feature matrix
+
+        Same rules as main.encode_requests: categorical fields become strings
+        ('Unknown' when missing) mapped onto their training spelling when the
+        export carries a category vocabulary, numeric fields floats (NaN when
+        missing).
+
+        Returns:
+            Object array of shape (len(records), n_features)
+        """
+        X = np.empty((len(records), self.n_features), dtype=object)
+        nan = np.nan
+        normalized = self.categories.columns if self.categories is not None else ()
+        canonical = self.categories.canonical if self.categories is not None else None
+
+        for row, values in enumerate(records):
+            out = X[row]
+            for col, key, code in self.columns:
+                value = values.get(key)
+                missing = value is None or value == '' or value == 'None'
+                if code == FEATURE_CATEGORICAL:
+                    if missing:
+                        out[col] = 'Unknown'
+                    elif col in normalized:
+                        out[col] = canonical(col, str(value))
+                    else:
+                        out[col] = str(value)
+                elif missing:
+                    out[col] = nan
+                else:
+                    try:
+                        value = float(value)
+                    except (ValueError, TypeError):
+                        value = nan
+                    out[col] = str(value) if code == FEATURE_NUMERIC_STRING else value
+
+        return X
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+
+    def _hash_categoricals(self, X: np.ndarray) -> np.ndarray:
+        """Signed 32-bit CatBoost hashes of the categorical columns, as int64"""
+        values = X[:, self.cat_columns].ravel().tolist()
+        try:
+            hashed = [cat_feature_hash(v) for v in values]
+        except AttributeError:
+            # CatBoost rejects non-string categorical values (e.g. NaN)
+            bad = next(i for i, v in enumerate(values) if not isinstance(v, str))
+            name = self.feature_names[self.cat_columns[bad % len(self.cat_columns)]]
+            raise ValueError(f"Categorical feature {name} must be a string, got {values[bad]!r}") from None
+        return np.array(hashed, dtype=np.int64).reshape(len(X), len(self.cat_columns))
+
+    def _calc_ctrs(self, cat_hashes: np.ndarray) -> np.ndarray:
+        """CTR values (float32), shape (n_rows, n_ctrs)"""
+        n = len(cat_hashes)
+        # Sign-extend the 32-bit hashes to uint64, as CatBoost does
+        unsigned = cat_hashes.astype(np.uint64)
+
+        # Hash of each table's cat feature combination: (n_rows, n_tables)
+        projection_hash = np.zeros((n, len(self.table_index)), dtype=np.uint64)
+        for level in range(self.table_projection.shape[1]):
+            positions = self.table_projection[:, level]
+            combined = _combine_hash(projection_hash, unsigned[:, np.maximum(positions, 0)])
+            projection_hash = np.where(positions >= 0, combined, projection_hash)
+
+        bucket = np.empty(projection_hash.shape, dtype=np.int64)
+        for t, index in enumerate(self.table_index):
+            bucket[:, t] = [index.get(h, self.empty_bucket) for h in projection_hash[:, t].tolist()]
+
+        counts = self.table_counts[bucket[:, self.ctr_table]]        # (n_rows, n_ctrs, width)
+        good = np.take_along_axis(counts, self.ctr_good_column[None, :, None], axis=2)[:, :, 0].astype(np.float32)
+        total = np.where(self.ctr_is_counter, self.ctr_denominator, counts.sum(axis=2).astype(np.float32))
+
+        # Same float32 arithmetic as CatBoost's TModelCtr::Calc
+        return ((good + self.ctr_prior_num) / (total + self.ctr_prior_denom) + self.ctr_shift) * self.ctr_scale
+
+    def _binarize(self, X: np.ndarray) -> np.ndarray:
+        """Evaluate every split condition: (n_rows, n_bins + 1), last column False"""
+        bins = np.zeros((len(X), self.n_bins + 1), dtype=bool)
+
+        if len(self.float_bins):
+            floats = X[:, self.float_columns].astype(np.float32)
+            bins[:, self.float_bins] = floats[:, self.bin_source[self.float_bins]] > self.bin_border[self.float_bins]
+            if len(self.nan_true_bins):
+                bins[:, self.nan_true_bins] |= np.isnan(floats[:, self.bin_source[self.nan_true_bins]])
+
+        if len(self.cat_columns):
+            cat_hashes = self._hash_categoricals(X)
+            if len(self.one_hot_bins):
+                bins[:, self.one_hot_bins] = (
+                    cat_hashes[:, self.bin_source[self.one_hot_bins]] == self.bin_value[self.one_hot_bins]
+                )
+            if len(self.ctr_bins):
+                ctrs = self._calc_ctrs(cat_hashes)
+                bins[:, self.ctr_bins] = ctrs[:, self.bin_source[self.ctr_bins]] > self.bin_border[self.ctr_bins]
+
+        return bins
+
+    def predict_raw(self, X: np.ndarray) -> np.ndarray:
+        """Raw formula values (log-odds) for an encoded feature matrix"""
+        X = np.asarray(X, dtype=object)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected a matrix with {self.n_features} columns, got shape {X.shape}")
+
+        bins = self._binarize(X)
+        # Leaf index per row and tree: split d of a tree sets bit d
+        leaves = (bins[:, self.tree_splits] * self.split_weights).sum(axis=2)
+        raw = self.leaf_values[self.leaf_offsets + leaves].sum(axis=1)
+        return self.scale * raw + self.bias
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities, shape (n_rows, 2), like CatBoostClassifier.predict_proba"""
+        positive = 1.0 / (1.0 + np.exp(-self.predict_raw(X)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def score_records(self, records: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Progression probabilities for request dictionaries"""
+        return self.predict_proba(self.encode_records(records))[:, 1]
@@ -0,0 +1,123 @@
+"""
+Gunicorn configuration for multi-worker serving
+
+The app (and with it the CatBoost model) is loaded once in the master
+process before workers are forked, so all workers share the same
+read-only model pages copy-on-write instead of each loading their own copy.
+
+Usage:
+    gunicorn main:app -c gunicorn.conf.py
+
+Environment:
+    WEB_CONCURRENCY     Worker processes (default: usable CPU cores)
+    INFERENCE_WORKERS   Inference threads per worker (default: cores / workers)
+    MODEL_THREAD_COUNT  CatBoost threads per model call (default: cores / workers)
+    MODEL_RELOAD_FILE   File through which a model reload reaches every worker
+                        (default: one per server in the temp directory)
+    METRICS_MULTIPROC_DIR
+                        Directory where workers share /metrics snapshots
+                        (default: one per server in the temp directory)
+    PORT                Port to bind (default: 8000)
+"""
+
+import os
+import shutil
+import tempfile
+from typing import Dict, Mapping
+
+
+def usable_cpu_count(cgroup_root: str = '/sys/fs/cgroup') -> int:
+    """
+    CPU cores this process may actually use
+
+    Honors CPU affinity and a cgroup v2 / v1 CPU quota (containers often
+    report the host's core count through os.cpu_count()). A fractional
+    quota is rounded down, to at least one core.
+    """
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+
+    quota = None
+    try:
+        with open(os.path.join(cgroup_root, 'cpu.max')) as f:
+            limit, period = f.read().split()
+            if limit != 'max':
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open(os.path.join(cgroup_root, 'cpu', 'cpu.cfs_quota_us')) as f:
+                limit = int(f.read())
+            with open(os.path.join(cgroup_root, 'cpu', 'cpu.cfs_period_us')) as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cores = min(cores, max(1, int(quota)))
+    return max(1, cores)
+
+
+def recommended_workers(cores: int) -> int:
+    """One worker per core: inference is CPU-bound and releases the GIL
+    only inside CatBoost, so more processes than cores just adds contention"""
+    return max(1, cores)
+
+
+def serving_layout(cores: int, env: Mapping[str, str]) -> Dict[str, int]:
+    """
+    Worker processes and per-worker thread counts for `cores` cores
+
+    The cores are split between workers so each process' inference threads
+    and CatBoost's own threads do not oversubscribe the machine. Values set
+    in env (WEB_CONCURRENCY, INFERENCE_WORKERS, MODEL_THREAD_COUNT) win.
+    """
+    workers = max(1, int(env.get('WEB_CONCURRENCY') or recommended_workers(cores)))
+    per_worker = max(1, cores // workers)
+    return {
+        'workers': workers,
+        'INFERENCE_WORKERS': int(env.get('INFERENCE_WORKERS') or per_worker),
+        'MODEL_THREAD_COUNT': int(env.get('MODEL_THREAD_COUNT') or per_worker),
+    }
+
+
+cores = usable_cpu_count()
+layout = serving_layout(cores, os.environ)
+workers = layout['workers']
+os.environ.setdefault('INFERENCE_WORKERS', str(layout['INFERENCE_WORKERS']))
+os.environ.setdefault('MODEL_THREAD_COUNT', str(layout['MODEL_THREAD_COUNT']))
+
+# Load the model in the master before forking
+preload_app = True
+os.environ.setdefault('PRELOAD_MODEL', 'true')
+
+# POST /admin/model/reload reaches every worker (and workers forked later)
+# through this file; it belongs to this server, so start without one
+os.environ.setdefault('MODEL_RELOAD_FILE',
+                      os.path.join(tempfile.gettempdir(), f'cancer-api-reload-{os.getpid()}.json'))
+
+
+# Any worker answering GET /metrics reports every worker, labelled by pid
+os.environ.setdefault('METRICS_MULTIPROC_DIR',
+                      os.path.join(tempfile.gettempdir(), f'cancer-api-metrics-{os.getpid()}'))
+
+
+def on_exit(server):
+    try:
+        os.remove(os.environ['MODEL_RELOAD_FILE'])
+    except OSError:
+        pass
+    shutil.rmtree(os.environ['METRICS_MULTIPROC_DIR'], ignore_errors=True)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = 'uvicorn.workers.UvicornWorker'
+timeout = 120
+graceful_timeout = 30
+
+if __name__ == '__main__':
+    # python gunicorn.conf.py: show the layout this machine would get
+    print(f"usable cores {cores}: {workers} workers x {layout['INFERENCE_WORKERS']} inference threads, "
+          f"MODEL_THREAD_COUNT {layout['MODEL_THREAD_COUNT']}")
@@ -7,32 +7,173 @@ Input: Patient features in JSON format
 Output: Cancer progression prediction with probability and risk level
 """
 
-from fastapi import FastAPI, HTTPException
+import time
+
+# Measured before the heavy imports for the startup timing breakdown
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError, create_model
+from typing import Optional, Dict, Any, List, Tuple, NamedTuple, Sequence
 import numpy as np
 import pandas as pd
-from catboost import CatBoostClassifier
-from sklearn.preprocessing import LabelEncoder
+from catboost import CatBoostClassifier, Pool
+from catboost_hash import CategoryNormalizer
 import os
+import asyncio
 import logging
+import queue
+import random
+import threading
+import hashlib
+import secrets
+import sqlite3
+import sys
+import json
+import tempfile
+import glob
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import pickle
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    import orjson
+except ImportError:  # optional: only needed for FAST_JSON_ENABLED
+    orjson = None
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Logging: "text" or "json" lines on stderr; with LOG_ASYNC a writer
+# thread does the formatting and I/O so serving never blocks on stderr
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_ASYNC = os.getenv('LOG_ASYNC', 'true').lower() in ('1', 'true', 'yes')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))    # records; beyond this they are dropped
+# Fraction of per-prediction log lines emitted (errors are always logged)
+PREDICTION_LOG_SAMPLE_RATE = float(os.getenv('PREDICTION_LOG_SAMPLE_RATE', '1.0'))
 logger = logging.getLogger(__name__)
 
 # Model path - works both locally and on Render
 MODEL_PATH = os.getenv('MODEL_PATH', './catboost_cancer_progression_model.cbm')
+MODEL_VERSION = os.getenv('MODEL_VERSION', '1.0.0')
+
+# Decision threshold: probability above which a patient is labelled "Progression"
+PREDICTION_THRESHOLD = float(os.getenv('PREDICTION_THRESHOLD', '0.5'))
+
+# Risk level thresholds (probability at or above which a level applies)
+RISK_HIGH_THRESHOLD = float(os.getenv('RISK_HIGH_THRESHOLD', '0.7'))
+RISK_MEDIUM_THRESHOLD = float(os.getenv('RISK_MEDIUM_THRESHOLD', '0.4'))
+
+# Model input format: "pool" (catboost.Pool built straight from the encoded
+# NumPy matrix, no pandas involved) or "pandas" (DataFrame)
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'pool').lower()
+
+# Inference worker pool (keeps CatBoost work off the event loop)
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', str(os.cpu_count() or 1)))
+INFERENCE_QUEUE_SIZE = int(os.getenv('INFERENCE_QUEUE_SIZE', '64'))     # max queued + running jobs
+INFERENCE_TIMEOUT = float(os.getenv('INFERENCE_TIMEOUT', '30'))         # seconds per request
+INFERENCE_RETRY_AFTER = int(os.getenv('INFERENCE_RETRY_AFTER', '1'))    # Retry-After on 429
+
+# Dynamic micro-batching of concurrent /predict calls (opt-in)
+MICROBATCH_ENABLED = os.getenv('MICROBATCH_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+MICROBATCH_MAX_WAIT_MS = float(os.getenv('MICROBATCH_MAX_WAIT_MS', '2'))
+MICROBATCH_MAX_SIZE = int(os.getenv('MICROBATCH_MAX_SIZE', '64'))
+
+# Prediction cache keyed by the encoded feature vector (size 0 disables it)
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '10000'))
+PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', '300'))  # seconds
+PREDICTION_CACHE_MAX_BATCH = int(os.getenv('PREDICTION_CACHE_MAX_BATCH', '64'))  # larger batches bypass the caches
+
+# /explain and /batch-explain: SHAP contributions, cached per encoded feature
+# vector like predictions (size 0 disables the cache); top-k 0 returns all
+EXPLAIN_CACHE_SIZE = int(os.getenv('EXPLAIN_CACHE_SIZE', '2000'))
+EXPLAIN_TOP_K = int(os.getenv('EXPLAIN_TOP_K', '10'))
+
+# /what-if: variants of one patient scored together (cap per request)
+WHAT_IF_MAX_VARIANTS = int(os.getenv('WHAT_IF_MAX_VARIANTS', '1000'))
+
+# Streaming NDJSON scoring
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', '500'))                 # records per model call
+STREAM_SPOOL_BYTES = int(os.getenv('STREAM_SPOOL_BYTES', str(8 * 1024 * 1024)))  # upload kept in RAM up to this
+
+# Asynchronous batch jobs (/jobs): a SQLite queue processed in chunks by
+# background threads; progress survives restarts
+JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', '')                    # job queue database ('' disables jobs)
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', '1'))              # jobs processed at once (per process)
+JOBS_CHUNK_SIZE = int(os.getenv('JOBS_CHUNK_SIZE', '1000'))      # records per model call
+JOBS_INPUT_DIR = os.getenv('JOBS_INPUT_DIR', '')                # file jobs read from here ('' disables them)
+JOBS_LEASE_SECONDS = float(os.getenv('JOBS_LEASE_SECONDS', '60'))  # a running job with no progress for this long is resumed
+JOBS_MAX_YIELD_MS = float(os.getenv('JOBS_MAX_YIELD_MS', '200'))   # a chunk waits up to this for interactive inference to drain
+
+# Shadow and A/B models, next to MODEL_PATH (the primary): comma-separated
+# .cbm paths, each optionally "path=version". A/B entries end in ":weight",
+# the share of /predict and /batch-predict requests that model answers.
+# Shadows score a copy of the primary's traffic in the background.
+AB_MODELS = os.getenv('AB_MODELS', '')
+SHADOW_MODELS = os.getenv('SHADOW_MODELS', '')
+SHADOW_SAMPLE_RATE = float(os.getenv('SHADOW_SAMPLE_RATE', '1.0'))   # share of primary model calls mirrored
+SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE', '1000'))      # buffered calls; beyond this they are dropped
+SHADOW_BATCH_SIZE = int(os.getenv('SHADOW_BATCH_SIZE', '256'))       # rows merged into one shadow model call
+SHADOW_MAX_WAIT_MS = float(os.getenv('SHADOW_MAX_WAIT_MS', '250'))   # buffered rows are scored at least this often
+SHADOW_THREAD_COUNT = int(os.getenv('SHADOW_THREAD_COUNT', '1'))     # CatBoost threads per shadow model call
+SHADOW_MAX_YIELD_MS = float(os.getenv('SHADOW_MAX_YIELD_MS', '50'))  # a shadow call waits up to this for interactive inference to drain
+SHADOW_LOG_PATH = os.getenv('SHADOW_LOG_PATH', '')                   # per-row comparisons as JSON lines ('' disables)
+
+# Load the model at import time so a pre-fork server (gunicorn --preload)
+# shares one copy-on-write model image across its workers
+PRELOAD_MODEL = os.getenv('PRELOAD_MODEL', 'false').lower() in ('1', 'true', 'yes')
+
+# Threads CatBoost uses per predict call (-1 = all cores). Each inference
+# thread may call the model at once, so the default splits the cores between
+# them; gunicorn.conf.py further divides by the number of worker processes
+MODEL_THREAD_COUNT = int(os.getenv(
+    'MODEL_THREAD_COUNT', str(max(1, (os.cpu_count() or 1) // max(1, INFERENCE_WORKERS)))
+))
+
+# Synthetic warm-up inference before the API reports ready
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+WARMUP_BATCH_SIZE = int(os.getenv('WARMUP_BATCH_SIZE', '64'))
+
+# Fast JSON path for /predict and /batch-predict (opt-in, requires orjson):
+# orjson decoding/encoding and cheap type checks instead of full pydantic
+# request validation and FastAPI response serialization
+FAST_JSON_ENABLED = os.getenv('FAST_JSON_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+# Request fields the active model does not consume: "passthrough" keeps them
+# unvalidated on the parsed request, "drop" discards them
+REQUEST_UNUSED_FIELDS = os.getenv('REQUEST_UNUSED_FIELDS', 'passthrough').lower()
+
+# Shared secret for /admin endpoints (sent as X-Admin-Token); admin
+# endpoints are disabled when unset
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+# Hot-swap across worker processes: a reload request is written to this file
+# and every process watching it (all workers of one gunicorn server, which
+# sets it) reloads; '' = a reload only applies to the process receiving it
+MODEL_RELOAD_FILE = os.getenv('MODEL_RELOAD_FILE', '')
+MODEL_RELOAD_POLL_SECONDS = float(os.getenv('MODEL_RELOAD_POLL_SECONDS', '1'))
+
+# Map categorical inputs that differ from the training spelling only by
+# case, whitespace, separators or a known synonym onto that spelling
+CATEGORY_NORMALIZATION = os.getenv('CATEGORY_NORMALIZATION', 'true').lower() in ('1', 'true', 'yes')
+CATEGORY_MEMO_SIZE = int(os.getenv('CATEGORY_MEMO_SIZE', '50000'))     # distinct (feature, value) pairs
+
+# On-demand sampling profiler (POST /admin/profile)
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', '60'))    # longest window
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))     # default sampling interval
+
+# Prometheus metrics at /metrics (per-stage latency histograms, counters)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')         # workers share snapshots here ('' = this process only)
+METRICS_EXPORT_SECONDS = float(os.getenv('METRICS_EXPORT_SECONDS', '5'))  # how often each worker writes its snapshot
 
 # Feature order (MUST match training data)
 FEATURE_ORDER = [
@@ -75,7 +216,9 @@ CATEGORICAL_FEATURES = [
     'diagnoses.morphology',
 ]
 
-# Categorical feature mappings (learned from training data)
+# Categorical feature mappings (learned from training data). Not used for
+# encoding: the model was trained on the raw GDC strings (e.g. 'G1', 'Yes'),
+# not on these labels; see CategoryNormalizer
 CATEGORY_MAPPINGS = {
     'demographic.gender': {'female': 0, 'male': 1, 'unknown': 2},
     'diagnoses.tumor_grade': {'1': 0, '2': 1, '3': 2, '4': 3, 'unknown': 4},
@@ -92,6 +235,149 @@ CATEGORY_MAPPINGS = {
     'diagnoses.morphology': {'infiltrating_ductal_carcinoma': 0, 'adenocarcinoma': 1, 'small_cell_carcinoma': 2, 'unknown': 3},
 }
 
+# Spellings seen in requests -> training spelling (keys are compared
+# case-insensitively; a synonym is only used if the model knows its target)
+CATEGORY_SYNONYMS = {
+    'diagnoses.tumor_grade': {
+        '1': 'G1', '2': 'G2', '3': 'G3', '4': 'G4',
+        'grade 1': 'G1', 'grade 2': 'G2', 'grade 3': 'G3', 'grade 4': 'G4', 'x': 'GX',
+    },
+    'exposures.tobacco_smoking_status': {
+        'never': 'Lifelong Non-Smoker', 'non-smoker': 'Lifelong Non-Smoker', 'current': 'Current Smoker',
+    },
+    'demographic.race': {'black': 'black or african american', 'african american': 'black or african american'},
+    'demographic.ethnicity': {'hispanic': 'hispanic or latino', 'not hispanic': 'not hispanic or latino'},
+    'demographic.country_of_residence_at_enrollment': {
+        'usa': 'United States', 'us': 'United States', 'united states of america': 'United States',
+    },
+    'treatments.treatment_type': {
+        'surgery': 'Surgery, NOS', 'radiation': 'Radiation Therapy, NOS',
+        'radiation therapy': 'Radiation Therapy, NOS', 'pharmaceutical therapy': 'Pharmaceutical Therapy, NOS',
+    },
+}
+
+# ============================================================================
+# LOGGING
+# ============================================================================
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and extra fields"""
+
+    # Attributes every LogRecord has; anything else came in through extra=
+    RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in self.RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the writer thread
+    
+    The stock handler formats each record in the calling thread before
+    queueing it; here the record is queued as-is (it never leaves the
+    process). When the queue is full, records are dropped and counted
+    instead of blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging() -> Optional[logging.Handler]:
+    """
+    Install the stderr handler (text or JSON) on the root logger
+    
+    Like logging.basicConfig, does nothing if the root logger already has
+    handlers (logging configured by the embedding application).
+    
+    Returns:
+        The installed handler, or None
+    """
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    if root.handlers:
+        return None
+    
+    handler = logging.StreamHandler()
+    if LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    root.addHandler(handler)
+    return handler
+
+
+log_handler = configure_logging()
+log_queue_handler = None
+log_listener = None
+
+
+def start_async_logging():
+    """
+    Route records through a queue to a writer thread (LOG_ASYNC)
+    
+    Called per worker process at startup, so the writer thread is never
+    inherited across a pre-fork; records logged before that (imports,
+    preload) are written synchronously.
+    """
+    global log_queue_handler, log_listener
+    if not LOG_ASYNC or log_handler is None or log_listener is not None:
+        return
+    
+    log_queue = queue.Queue(maxsize=max(0, LOG_QUEUE_SIZE))
+    log_queue_handler = DeferredQueueHandler(log_queue)
+    log_listener = QueueListener(log_queue, log_handler, respect_handler_level=True)
+    log_listener.start()
+    
+    root = logging.getLogger()
+    root.addHandler(log_queue_handler)
+    root.removeHandler(log_handler)
+
+
+def stop_async_logging():
+    """Flush queued records and write synchronously again"""
+    global log_listener
+    if log_listener is None:
+        return
+    
+    root = logging.getLogger()
+    root.addHandler(log_handler)
+    root.removeHandler(log_queue_handler)
+    log_listener.stop()
+    log_listener = None
+    if log_queue_handler.dropped:
+        logger.warning(f"⚠ {log_queue_handler.dropped} log records dropped (log queue full)")
+
+
+def log_prediction_sampled() -> bool:
+    """Whether to emit this per-prediction log line (PREDICTION_LOG_SAMPLE_RATE)"""
+    if PREDICTION_LOG_SAMPLE_RATE < 1.0 and random.random() >= PREDICTION_LOG_SAMPLE_RATE:
+        return False
+    return logger.isEnabledFor(logging.INFO)
+
+
 # ============================================================================
 # FASTAPI APP SETUP
 # ============================================================================
@@ -119,6 +405,21 @@ model = None
 model_loaded = False
 model_feature_names = []
 model_categorical_indices = []
+model_version = MODEL_VERSION
+feature_plan = None
+inference_executor = None
+inference_slots = threading.BoundedSemaphore(max(1, INFERENCE_QUEUE_SIZE))
+inference_in_flight = 0             # interactive jobs queued or running in the pool
+inference_in_flight_lock = threading.Lock()
+profile_lock = threading.Lock()     # one profiling window at a time
+micro_batcher = None
+prediction_cache = None
+explanation_cache = None
+metrics = None
+model_registry = None
+job_store = None
+job_runner = None
+shadow_scorer = None
 
 # ============================================================================
 # PYDANTIC MODELS (Request/Response)
@@ -183,8 +484,8 @@ class PredictionRequest(BaseModel):
     pathology_details_epithelioid_cell_percent: Optional[float] = None
     pathology_details_spindle_cell_percent: Optional[float] = None
 
-    class Config:
-        schema_extra = {
+    model_config = {
+        "json_schema_extra": {
             "example": {
                 "cases_disease_type": "cancer",
                 "cases_primary_site": "lung",
@@ -244,6 +545,7 @@ class PredictionRequest(BaseModel):
                 "pathology_details_spindle_cell_percent": 30
             }
         }
+    }
 
 
 class PredictionResponse(BaseModel):
@@ -255,7 +557,43 @@ class PredictionResponse(BaseModel):
     risk_level: str
     model_confidence: float
     timestamp: str
-    model_version: str = "1.0.0"
+    model_version: str = MODEL_VERSION
+
+
+class ModelReloadRequest(BaseModel):
+    """Admin request to load and activate a model"""
+    path: Optional[str] = None      # defaults to MODEL_PATH
+    version: Optional[str] = None   # defaults to the model file fingerprint
+
+
+class WhatIfVariant(BaseModel):
+    """One what-if scenario: field values that replace the base patient's"""
+    name: Optional[str] = None      # defaults to "field=value; ..."
+    changes: Dict[str, Any]         # request field or model feature name -> value
+
+
+class WhatIfRequest(BaseModel):
+    """Base patient plus explicit variants and/or one-at-a-time value grids"""
+    patient: Dict[str, Any]
+    variants: List[WhatIfVariant] = []
+    grid: Dict[str, List[Any]] = {}     # field -> values, one variant per value
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "patient": {"diagnoses_age_at_diagnosis": 65, "exposures_tobacco_smoking_status": "Current Smoker"},
+                "variants": [{"name": "quit smoking", "changes": {"exposures_tobacco_smoking_status": "Former Smoker"}}],
+                "grid": {"diagnoses_age_at_diagnosis": [45, 55, 75]}
+            }
+        }
+    }
+
+
+class JobRequest(BaseModel):
+    """Batch job submission: inline records or a file under JOBS_INPUT_DIR"""
+    records: Optional[List[Dict[str, Any]]] = None
+    path: Optional[str] = None          # .csv, .parquet or .jsonl, relative to JOBS_INPUT_DIR
+    id_column: Optional[str] = None     # copied from each input record to its result
 
 
 class HealthResponse(BaseModel):
@@ -270,43 +608,123 @@ class HealthResponse(BaseModel):
 # ============================================================================
 
 def load_model():
-    """Load CatBoost model from disk"""
-    global model, model_loaded, model_feature_names, model_categorical_indices
-    
+    """Load the model at MODEL_PATH and make it the active model"""
     try:
         if os.path.exists(MODEL_PATH):
-            model = CatBoostClassifier()
-            model.load_model(MODEL_PATH)
-            model_loaded = True
-            
-            # Get feature names from model
-            model_feature_names = list(model.feature_names_) if model.feature_names_ else []
-            
-            if model_feature_names:
-                logger.info(f"✓ Model loaded successfully from {MODEL_PATH}")
-                logger.info(f"✓ Model expects {len(model_feature_names)} features")
-                logger.info(f"✓ Features: {model_feature_names}")
-                
-                # Identify which features are categorical
-                model_categorical_indices = []
-                for i, feat in enumerate(model_feature_names):
-                    if feat in CATEGORICAL_FEATURES:
-                        model_categorical_indices.append(i)
-                logger.info(f"✓ Categorical feature indices: {model_categorical_indices}")
-            else:
-                logger.warning("⚠ Model loaded but feature names not available")
-            
+            model_registry.activate(load_bundle(MODEL_PATH, MODEL_VERSION))
             return True
         else:
             logger.error(f"✗ Model file not found at {MODEL_PATH}")
-            model_loaded = False
             return False
     except Exception as e:
         logger.error(f"✗ Error loading model: {str(e)}")
-        model_loaded = False
         return False
 
 
+def warm_up_model() -> bool:
+    """
+    Score the schema example once so the first real request does not pay
+    one-time allocation and initialization costs
+    
+    Returns:
+        True if warm-up inference succeeded
+    """
+    bundle = model_registry.active
+    if bundle is None or bundle.plan is None:
+        return False
+    
+    try:
+        warm_up_bundle(bundle)
+        return True
+    except Exception as e:
+        logger.warning(f"⚠ Warm-up inference failed: {str(e)}")
+        return False
+
+
+def parse_model_specs(value: str, weighted: bool = False) -> List[Tuple[str, Optional[str], float]]:
+    """
+    Parse an AB_MODELS / SHADOW_MODELS setting
+    
+    Args:
+        value: Comma-separated "path[=version]" entries, each followed by
+            ":weight" when weighted
+        weighted: Entries carry an A/B weight
+    
+    Returns:
+        (path, version or None, weight) per entry; weight is 0.0 unweighted
+    
+    Raises:
+        ValueError: On an entry without a valid weight, or weights summing above 1
+    """
+    specs = []
+    for entry in filter(None, (part.strip() for part in value.split(','))):
+        weight = 0.0
+        if weighted:
+            spec, _, raw_weight = entry.rpartition(':')
+            try:
+                weight = float(raw_weight)
+            except ValueError:
+                spec = ''
+            if not spec or not 0 < weight <= 1:
+                raise ValueError(f"'{entry}' is not path[=version]:weight with 0 < weight <= 1")
+            entry = spec
+        path, _, version = entry.partition('=')
+        specs.append((path.strip(), version.strip() or None, weight))
+    
+    if sum(weight for _, _, weight in specs) > 1 + 1e-9:
+        raise ValueError("A/B weights add up to more than 1")
+    return specs
+
+
+def load_variant_bundles(setting: str, value: str, weighted: bool = False) -> List[Tuple['ModelBundle', float]]:
+    """
+    Load and warm up the models of an AB_MODELS / SHADOW_MODELS setting
+    
+    A model that cannot be loaded or cannot score requests is logged and
+    skipped; the primary model keeps serving either way.
+    
+    Returns:
+        (bundle, weight) per loaded model
+    """
+    try:
+        specs = parse_model_specs(value, weighted)
+    except ValueError as e:
+        logger.error(f"✗ {setting} ignored: {str(e)}")
+        return []
+    
+    bundles = []
+    for path, version, weight in specs:
+        try:
+            bundle = load_bundle(path, version)
+            if bundle.plan is None:
+                raise ValueError("model has no feature names")
+            if WARMUP_ENABLED:
+                warm_up_bundle(bundle)
+            bundles.append((bundle, weight))
+        except Exception as e:
+            logger.error(f"✗ {setting}: cannot use {path}: {str(e)}")
+    return bundles
+
+
+def load_model_variants():
+    """Load the A/B variants and shadow models next to the active model and start the shadow scorer"""
+    global shadow_scorer
+    primary = model_registry.active
+    if primary is None:
+        return
+    
+    model_registry.variants = load_variant_bundles('AB_MODELS', AB_MODELS, weighted=True)
+    for bundle, weight in model_registry.variants:
+        logger.info(f"✓ A/B variant {bundle.version} answers {weight:.1%} of /predict and /batch-predict requests")
+    
+    shadows = [bundle for bundle, _ in load_variant_bundles('SHADOW_MODELS', SHADOW_MODELS)]
+    if shadows:
+        shadow_scorer = ShadowScorer(shadows, SHADOW_SAMPLE_RATE, SHADOW_QUEUE_SIZE, SHADOW_BATCH_SIZE, SHADOW_LOG_PATH)
+        shadow_scorer.bind_primary(primary)
+        shadow_scorer.start()
+        logger.info(f"✓ Shadow scoring: {len(shadows)} models, {SHADOW_SAMPLE_RATE:.0%} of primary traffic")
+
+
 def get_categorical_feature_names():
     """Get names of categorical features in correct order"""
     cat_feature_names = []
@@ -316,6 +734,35 @@ def get_categorical_feature_names():
     return cat_feature_names
 
 
+def encode_feature_value(feature_name: str, value: Any) -> Any:
+    """
+    Encode a single raw request value the way the model expects it
+    
+    Args:
+        feature_name: Model feature name (dot notation)
+        value: Raw value taken from the request data
+    
+    Returns:
+        Encoded value ('Unknown'/NaN for missing values, strings otherwise)
+    """
+    # Handle missing values based on feature type
+    if value is None or value == '' or value == 'None':
+        # For categorical features, use 'Unknown' as a valid string
+        if feature_name in CATEGORICAL_FEATURES:
+            return 'Unknown'
+        # For numeric features, use NaN
+        return np.nan
+    
+    # For numeric features, try to convert to float
+    if feature_name not in CATEGORICAL_FEATURES:
+        try:
+            value = float(value)
+        except (ValueError, TypeError):
+            value = np.nan
+    # For categorical features, keep as string
+    return str(value)
+
+
 def prepare_features(data: Dict[str, Any]) -> pd.DataFrame:
     """
     Prepare input features in correct order for model
@@ -326,43 +773,45 @@ def prepare_features(data: Dict[str, Any]) -> pd.DataFrame:
     Returns:
         Pandas DataFrame with features in correct order matching model training
     """
+    return prepare_features_batch([data])
+
+
+def prepare_features_batch(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Prepare input features for many patients as one columnar frame
+    
+    Each column is built in a single pass over the rows, so a batch costs
+    one DataFrame construction instead of one per patient.
+    
+    Args:
+        rows: List of dictionaries with feature values (underscores instead of dots)
+    
+    Returns:
+        Pandas DataFrame with one row per patient, in model feature order
+    """
     if model is None or not model_feature_names:
         raise ValueError("Model not loaded or feature names not available")
     
-    features = {}
+    columns = {}
+    categories = feature_plan.categories if feature_plan is not None else None
     
-    for feature_name in model_feature_names:
+    for col, feature_name in enumerate(model_feature_names):
         # Convert dot notation to underscore for lookup in request data
         key = feature_name.replace('.', '_')
-        
-        # Get value from input
-        value = data.get(key)
-        
-        # Handle missing values based on feature type
-        if value is None or value == '' or value == 'None':
-            # For categorical features, use 'Unknown' as a valid string
-            if feature_name in CATEGORICAL_FEATURES:
-                value = 'Unknown'
-            else:
-                # For numeric features, use NaN
-                value = np.nan
-        else:
-            # For numeric features, try to convert to float
-            if feature_name not in CATEGORICAL_FEATURES:
-                try:
-                    value = float(value)
-                except (ValueError, TypeError):
-                    value = np.nan
-            # For categorical features, keep as string
-            value = str(value)
-        
-        features[feature_name] = value
+        if categories is not None and col in categories.columns:
+            # Same category normalization as encode_requests
+            columns[feature_name] = [
+                'Unknown' if value is None or value == '' or value == 'None'
+                else categories.canonical(col, str(value))
+                for value in (row.get(key) for row in rows)
+            ]
+            continue
+        columns[feature_name] = [
+            encode_feature_value(feature_name, row.get(key)) for row in rows
+        ]
     
-    # Create DataFrame with features
-    df = pd.DataFrame([features])
-    
-    # Reorder to match model's expected feature order
-    df = df[model_feature_names]
+    # Create DataFrame with features in the model's expected order
+    df = pd.DataFrame(columns, columns=model_feature_names)
     
     # Ensure all categorical columns are object dtype (strings)
     # and replace any remaining NaN with 'Unknown'
@@ -377,11 +826,64 @@ def prepare_features(data: Dict[str, Any]) -> pd.DataFrame:
     return df
 
 
+def predict_labels(probabilities: np.ndarray) -> np.ndarray:
+    """
+    Derive class predictions from progression probabilities
+    
+    With the default threshold of 0.5 this matches CatBoostClassifier.predict
+    for binary Logloss models.
+    """
+    return (probabilities > PREDICTION_THRESHOLD).astype(int)
+
+
+def score_features(X: Any, bundle: Optional['ModelBundle'] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score prepared features with a single model inference
+    
+    Args:
+        X: Model input from build_model_input (or a prepare_features frame)
+        bundle: Model to use (default: the active model)
+    
+    Returns:
+        Tuple of (progression probabilities, class predictions)
+    """
+    bundle = bundle or model_registry.active
+    started = time.perf_counter()
+    probabilities = bundle.model.predict_proba(X, thread_count=MODEL_THREAD_COUNT)[:, 1]
+    if metrics is not None:
+        metrics.observe_stage('inference', time.perf_counter() - started)
+        metrics.batch_size.observe(len(probabilities))
+    return probabilities, predict_labels(probabilities)
+
+
+def check_thresholds():
+    """
+    Validate the decision and risk thresholds
+    
+    Raises:
+        ValueError: if a threshold is outside [0, 1] or the medium risk
+            threshold is above the high one
+    """
+    thresholds = {
+        "PREDICTION_THRESHOLD": PREDICTION_THRESHOLD,
+        "RISK_MEDIUM_THRESHOLD": RISK_MEDIUM_THRESHOLD,
+        "RISK_HIGH_THRESHOLD": RISK_HIGH_THRESHOLD,
+    }
+    for name, value in thresholds.items():
+        if not 0.0 <= value <= 1.0:
+            raise ValueError(f"{name} must be in [0, 1], got {value:g}")
+    if RISK_MEDIUM_THRESHOLD > RISK_HIGH_THRESHOLD:
+        raise ValueError(
+            f"RISK_MEDIUM_THRESHOLD ({RISK_MEDIUM_THRESHOLD:g}) must not exceed "
+            f"RISK_HIGH_THRESHOLD ({RISK_HIGH_THRESHOLD:g})"
+        )
+
+
 def get_risk_category(probability: float) -> str:
     """Determine risk category from probability"""
-    if probability >= 0.7:
+    if probability >= RISK_HIGH_THRESHOLD:
         return "High"
-    elif probability >= 0.4:
+    elif probability >= RISK_MEDIUM_THRESHOLD:
         return "Medium"
     else:
         return "Low"
@@ -392,167 +894,3723 @@ def get_progression_label(prediction: int) -> str:
     return "Progression" if prediction == 1 else "No Progression"
 
 
-# ============================================================================
-# ENDPOINTS
-# ============================================================================
+def build_batch_prediction(probability: float, prediction: int) -> Dict[str, Any]:
+    """Build one /batch-predict result entry"""
+    risk_level = get_risk_category(probability)
+    if metrics is not None:
+        metrics.count_prediction(risk_level)
+    return {
+        "prediction": prediction,
+        "probability": probability,
+        "risk_level": risk_level,
+        "label": get_progression_label(prediction)
+    }
 
-@app.on_event("startup")
-async def startup_event():
-    """Load model on startup"""
-    logger.info("Starting Cancer Progression Prediction API...")
-    load_model()
-    if model_loaded:
-        logger.info("✓ API ready for predictions")
-    else:
-        logger.warning("⚠️  Model not loaded - API will return errors for predictions")
+
+def format_validation_error(error: ValidationError) -> str:
+    """Flatten a pydantic ValidationError into a single line"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'body'}: {err['msg']}"
+        for err in error.errors()
+    )
 
 
-@app.get("/", tags=["Info"])
-async def root():
-    """Root endpoint with API information"""
+def prediction_confidence(probability: float) -> float:
+    """
+    Distance of a probability from PREDICTION_THRESHOLD, scaled to [0, 1]
+    
+    0 at the threshold, where the label flips, and 1 at probability 0 or 1;
+    each side is scaled separately, so an off-centre threshold still spans
+    the full range on both.
+    """
+    span = (1.0 - PREDICTION_THRESHOLD) if probability > PREDICTION_THRESHOLD else PREDICTION_THRESHOLD
+    return abs(probability - PREDICTION_THRESHOLD) / span if span > 0 else 0.0
+
+
+def build_prediction_payload(probability: float, prediction: int, version: Optional[str] = None) -> Dict[str, Any]:
+    """Field values of the /predict response for one scored patient"""
+    confidence = prediction_confidence(probability)
+    risk_level = get_risk_category(probability)
+    if metrics is not None:
+        metrics.count_prediction(risk_level)
+    
     return {
-        "name": "Cancer Progression Prediction API",
-        "version": "1.0.0",
-        "status": "running",
-        "model_loaded": model_loaded,
-        "endpoints": {
-            "health": "/health",
-            "predict": "/predict",
-            "docs": "/docs",
-            "openapi": "/openapi.json"
-        }
+        "success": True,
+        "prediction": int(prediction),
+        "progression_probability": float(probability),
+        "progression_label": get_progression_label(int(prediction)),
+        "risk_level": risk_level,
+        "model_confidence": float(confidence),
+        "timestamp": datetime.now().isoformat(),
+        "model_version": version or model_version
     }
 
 
-@app.get("/health", response_model=HealthResponse, tags=["Health"])
-async def health_check():
+def build_prediction_response(probability: float, prediction: int, version: Optional[str] = None) -> PredictionResponse:
+    """Build the /predict response for one scored patient"""
+    return PredictionResponse(**build_prediction_payload(probability, prediction, version))
+
+
+# ============================================================================
+# FEATURE PLAN
+# ============================================================================
+
+# Type codes used by the compiled feature plan
+FEATURE_CATEGORICAL = 0     # str(value), 'Unknown' when missing
+FEATURE_NUMERIC = 1         # float(value), NaN when missing or not a number
+FEATURE_NUMERIC_STRING = 2  # str(float(value)), for model-categorical columns
+                            # that are not listed in CATEGORICAL_FEATURES
+
+
+class FeaturePlan(NamedTuple):
+    """Immutable description of how request fields map onto model columns"""
+    feature_names: Tuple[str, ...]
+    request_keys: Tuple[str, ...]
+    type_codes: Tuple[int, ...]
+    cat_feature_indices: Tuple[int, ...]
+    columns: Tuple[Tuple[int, str, int], ...]
+    categories: Optional[Any] = None    # CategoryNormalizer, set at model load
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_names)
+
+
+def build_feature_plan(feature_names: Sequence[str], cat_feature_indices: Sequence[int]) -> FeaturePlan:
     """
-    Health check endpoint
+    Compile the feature encoding for a model
+    
+    Type codes reproduce prepare_features exactly, except that model-numeric
+    columns are emitted as floats instead of numeric strings (CatBoost parses
+    both to the same value).
+    
+    Args:
+        feature_names: Model feature names (dot notation), in model order
+        cat_feature_indices: Indices the model treats as categorical
     
     Returns:
-        Health status and model availability
+        FeaturePlan for encode_requests
     """
-    return HealthResponse(
-        status="healthy" if model_loaded else "degraded",
-        model_loaded=model_loaded,
-        timestamp=datetime.now().isoformat()
+    categorical = set(CATEGORICAL_FEATURES)
+    model_categorical = set(cat_feature_indices)
+    
+    request_keys = []
+    type_codes = []
+    for i, feature_name in enumerate(feature_names):
+        request_keys.append(feature_name.replace('.', '_'))
+        if feature_name in categorical:
+            type_codes.append(FEATURE_CATEGORICAL)
+        elif i in model_categorical:
+            type_codes.append(FEATURE_NUMERIC_STRING)
+        else:
+            type_codes.append(FEATURE_NUMERIC)
+    
+    return FeaturePlan(
+        feature_names=tuple(feature_names),
+        request_keys=tuple(request_keys),
+        type_codes=tuple(type_codes),
+        cat_feature_indices=tuple(sorted(model_categorical)),
+        columns=tuple(zip(range(len(feature_names)), request_keys, type_codes)),
     )
 
 
-@app.post("/predict", response_model=PredictionResponse, tags=["Prediction"])
-async def predict(request: PredictionRequest):
+class RequestSchema(NamedTuple):
+    """Request validation for one model, derived from its feature plan"""
+    model: Any                      # pydantic model with the consumed fields
+    batch_adapter: TypeAdapter      # List[model]
+    field_types: Dict[str, type]    # consumed field -> str or float
+    n_unused: int                   # PredictionRequest fields the model ignores
+
+
+def build_request_schema(plan: Optional[FeaturePlan]) -> RequestSchema:
     """
-    Generate cancer progression prediction
+    Build the request schema for the fields a model actually consumes
+    
+    Consumed fields keep their PredictionRequest declaration; fields that
+    PredictionRequest does not declare are typed from the plan (str for
+    categorical, float otherwise). Everything else is not validated: it is
+    kept as-is in the parsed request's extras (REQUEST_UNUSED_FIELDS=
+    passthrough) or dropped.
     
     Args:
-        request: Patient features in PredictionRequest format
+        plan: Feature plan of the model (None: all PredictionRequest fields)
     
     Returns:
-        Prediction with probability, risk level, and confidence
-    
-    Raises:
-        HTTPException: If model not loaded or prediction fails
+        RequestSchema for parse_requests and the NDJSON stream
     """
+    declared = PredictionRequest.model_fields
+    if plan is None:
+        consumed = [(key, FEATURE_NUMERIC) for key in declared]
+    else:
+        consumed = list(dict.fromkeys(zip(plan.request_keys, plan.type_codes)))
     
-    # Check if model is loaded
-    if not model_loaded or model is None:
-        logger.error("Prediction requested but model not loaded")
-        raise HTTPException(
-            status_code=503,
-            detail="Model not loaded. API temporarily unavailable."
-        )
+    fields = {}
+    for key, type_code in consumed:
+        if key in declared:
+            fields[key] = (declared[key].annotation, declared[key])
+        else:
+            fields[key] = (Optional[str] if type_code == FEATURE_CATEGORICAL else Optional[float], None)
     
-    try:
-        # Convert request to dictionary using model_dump (Pydantic v2)
-        data_dict = request.model_dump()
-        
-        # Prepare features in correct order
-        X = prepare_features(data_dict)
-        
-        # Make prediction (model already knows categorical features from training)
-        prediction = model.predict(X)[0]
-        probability = model.predict_proba(X)[0, 1]
-        
-        # Generate outputs
-        progression_label = get_progression_label(int(prediction))
-        risk_level = get_risk_category(probability)
-        
-        # Calculate confidence (distance from 0.5)
-        confidence = 1.0 - abs(probability - 0.5) * 2
-        
-        logger.info(f"✓ Prediction generated: {progression_label} ({probability:.4f})")
-        
-        return PredictionResponse(
-            success=True,
-            prediction=int(prediction),
-            progression_probability=float(probability),
-            progression_label=progression_label,
-            risk_level=risk_level,
-            model_confidence=float(confidence),
-            timestamp=datetime.now().isoformat(),
-            model_version="1.0.0"
-        )
+    model = create_model(
+        'ModelPredictionRequest',
+        __config__={"extra": "allow" if REQUEST_UNUSED_FIELDS == 'passthrough' else "ignore"},
+        **fields,
+    )
+    return RequestSchema(
+        model=model,
+        batch_adapter=TypeAdapter(List[model]),
+        field_types={
+            key: str if annotation == Optional[str] else float
+            for key, (annotation, _) in fields.items()
+        },
+        n_unused=len(set(declared) - set(fields)),
+    )
+
+
+def encode_requests(plan: FeaturePlan, requests: Sequence[Any]) -> np.ndarray:
+    """
+    Encode requests into a preallocated feature matrix
     
+    Args:
+        plan: Compiled feature plan of the active model
+        requests: PredictionRequest objects or plain dictionaries
+    
+    Returns:
+        Object array of shape (len(requests), plan.n_features)
+    """
+    if plan is None:
+        raise ValueError("Model not loaded or feature names not available")
+    
+    started = time.perf_counter()
+    X = np.empty((len(requests), plan.n_features), dtype=object)
+    nan = np.nan
+    normalized = plan.categories.columns if plan.categories is not None else ()
+    canonical = plan.categories.canonical if plan.categories is not None else None
+    
+    for row, request in enumerate(requests):
+        values = request if isinstance(request, dict) else request.__dict__
+        out = X[row]
+        for col, key, code in plan.columns:
+            value = values.get(key)
+            missing = value is None or value == '' or value == 'None'
+            if code == FEATURE_CATEGORICAL:
+                if missing:
+                    out[col] = 'Unknown'
+                elif col in normalized:
+                    out[col] = canonical(col, str(value))
+                else:
+                    out[col] = str(value)
+            elif missing:
+                out[col] = nan
+            else:
+                try:
+                    value = float(value)
+                except (ValueError, TypeError):
+                    value = nan
+                out[col] = str(value) if code == FEATURE_NUMERIC_STRING else value
+    
+    if metrics is not None:
+        metrics.observe_stage('encode', time.perf_counter() - started)
+    return X
+
+
+def _parse_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def encode_frame(plan: FeaturePlan, frame: pd.DataFrame) -> np.ndarray:
+    """
+    Encode a columnar frame of request fields into a feature matrix
+    
+    Column-at-a-time counterpart of encode_requests for bulk inputs, with
+    the same missing-value and type rules. Columns are named like request
+    fields; absent columns are treated as missing.
+    
+    Args:
+        plan: Compiled feature plan of the active model
+        frame: DataFrame with one row per patient
+    
+    Returns:
+        Object array of shape (len(frame), plan.n_features)
+    """
+    if plan is None:
+        raise ValueError("Model not loaded or feature names not available")
+    
+    started = time.perf_counter()
+    n_rows = len(frame)
+    X = np.empty((n_rows, plan.n_features), dtype=object)
+    
+    for col, key, code in plan.columns:
+        if key not in frame.columns:
+            X[:, col] = 'Unknown' if code == FEATURE_CATEGORICAL else np.nan
+            continue
+        
+        series = frame[key]
+        missing = series.isna().to_numpy()
+        numeric_dtype = pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+        if not numeric_dtype:
+            values = series.to_numpy(dtype=object)
+            missing = missing | (values == '') | (values == 'None')
+        
+        if code == FEATURE_CATEGORICAL:
+            column = series.astype(str).to_numpy(dtype=object)
+            if plan.categories is not None and col in plan.categories.columns:
+                # Normalize each distinct value once
+                codes, uniques = pd.factorize(column)
+                column = np.array([plan.categories.canonical(col, v) for v in uniques] + ['Unknown'], dtype=object)[codes]
+            column[missing] = 'Unknown'
+        else:
+            if numeric_dtype:
+                numbers = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                # Parse each distinct value once (NaN code -1 maps to the last slot)
+                codes, uniques = pd.factorize(values)
+                parsed = np.array([_parse_float(v) for v in uniques] + [np.nan], dtype=np.float64)
+                numbers = parsed[codes]
+            if code == FEATURE_NUMERIC_STRING:
+                column = np.array([str(v) for v in numbers.tolist()], dtype=object)
+            else:
+                column = np.array(numbers.tolist(), dtype=object)
+            column[missing] = np.nan
+        
+        X[:, col] = column
+    
+    if metrics is not None:
+        metrics.observe_stage('encode', time.perf_counter() - started)
+    return X
+
+
+# Rows with non-numeric text named in an encode_arrow error
+ARROW_INVALID_ROWS_SHOWN = 5
+
+
+def _arrow_distinct(column: Any) -> Tuple[List[Any], np.ndarray]:
+    """Distinct values of an Arrow column and each row's index into them (-1 for null)"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    
+    if pa.types.is_dictionary(column.type):
+        column = column.cast(column.type.value_type)
+    encoded = column.combine_chunks().dictionary_encode()
+    codes = pc.fill_null(encoded.indices, -1).to_numpy(zero_copy_only=False)
+    return encoded.dictionary.to_pylist(), codes
+
+
+def encode_arrow(plan: FeaturePlan, table: Any, schema: Optional[RequestSchema] = None) -> pd.DataFrame:
+    """
+    Encode an Arrow table of request fields into a typed model input frame
+    
+    Arrow counterpart of encode_frame with the same missing-value and type
+    rules, but numeric features stay float64 columns (no per-value Python
+    objects; zero-copy for float64 columns without nulls) and text values
+    are converted once per distinct value. Columns are named like request
+    fields or model features; absent columns are treated as missing.
+    
+    With a schema, text in a column whose request field is a number must
+    be a number, or null, '' or 'None' (missing). The JSON endpoints answer
+    other text with 422; here the whole table is rejected. Without a schema
+    such text becomes NaN, like text in fields declared as strings.
+    
+    Args:
+        plan: Compiled feature plan of the active model
+        table: pyarrow.Table with one row per patient
+        schema: Request schema of the model, to reject non-numeric text
+    
+    Returns:
+        DataFrame in model feature order, usable by build_model_input
+    
+    Raises:
+        ValueError: If a numeric request field's column holds text that is
+            not a number (the first rows and values are named in the message)
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    
+    if plan is None:
+        raise ValueError("Model not loaded or feature names not available")
+    
+    started = time.perf_counter()
+    n_rows = table.num_rows
+    available = {name.replace('.', '_'): i for i, name in enumerate(table.column_names)}
+    columns = {}
+    
+    for col, key, code in plan.columns:
+        name = plan.feature_names[col]
+        if key not in available:
+            columns[name] = np.full(n_rows, 'Unknown' if code == FEATURE_CATEGORICAL else np.nan,
+                                    dtype=object if code != FEATURE_NUMERIC else np.float64)
+            continue
+        
+        column = table.column(available[key])
+        if code == FEATURE_CATEGORICAL:
+            uniques, codes = _arrow_distinct(column)
+            normalize = plan.categories is not None and col in plan.categories.columns
+            lookup = [
+                'Unknown' if value is None or value == '' or value == 'None'
+                else plan.categories.canonical(col, str(value)) if normalize else str(value)
+                for value in uniques
+            ]
+            columns[name] = np.array(lookup + ['Unknown'], dtype=object)[codes]
+            continue
+        
+        # Numeric, or numeric text: float64 with NaN for missing values
+        value_type = column.type.value_type if pa.types.is_dictionary(column.type) else column.type
+        if pa.types.is_integer(value_type) or pa.types.is_floating(value_type) or pa.types.is_decimal(value_type) \
+                or pa.types.is_boolean(value_type):
+            numbers = pc.cast(column, pa.float64()).combine_chunks().to_numpy(zero_copy_only=False)
+            missing = np.isnan(numbers)
+        else:
+            uniques, codes = _arrow_distinct(column)
+            blank = [value is None or value == '' or value == 'None' for value in uniques]
+            parsed = [_parse_float(value) for value in uniques] + [np.nan]
+            if schema is not None and schema.field_types.get(key) is float:
+                # JSON rejects such text with 422; reject the table instead of scoring NaN
+                invalid = [
+                    i for i, value in enumerate(uniques)
+                    if not blank[i] and np.isnan(parsed[i]) and str(value).strip().lower() != 'nan'
+                ]
+                if invalid:
+                    rows = np.flatnonzero(np.isin(codes, invalid))
+                    shown = ', '.join(f"{row} ({uniques[codes[row]]!r})" for row in rows[:ARROW_INVALID_ROWS_SHOWN])
+                    raise ValueError(
+                        f"Column {table.column_names[available[key]]} must be numeric, but {len(rows)} row(s) "
+                        f"hold text that is not a number: {shown}{', ...' if len(rows) > ARROW_INVALID_ROWS_SHOWN else ''}"
+                    )
+            numbers = np.array(parsed, dtype=np.float64)[codes]
+            missing = np.array(blank + [True])[codes]
+        
+        if code == FEATURE_NUMERIC:
+            columns[name] = numbers
+        else:
+            # Model-categorical: str(float) per distinct value, NaN when missing
+            distinct, inverse = np.unique(numbers, return_inverse=True)
+            column = np.array([str(value) for value in distinct.tolist()], dtype=object)[inverse.reshape(-1)]
+            column[missing] = np.nan
+            columns[name] = column
+    
+    frame = pd.DataFrame(columns, columns=list(plan.feature_names))
+    if metrics is not None:
+        metrics.observe_stage('encode', time.perf_counter() - started)
+    return frame
+
+
+def build_model_input(plan: FeaturePlan, X: np.ndarray, backend: Optional[str] = None) -> Any:
+    """
+    Wrap an encoded feature matrix in the input type of the inference backend
+    
+    Args:
+        plan: Compiled feature plan the matrix was encoded with
+        X: Matrix from encode_requests (or a frame from encode_arrow)
+        backend: "pool" or "pandas" (defaults to INFERENCE_BACKEND)
+    
+    Returns:
+        pandas DataFrame or catboost.Pool; both give identical scores
+    """
+    backend = backend or INFERENCE_BACKEND
+    started = time.perf_counter()
+    if backend == 'pool':
+        model_input = Pool(
+            data=X,
+            cat_features=list(plan.cat_feature_indices),
+            feature_names=list(plan.feature_names),
+        )
+    elif isinstance(X, pd.DataFrame):
+        model_input = X
+    else:
+        model_input = pd.DataFrame(X, columns=plan.feature_names)
+    if metrics is not None:
+        metrics.observe_stage('model_input', time.perf_counter() - started)
+    return model_input
+
+
+# ============================================================================
+# CATEGORY NORMALIZATION
+# ============================================================================
+
+def dump_model_json(model: CatBoostClassifier) -> Dict[str, Any]:
+    """CatBoost's own JSON dump of a model"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.json')
+        model.save_model(path, format='json')
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+def model_category_vocabulary(model: CatBoostClassifier) -> Dict[int, Tuple[frozenset, frozenset]]:
+    """
+    Hashes of the categorical values a model saw in training, per column
+    
+    Read from the single-feature CTR tables (keys) and one-hot splits
+    (value hashes). Columns the model only uses in feature combinations, or
+    not at all, are left out.
+    
+    Returns:
+        {model column: (CTR table keys, one-hot value hashes)}
+    """
+    spec = dump_model_json(model)
+    features = spec['features_info']
+    # CTR elements refer to categorical features by their index among them
+    columns = {f['feature_index']: f['flat_feature_index'] for f in features.get('categorical_features', [])}
+    
+    ctr_keys: Dict[int, set] = {}
+    for ctr in features.get('ctrs', []):
+        if len(ctr['elements']) != 1 or ctr['elements'][0]['combination_element'] != 'cat_feature_value':
+            continue
+        data = spec['ctr_data'][ctr['identifier']]
+        keys = ctr_keys.setdefault(columns[ctr['elements'][0]['cat_feature_index']], set())
+        keys.update(int(h) for h in data['hash_map'][0::data['hash_stride']])
+    
+    one_hot = {
+        f['flat_feature_index']: set(f['values'])
+        for f in features.get('categorical_features', []) if f.get('values')
+    }
+    
+    return {
+        col: (frozenset(ctr_keys.get(col, ())), frozenset(one_hot.get(col, ())))
+        for col in sorted(set(ctr_keys) | set(one_hot))
+    }
+
+
+def build_category_normalizer(model: CatBoostClassifier, plan: FeaturePlan) -> Optional[CategoryNormalizer]:
+    """
+    CategoryNormalizer for the model's categorical columns
+    
+    Returns:
+        Normalizer, or None if disabled or the model has no categorical
+        vocabulary
+    """
+    if not CATEGORY_NORMALIZATION:
+        return None
+    
+    categorical = {col for col, _, code in plan.columns if code == FEATURE_CATEGORICAL}
+    vocabulary = {col: known for col, known in model_category_vocabulary(model).items() if col in categorical}
+    if not vocabulary:
+        return None
+    
+    normalizer = CategoryNormalizer(vocabulary, {}, CATEGORY_MEMO_SIZE)
+    for feature_name, synonyms in CATEGORY_SYNONYMS.items():
+        if feature_name not in plan.feature_names:
+            continue
+        col = plan.feature_names.index(feature_name)
+        if col in vocabulary:
+            # Only targets the model knows; keys compared case-insensitively
+            normalizer.synonyms[col] = {
+                raw.casefold(): target for raw, target in synonyms.items() if normalizer.known(col, target)
+            }
+    return normalizer
+
+
+# ============================================================================
+# PREDICTION CACHE
+# ============================================================================
+
+def feature_cache_key(model_id: str, row: np.ndarray) -> Tuple[str, bytes]:
+    """
+    Content-addressed cache key for one encoded feature row
+    
+    The key covers only what the model sees, so request fields the model
+    ignores (and equivalent spellings of missing values) share an entry.
+    model_id (the model file fingerprint) keeps entries of different
+    models apart.
+    """
+    digest = hashlib.blake2b(repr(tuple(row)).encode(), digest_size=16).digest()
+    return model_id, digest
+
+
+class PredictionCache:
+    """Thread-safe LRU cache of per-row results (probabilities, SHAP rows) with TTL expiry"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Any) -> Optional[Any]:
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self.entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Any, value: Any):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+if PREDICTION_CACHE_SIZE > 0:
+    prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+if EXPLAIN_CACHE_SIZE > 0:
+    explanation_cache = PredictionCache(EXPLAIN_CACHE_SIZE, PREDICTION_CACHE_TTL)
+
+
+# ============================================================================
+# MODEL REGISTRY
+# ============================================================================
+
+class ModelBundle(NamedTuple):
+    """Immutable model + everything derived from it, swapped as one unit"""
+    model: CatBoostClassifier
+    plan: Optional[FeaturePlan]
+    version: str
+    path: str
+    fingerprint: str    # content hash of the .cbm file
+    loaded_at: str
+    feature_names: Tuple[str, ...]
+    categorical_indices: Tuple[int, ...]
+    request_schema: RequestSchema
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "path": self.path,
+            "fingerprint": self.fingerprint,
+            "loaded_at": self.loaded_at,
+            "n_features": len(self.feature_names),
+            "n_request_fields": len(self.request_schema.field_types),
+        }
+
+
+def load_bundle(path: str, version: Optional[str] = None) -> ModelBundle:
+    """
+    Load a CatBoost model file and compile its feature plan
+    
+    Args:
+        path: .cbm model file
+        version: Version label (default: the file fingerprint)
+    
+    Returns:
+        ModelBundle, not yet active
+    """
+    with open(path, 'rb') as f:
+        blob = f.read()
+    fingerprint = hashlib.blake2b(blob, digest_size=8).hexdigest()
+    
+    model = CatBoostClassifier()
+    model.load_model(blob=blob)
+    logger.info(f"✓ Model loaded successfully from {path}")
+    
+    # Get feature names from model
+    feature_names = list(model.feature_names_) if model.feature_names_ else []
+    plan = None
+    categorical_indices = []
+    
+    if feature_names:
+        logger.info(f"✓ Model expects {len(feature_names)} features")
+        logger.info(f"✓ Features: {feature_names}")
+        
+        # Identify which features are categorical
+        categorical_indices = [i for i, feat in enumerate(feature_names) if feat in CATEGORICAL_FEATURES]
+        logger.info(f"✓ Categorical feature indices: {categorical_indices}")
+        
+        # Compile the per-request encoding work once for this model
+        plan = build_feature_plan(feature_names, model.get_cat_feature_indices())
+        
+        categories = build_category_normalizer(model, plan)
+        if categories is not None:
+            plan = plan._replace(categories=categories)
+            logger.info(f"✓ Category normalization for {len(categories.columns)} features")
+    else:
+        logger.warning("⚠ Model loaded but feature names not available")
+    
+    # Only the request fields this model reads are validated
+    request_schema = build_request_schema(plan)
+    logger.info(f"✓ Request schema: {len(request_schema.field_types)} fields validated, "
+                f"{request_schema.n_unused} unused ({REQUEST_UNUSED_FIELDS})")
+    
+    return ModelBundle(
+        model=model,
+        plan=plan,
+        version=version or fingerprint,
+        path=path,
+        fingerprint=fingerprint,
+        loaded_at=datetime.now().isoformat(),
+        feature_names=tuple(feature_names),
+        categorical_indices=tuple(categorical_indices),
+        request_schema=request_schema,
+    )
+
+
+def warm_up_bundle(bundle: ModelBundle):
+    """
+    Score the schema example as a single row and as a WARMUP_BATCH_SIZE
+    batch, bypassing the prediction cache
+    
+    Raises:
+        ValueError: If the model cannot score requests or returns
+            probabilities outside [0, 1]
+    """
+    if bundle.plan is None:
+        raise ValueError("Model has no feature names; requests cannot be mapped onto it")
+    
+    example = bundle.request_schema.model.model_validate(
+        PredictionRequest.model_config["json_schema_extra"]["example"]
+    )
+    for batch_size in (1, max(1, WARMUP_BATCH_SIZE)):
+        X = encode_requests(bundle.plan, [example] * batch_size)
+        probabilities, _ = score_features(build_model_input(bundle.plan, X), bundle)
+        if len(probabilities) != batch_size or not np.all((probabilities >= 0) & (probabilities <= 1)):
+            raise ValueError(f"Model returned invalid probabilities: {probabilities[:5].tolist()}")
+
+
+def write_json_atomic(path: str, data: Dict[str, Any]):
+    """Write JSON so that readers see either the old or the new file, never a partial one"""
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def read_json_file(path: str) -> Optional[Dict[str, Any]]:
+    """JSON content of path, or None if it does not exist"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ModelRegistry:
+    """
+    Holds the active ModelBundle and replaces it atomically
+    
+    Request handlers read `active` once and use that bundle until they
+    respond, so a swap never changes the model under an in-flight request;
+    the old bundle is released when its last request finishes. A/B
+    variants answer a weighted share of /predict and /batch-predict
+    requests instead of the active model.
+    
+    With MODEL_RELOAD_FILE, a reload is fanned out to every worker process:
+    the request is written to that file, each worker's watcher thread
+    reloads when it changes (a worker started later loads it before it is
+    ready), and each worker publishes its state next to it for
+    GET /admin/model.
+    """
+
+    def __init__(self):
+        self.active: Optional[ModelBundle] = None
+        self.variants: List[Tuple[ModelBundle, float]] = []   # (bundle, share of routed requests)
+        self.reload_lock = threading.Lock()
+        self.last_reload: Dict[str, Any] = {"status": "idle"}
+        self.applied_request: Optional[str] = None            # id of the last MODEL_RELOAD_FILE request taken
+        self.watch_stop = threading.Event()
+        self.watcher: Optional[threading.Thread] = None
+
+    def route(self) -> Optional[ModelBundle]:
+        """Model that answers the next routed request: a variant with probability equal to its weight, else the active one"""
+        bundle = self.active
+        if not self.variants or bundle is None:
+            return bundle
+        
+        draw = random.random()
+        for variant, weight in self.variants:
+            if draw < weight:
+                return variant
+            draw -= weight
+        return bundle
+
+    def activate(self, bundle: ModelBundle):
+        """Make bundle the active model"""
+        global model, model_loaded, model_feature_names, model_categorical_indices, feature_plan, model_version
+        
+        self.active = bundle
+        
+        # Module-level aliases for code that predates the registry
+        model = bundle.model
+        model_loaded = True
+        model_feature_names = list(bundle.feature_names)
+        model_categorical_indices = list(bundle.categorical_indices)
+        feature_plan = bundle.plan
+        model_version = bundle.version
+        
+        # Cached scores belong to the previous model (entries are keyed by
+        # model fingerprint, so late writes from in-flight requests are harmless)
+        if prediction_cache is not None:
+            prediction_cache.clear()
+        if explanation_cache is not None:
+            explanation_cache.clear()
+        
+        # Shadows compare against the new model from now on
+        if shadow_scorer is not None:
+            shadow_scorer.bind_primary(bundle)
+
+    def request_reload(self, path: str, version: Optional[str] = None) -> bool:
+        """
+        Reload this process and, with MODEL_RELOAD_FILE, every worker watching it
+        
+        Returns:
+            False if a reload is still running in this process
+        """
+        request_id = secrets.token_hex(8)
+        if not self.start_reload(path, version, request_id):
+            return False
+        if MODEL_RELOAD_FILE:
+            self.applied_request = request_id
+            write_json_atomic(MODEL_RELOAD_FILE, {
+                "id": request_id,
+                "path": path,
+                "version": version,
+                "requested_at": datetime.now().isoformat(),
+                "requested_by": os.getpid(),
+            })
+        return True
+
+    def start_reload(self, path: str, version: Optional[str] = None, request_id: Optional[str] = None) -> bool:
+        """
+        Load, warm up and activate a model in a background thread
+        
+        Returns:
+            False if another reload is still running
+        """
+        if not self.reload_lock.acquire(blocking=False):
+            return False
+        
+        self.last_reload = {
+            "status": "loading",
+            "path": path,
+            "version": version,
+            "request_id": request_id,
+            "started_at": datetime.now().isoformat(),
+        }
+        threading.Thread(target=self._reload, args=(path, version), name="model-reload", daemon=True).start()
+        return True
+
+    def _reload(self, path: str, version: Optional[str]):
+        started = time.perf_counter()
+        try:
+            bundle = load_bundle(path, version)
+            warm_up_bundle(bundle)
+            previous = self.active
+            self.activate(bundle)
+            self.last_reload = {
+                **self.last_reload,
+                "status": "succeeded",
+                "version": bundle.version,
+                "previous_version": previous.version if previous is not None else None,
+                "seconds": time.perf_counter() - started,
+            }
+            logger.info(f"✓ Model {bundle.version} is now active ({path})")
+        except Exception as e:
+            # The current model stays active
+            self.last_reload = {
+                **self.last_reload,
+                "status": "failed",
+                "error": str(e),
+                "seconds": time.perf_counter() - started,
+            }
+            logger.error(f"✗ Model reload from {path} failed: {str(e)}")
+        finally:
+            self.reload_lock.release()
+
+    def apply_requested_model(self):
+        """
+        Activate the model last requested through MODEL_RELOAD_FILE (blocking)
+        
+        Run at worker startup, so a worker forked or restarted after a
+        reload serves the reloaded model, not the preloaded one.
+        """
+        request = read_json_file(MODEL_RELOAD_FILE) if MODEL_RELOAD_FILE else None
+        if request is None:
+            return
+        try:
+            self.activate(load_bundle(request["path"], request.get("version")))
+            self.applied_request = request["id"]
+            logger.info(f"✓ Using reloaded model {self.active.version} (worker pid {os.getpid()})")
+        except Exception as e:
+            # The watcher retries
+            logger.error(f"✗ Cannot load requested model {request.get('path')}: {str(e)}")
+
+    def start_watching(self):
+        """Follow reload requests from other workers (no-op without MODEL_RELOAD_FILE)"""
+        if MODEL_RELOAD_FILE:
+            self.watcher = threading.Thread(target=self._watch, name="model-reload-watch", daemon=True)
+            self.watcher.start()
+
+    def stop_watching(self):
+        self.watch_stop.set()
+        if self.watcher is not None:
+            self.watcher.join(timeout=INFERENCE_TIMEOUT)
+            try:
+                os.remove(f"{MODEL_RELOAD_FILE}.{os.getpid()}")
+            except OSError:
+                pass
+
+    def _watch(self):
+        while True:
+            try:
+                request = read_json_file(MODEL_RELOAD_FILE)
+                if (request is not None and request["id"] != self.applied_request
+                        and self.start_reload(request["path"], request.get("version"), request["id"])):
+                    self.applied_request = request["id"]
+                    logger.info(f"✓ Model reload {request['id']} requested by worker {request.get('requested_by')}")
+                # Doubles as this worker's heartbeat for GET /admin/model
+                write_json_atomic(f"{MODEL_RELOAD_FILE}.{os.getpid()}", {
+                    "pid": os.getpid(),
+                    "active": self.active.describe() if self.active is not None else None,
+                    "reload": dict(self.last_reload),
+                    "updated_at": datetime.now().isoformat(),
+                })
+            except Exception as e:
+                logger.warning(f"⚠ Model reload watcher: {str(e)}")
+            if self.watch_stop.wait(MODEL_RELOAD_POLL_SECONDS):
+                return
+
+    def worker_states(self) -> List[Dict[str, Any]]:
+        """State published by every live worker watching MODEL_RELOAD_FILE"""
+        states = []
+        for path in glob.glob(glob.escape(MODEL_RELOAD_FILE) + ".*"):
+            pid = path.rsplit('.', 1)[1]
+            if not pid.isdigit():
+                continue
+            if not process_alive(int(pid)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                state = read_json_file(path)
+            except ValueError:
+                continue
+            if state is not None:
+                states.append(state)
+        return sorted(states, key=lambda state: state["pid"])
+
+    def describe(self) -> Dict[str, Any]:
+        bundle = self.active
+        description = {
+            "pid": os.getpid(),
+            "active": bundle.describe() if bundle is not None else None,
+            "ab_variants": [{**variant.describe(), "weight": weight} for variant, weight in self.variants],
+            "shadows": [shadow.describe() for shadow in shadow_scorer.shadows] if shadow_scorer is not None else [],
+            "reload": dict(self.last_reload),
+        }
+        if MODEL_RELOAD_FILE:
+            try:
+                description["requested"] = read_json_file(MODEL_RELOAD_FILE)
+            except ValueError:
+                description["requested"] = None
+            description["workers"] = self.worker_states()
+        return description
+
+
+model_registry = ModelRegistry()
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+# Stage latency buckets (seconds) and rows-per-model-call buckets
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096]
+
+# Request handling stages timed by /metrics
+STAGES = ('receive', 'parse', 'encode', 'model_input', 'inference', 'explain', 'serialize')
+
+
+class Histogram:
+    """Minimal cumulative histogram (Prometheus-style buckets)"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self.lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cumulative bucket counts keyed by upper bound"""
+        with self.lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip([*map(str, self.buckets), '+Inf'], counts):
+            cumulative += n
+            buckets[bound] = cumulative
+        return {"count": count, "sum": total, "buckets": buckets}
+
+
+def prometheus_labels(labels: Dict[str, Any]) -> str:
+    """Render {k="v",...} with Prometheus escaping"""
+    if not labels:
+        return ""
+    escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Metrics:
+    """
+    Process-wide serving metrics, rendered in Prometheus text format
+    
+    Observations are a lock and a few additions, so they are cheap enough
+    for the hot path (unlike a log line per prediction). With
+    METRICS_MULTIPROC_DIR set, every worker writes a snapshot of its
+    metrics there every METRICS_EXPORT_SECONDS, and /metrics renders the
+    snapshots of all live workers with a worker="<pid>" label, so a scrape
+    answered by any worker covers the whole server.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {stage: Histogram(LATENCY_BUCKETS) for stage in STAGES}
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.request_latency: Dict[str, Histogram] = {}
+        self.responses: Dict[Tuple[str, int], int] = {}
+        self.predictions: Dict[str, int] = {}
+        self.prediction_errors = 0
+        self.inference_jobs = 0
+        self.export_stop = threading.Event()
+        self.exporter: Optional[threading.Thread] = None
+
+    def observe_stage(self, stage: str, seconds: float):
+        self.stages[stage].observe(seconds)
+
+    def observe_request(self, endpoint: str, status: int, seconds: float):
+        with self.lock:
+            histogram = self.request_latency.get(endpoint)
+            if histogram is None:
+                histogram = self.request_latency[endpoint] = Histogram(LATENCY_BUCKETS)
+            self.responses[(endpoint, status)] = self.responses.get((endpoint, status), 0) + 1
+        histogram.observe(seconds)
+
+    def count_prediction(self, risk_level: str, count: int = 1):
+        with self.lock:
+            self.predictions[risk_level] = self.predictions.get(risk_level, 0) + count
+
+    def count_prediction_error(self):
+        with self.lock:
+            self.prediction_errors += 1
+
+    def adjust_inference_jobs(self, delta: int):
+        with self.lock:
+            self.inference_jobs += delta
+
+    def snapshot(self) -> Dict[str, Any]:
+        """This process's metrics as plain JSON-serializable data"""
+        with self.lock:
+            request_latency = dict(self.request_latency)
+            responses = [[endpoint, status, count] for (endpoint, status), count in sorted(self.responses.items())]
+            predictions = dict(self.predictions)
+            prediction_errors = self.prediction_errors
+            inference_jobs = self.inference_jobs
+        
+        bundle = model_registry.active if model_registry is not None else None
+        cache = prediction_cache.stats() if prediction_cache is not None else None
+        return {
+            "pid": os.getpid(),
+            "stages": {stage: hist.snapshot() for stage, hist in self.stages.items()},
+            "request_latency": {endpoint: hist.snapshot() for endpoint, hist in sorted(request_latency.items())},
+            "responses": responses,
+            "predictions": predictions,
+            "prediction_errors": prediction_errors,
+            "batch_size": self.batch_size.snapshot(),
+            "inference_jobs": inference_jobs,
+            "microbatch": {
+                "queue_depth": micro_batcher.queue.qsize() if micro_batcher.queue else 0,
+                "size": micro_batcher.batch_size_histogram.snapshot(),
+                "queue_wait": micro_batcher.queue_wait_histogram.snapshot(),
+            } if micro_batcher is not None else None,
+            "prediction_cache": {"hits": cache["hits"], "misses": cache["misses"]} if cache is not None else None,
+            "log_records_dropped": log_queue_handler.dropped if log_queue_handler is not None else None,
+            "model": {"version": bundle.version, "fingerprint": bundle.fingerprint} if bundle is not None else None,
+        }
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format (0.0.4)"""
+        if not METRICS_MULTIPROC_DIR:
+            return render_metrics([self.snapshot()], per_worker=False)
+        self.export()
+        return render_metrics(self.worker_snapshots(), per_worker=True)
+
+    def export(self):
+        """Publish this worker's snapshot to METRICS_MULTIPROC_DIR"""
+        write_json_atomic(os.path.join(METRICS_MULTIPROC_DIR, f"metrics-{os.getpid()}.json"), self.snapshot())
+
+    def worker_snapshots(self) -> List[Dict[str, Any]]:
+        """Snapshots of every live worker; files of exited workers are removed"""
+        snapshots = []
+        for path in glob.glob(os.path.join(glob.escape(METRICS_MULTIPROC_DIR), "metrics-*.json")):
+            pid = os.path.basename(path)[len("metrics-"):-len(".json")]
+            if not pid.isdigit():
+                continue
+            if not process_alive(int(pid)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                snapshot = read_json_file(path)
+            except ValueError:
+                continue
+            if snapshot is not None:
+                snapshots.append(snapshot)
+        return sorted(snapshots, key=lambda snapshot: snapshot["pid"])
+
+    def start_exporting(self):
+        """Write snapshots periodically (no-op without METRICS_MULTIPROC_DIR)"""
+        if METRICS_MULTIPROC_DIR:
+            os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+            self.exporter = threading.Thread(target=self._export_loop, name="metrics-export", daemon=True)
+            self.exporter.start()
+
+    def stop_exporting(self):
+        self.export_stop.set()
+        if self.exporter is not None:
+            self.exporter.join(timeout=INFERENCE_TIMEOUT)
+            try:
+                os.remove(os.path.join(METRICS_MULTIPROC_DIR, f"metrics-{os.getpid()}.json"))
+            except OSError:
+                pass
+
+    def _export_loop(self):
+        while True:
+            try:
+                self.export()
+            except Exception as e:
+                logger.warning(f"⚠ Metrics export: {str(e)}")
+            if self.export_stop.wait(METRICS_EXPORT_SECONDS):
+                return
+
+
+def render_metrics(snapshots: List[Dict[str, Any]], per_worker: bool) -> str:
+    """
+    Prometheus text for Metrics snapshots
+    
+    Args:
+        snapshots: Metrics.snapshot() of one or more processes
+        per_worker: Add a worker="<pid>" label to every series
+    """
+    lines = []
+
+    def header(name: str, kind: str, text: str):
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def labels(snapshot: Dict[str, Any], **extra: Any) -> Dict[str, Any]:
+        return {"worker": snapshot["pid"], **extra} if per_worker else extra
+
+    def histogram(name: str, series: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        for series_labels, hist in series:
+            for bound, count in hist["buckets"].items():
+                lines.append(f"{name}_bucket{prometheus_labels({**series_labels, 'le': bound})} {count}")
+            lines.append(f"{name}_sum{prometheus_labels(series_labels)} {hist['sum']}")
+            lines.append(f"{name}_count{prometheus_labels(series_labels)} {hist['count']}")
+
+    def sample(name: str, series_labels: Dict[str, Any], value: Any):
+        lines.append(f"{name}{prometheus_labels(series_labels)} {value}")
+
+    header("cancer_api_stage_seconds", "histogram",
+           "Time per request handling stage (receive, parse, encode, model_input, inference, explain, serialize)")
+    histogram("cancer_api_stage_seconds", [
+        (labels(snapshot, stage=stage), hist) for snapshot in snapshots for stage, hist in snapshot["stages"].items()
+    ])
+
+    header("cancer_api_request_seconds", "histogram", "End-to-end request latency by endpoint")
+    histogram("cancer_api_request_seconds", [
+        (labels(snapshot, endpoint=endpoint), hist)
+        for snapshot in snapshots for endpoint, hist in snapshot["request_latency"].items()
+    ])
+
+    header("cancer_api_requests_total", "counter", "Responses by endpoint and HTTP status")
+    for snapshot in snapshots:
+        for endpoint, status, count in snapshot["responses"]:
+            sample("cancer_api_requests_total", labels(snapshot, endpoint=endpoint, status=status), count)
+
+    header("cancer_api_predictions_total", "counter", "Predictions returned by risk level")
+    for snapshot in snapshots:
+        for risk_level, count in sorted(snapshot["predictions"].items()):
+            sample("cancer_api_predictions_total", labels(snapshot, risk_level=risk_level), count)
+
+    header("cancer_api_prediction_errors_total", "counter", "Records that could not be scored")
+    for snapshot in snapshots:
+        sample("cancer_api_prediction_errors_total", labels(snapshot), snapshot["prediction_errors"])
+
+    header("cancer_api_batch_size", "histogram", "Rows per model call")
+    histogram("cancer_api_batch_size", [(labels(snapshot), snapshot["batch_size"]) for snapshot in snapshots])
+
+    header("cancer_api_inference_queue_depth", "gauge", "Inference jobs queued or running in the worker pool")
+    for snapshot in snapshots:
+        sample("cancer_api_inference_queue_depth", labels(snapshot), snapshot["inference_jobs"])
+    header("cancer_api_inference_queue_capacity", "gauge", "INFERENCE_QUEUE_SIZE")
+    for snapshot in snapshots:
+        sample("cancer_api_inference_queue_capacity", labels(snapshot), INFERENCE_QUEUE_SIZE)
+
+    batching = [snapshot for snapshot in snapshots if snapshot["microbatch"] is not None]
+    if batching:
+        header("cancer_api_microbatch_queue_depth", "gauge", "Requests waiting for the next micro-batch")
+        for snapshot in batching:
+            sample("cancer_api_microbatch_queue_depth", labels(snapshot), snapshot["microbatch"]["queue_depth"])
+        header("cancer_api_microbatch_size", "histogram", "Requests per micro-batch")
+        histogram("cancer_api_microbatch_size", [(labels(snapshot), snapshot["microbatch"]["size"]) for snapshot in batching])
+        header("cancer_api_microbatch_queue_wait_seconds", "histogram", "Time a request waits for its micro-batch")
+        histogram("cancer_api_microbatch_queue_wait_seconds",
+                  [(labels(snapshot), snapshot["microbatch"]["queue_wait"]) for snapshot in batching])
+
+    caching = [snapshot for snapshot in snapshots if snapshot["prediction_cache"] is not None]
+    if caching:
+        header("cancer_api_prediction_cache_hits_total", "counter", "Prediction cache hits")
+        for snapshot in caching:
+            sample("cancer_api_prediction_cache_hits_total", labels(snapshot), snapshot["prediction_cache"]["hits"])
+        header("cancer_api_prediction_cache_misses_total", "counter", "Prediction cache misses")
+        for snapshot in caching:
+            sample("cancer_api_prediction_cache_misses_total", labels(snapshot), snapshot["prediction_cache"]["misses"])
+
+    logging_async = [snapshot for snapshot in snapshots if snapshot["log_records_dropped"] is not None]
+    if logging_async:
+        header("cancer_api_log_records_dropped_total", "counter", "Log records dropped because the log queue was full")
+        for snapshot in logging_async:
+            sample("cancer_api_log_records_dropped_total", labels(snapshot), snapshot["log_records_dropped"])
+
+    header("cancer_api_model_info", "gauge", "Active model (value is always 1)")
+    for snapshot in snapshots:
+        if snapshot["model"] is not None:
+            sample("cancer_api_model_info", labels(snapshot, **snapshot["model"]), 1)
+    header("cancer_api_model_loaded", "gauge", "1 when a model is serving")
+    for snapshot in snapshots:
+        sample("cancer_api_model_loaded", labels(snapshot), int(snapshot["model"] is not None))
+
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and status per endpoint"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        started = time.perf_counter()
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Route template, not the raw path, to keep label cardinality bounded
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            metrics.observe_request(endpoint, status, time.perf_counter() - started)
+
+
+metrics = Metrics() if METRICS_ENABLED else None
+if metrics is not None:
+    app.add_middleware(MetricsMiddleware)
+
+
+# ============================================================================
+# INFERENCE POOL
+# ============================================================================
+
+def score_requests(requests: Sequence[Any], bundle: Optional[ModelBundle] = None,
+                   shadow: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encode and score requests (blocking)
+    
+    Args:
+        requests: PredictionRequest objects or plain dictionaries
+        bundle: Model to use (default: the active model)
+        shadow: Also queue the requests for the shadow models (live traffic)
+    
+    Returns:
+        Tuple of (progression probabilities, class predictions)
+    """
+    bundle = bundle or model_registry.active
+    X = encode_requests(bundle.plan if bundle else None, requests)
+    probabilities, predictions = score_encoded(X, bundle)
+    if shadow and shadow_scorer is not None:
+        shadow_scorer.submit(requests, X, bundle, probabilities)
+    return probabilities, predictions
+
+
+def score_encoded(X: np.ndarray, bundle: Optional[ModelBundle] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score an encoded feature matrix (blocking)
+    
+    Rows found in the prediction cache are not sent to the model. Batches
+    above PREDICTION_CACHE_MAX_BATCH rows bypass the cache, so one large
+    batch cannot evict the entries repeated /predict calls hit.
+    
+    Args:
+        X: Matrix from encode_requests / encode_frame
+        bundle: Model to use (default: the active model)
+    
+    Returns:
+        Tuple of (progression probabilities, class predictions)
+    """
+    bundle = bundle or model_registry.active
+    if prediction_cache is None or len(X) > PREDICTION_CACHE_MAX_BATCH:
+        return score_features(build_model_input(bundle.plan, X), bundle)
+    
+    keys = [feature_cache_key(bundle.fingerprint, row) for row in X]
+    probabilities = np.empty(len(keys), dtype=np.float64)
+    misses = []
+    for i, key in enumerate(keys):
+        cached = prediction_cache.get(key)
+        if cached is None:
+            misses.append(i)
+        else:
+            probabilities[i] = cached
+    
+    if misses:
+        scored, _ = score_features(build_model_input(bundle.plan, X[misses]), bundle)
+        probabilities[misses] = scored
+        for i, probability in zip(misses, scored.tolist()):
+            prediction_cache.put(keys[i], probability)
+    
+    return probabilities, predict_labels(probabilities)
+
+
+def adjust_inference_in_flight(delta: int):
+    """Track interactive pool jobs (batch jobs yield while there are any)"""
+    global inference_in_flight
+    with inference_in_flight_lock:
+        inference_in_flight += delta
+
+
+def wait_for_idle_inference(max_seconds: float):
+    """Block a background thread until no interactive inference is in flight, for at most max_seconds"""
+    deadline = time.perf_counter() + max_seconds
+    while inference_in_flight > 0 and time.perf_counter() < deadline:
+        time.sleep(0.002)
+
+
+async def run_inference(func, *args):
+    """
+    Run blocking inference work in the worker pool
+    
+    At most INFERENCE_QUEUE_SIZE jobs may be queued or running; beyond that
+    callers get 429 with Retry-After instead of piling up behind the pool.
+    
+    Raises:
+        HTTPException: 429 when the pool is saturated, 504 on timeout
+    """
+    if not inference_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=429,
+            detail="Inference queue is full. Please retry later.",
+            headers={"Retry-After": str(INFERENCE_RETRY_AFTER)}
+        )
+    
+    try:
+        future = inference_executor.submit(func, *args)
+    except Exception:
+        inference_slots.release()
+        raise
+    # Release the slot when the work actually finishes, even after a timeout
+    future.add_done_callback(lambda _: inference_slots.release())
+    adjust_inference_in_flight(1)
+    future.add_done_callback(lambda _: adjust_inference_in_flight(-1))
+    if metrics is not None:
+        metrics.adjust_inference_jobs(1)
+        future.add_done_callback(lambda _: metrics.adjust_inference_jobs(-1))
+    
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=INFERENCE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Inference timed out after {INFERENCE_TIMEOUT:g}s"
+        )
+
+
+# ============================================================================
+# MICRO-BATCHING
+# ============================================================================
+
+def score_requests_isolated(requests: Sequence[Any], bundle: Optional[ModelBundle] = None,
+                            shadow: bool = False) -> List[Any]:
+    """
+    Score a batch, isolating failures to the requests that caused them
+    
+    Args:
+        shadow: Also queue the scored requests for the shadow models
+    
+    Returns:
+        One (probability, prediction) tuple or Exception per request
+    """
+    bundle = bundle or model_registry.active
+    X = encode_requests(bundle.plan if bundle else None, requests)
+    results = score_encoded_isolated(X, bundle)
+    if shadow and shadow_scorer is not None:
+        scored = [i for i, result in enumerate(results) if not isinstance(result, Exception)]
+        if scored:
+            shadow_scorer.submit([requests[i] for i in scored], X[scored],
+                                 bundle, np.array([results[i][0] for i in scored]), rows=scored)
+    return results
+
+
+def score_encoded_isolated(X: np.ndarray, bundle: Optional[ModelBundle] = None) -> List[Any]:
+    """
+    Score an encoded matrix, isolating failures to the rows that caused them
+    
+    A failing batch is split in halves and re-scored, so a few bad rows
+    cost O(bad * log n) extra model calls instead of one call per row.
+    
+    Returns:
+        One (probability, prediction) tuple or Exception per row
+    """
+    try:
+        probabilities, predictions = score_encoded(X, bundle)
+        return list(zip(probabilities.tolist(), predictions.tolist()))
+    except Exception as e:
+        if len(X) == 1:
+            if metrics is not None:
+                metrics.count_prediction_error()
+            return [e]
+    
+    # One bad record must not fail the other records in its batch
+    middle = len(X) // 2
+    return score_encoded_isolated(X[:middle], bundle) + score_encoded_isolated(X[middle:], bundle)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent /predict calls and scores them in one model call
+    
+    A batch is flushed when it reaches max_batch_size requests or when its
+    first request has waited max_wait_ms, whichever comes first. On stop,
+    requests already queued are still scored, so no caller is left waiting.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.collecting: List[Tuple[Any, asyncio.Future, float, ModelBundle]] = []
+        self.scoring: set = set()    # batch tasks in flight (the loop only keeps weak references)
+        self.stopping = False
+        self.batch_size_histogram = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.queue_wait_histogram = Histogram([0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1])
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop collecting, then score the requests already queued and wait for all batches"""
+        self.stopping = True
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        
+        pending, self.collecting = self.collecting, []
+        while self.queue is not None and not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        for start in range(0, len(pending), self.max_batch_size):
+            self._spawn(pending[start:start + self.max_batch_size])
+        if self.scoring:
+            await asyncio.gather(*self.scoring, return_exceptions=True)
+
+    async def submit(self, request: Any, bundle: ModelBundle) -> PredictionResponse:
+        """
+        Queue a request and wait for its own response from bundle's model
+        
+        Raises:
+            HTTPException: 503 once the server is shutting down
+        """
+        if self.stopping:
+            raise HTTPException(status_code=503, detail="Server is shutting down")
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((request, future, time.perf_counter(), bundle))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Kept on self so stop() can still score a batch cut off mid-collection
+            self.collecting = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(self.collecting) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    self.collecting.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Score in the background so the next batch can start collecting
+            batch, self.collecting = self.collecting, []
+            self._spawn(batch)
+
+    def _spawn(self, batch: List[Tuple[Any, asyncio.Future, float, ModelBundle]]):
+        task = asyncio.create_task(self._score(batch))
+        self.scoring.add(task)
+        task.add_done_callback(self.scoring.discard)
+
+    async def _score(self, batch: List[Tuple[Any, asyncio.Future, float, ModelBundle]]):
+        started = time.perf_counter()
+        self.batch_size_histogram.observe(len(batch))
+        groups: Dict[int, List[Tuple[Any, asyncio.Future, float, ModelBundle]]] = {}
+        for item in batch:
+            self.queue_wait_histogram.observe(started - item[2])
+            groups.setdefault(id(item[3]), []).append(item)
+        
+        # Each request is scored by the model it was validated against (the
+        # active one or an A/B variant), even across a swap; normally one group
+        await asyncio.gather(*(self._score_group(items) for items in groups.values()))
+
+    async def _score_group(self, batch: List[Tuple[Any, asyncio.Future, float, ModelBundle]]):
+        bundle = batch[0][3]
+        try:
+            results = await run_inference(score_requests_isolated, [item[0] for item in batch], bundle, True)
+        except Exception as e:
+            results = [e] * len(batch)
+        
+        for (_, future, _, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(build_prediction_response(*result, version=bundle.version))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_seconds": self.queue_wait_histogram.snapshot(),
+        }
+
+
+# ============================================================================
+# SHADOW MODELS
+# ============================================================================
+
+def plans_compatible(a: Optional[FeaturePlan], b: Optional[FeaturePlan]) -> bool:
+    """
+    Whether two models encode every request to the same feature matrix
+    
+    True when columns, feature types and (with category normalization)
+    the known categories and synonyms match, so a matrix encoded for one
+    model can be scored by the other as-is.
+    """
+    if a is None or b is None:
+        return False
+    if a is b:
+        return True
+    if (a.feature_names, a.columns, a.cat_feature_indices) != (b.feature_names, b.columns, b.cat_feature_indices):
+        return False
+    if a.categories is None or b.categories is None:
+        return a.categories is b.categories
+    return a.categories.vocabulary == b.categories.vocabulary and a.categories.synonyms == b.categories.synonyms
+
+
+class ShadowScorer:
+    """
+    Scores the primary model's traffic with shadow models in a background thread
+    
+    After the primary scores live requests, the worker thread that scored
+    them appends the requests, the encoded matrix and the primary
+    probabilities to a bounded buffer; a call is dropped when it is full.
+    Appending does not wake the shadow thread, which collects the buffer
+    every SHADOW_MAX_WAIT_MS or once batch_size rows are pending, so live
+    traffic pays no thread switch per request. A shadow whose feature plan
+    matches the primary's scores that matrix as-is; any other shadow
+    re-encodes the requests. Rows are scored through build_model_input in
+    model calls of up to batch_size rows with SHADOW_THREAD_COUNT threads,
+    after waiting up to SHADOW_MAX_YIELD_MS for interactive inference to
+    drain, so shadow models never delay a response.
+    """
+
+    def __init__(self, shadows: List[ModelBundle], sample_rate: float, queue_size: int,
+                 batch_size: int, log_path: str = ''):
+        self.shadows = shadows
+        self.sample_rate = sample_rate
+        self.queue_size = max(1, queue_size)
+        self.pending: List[Tuple[Any, ...]] = []
+        self.pending_rows = 0
+        self.batch_ready = threading.Event()
+        self.batch_size = max(1, batch_size)
+        self.log_path = log_path
+        self.log_file = None
+        # (primary plan, per-shadow "reuses the primary's matrix"), replaced as one unit on a swap
+        self.binding: Tuple[Optional[FeaturePlan], Tuple[bool, ...]] = (None, tuple(False for _ in shadows))
+        self.stopping = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+        self.dropped = 0
+        self.totals = [
+            {"compared": 0, "failed": 0, "abs_delta_sum": 0.0, "max_abs_delta": 0.0,
+             "label_agreement": 0, "risk_agreement": 0}
+            for _ in shadows
+        ]
+
+    def bind_primary(self, primary: ModelBundle):
+        """Compare against primary from now on, sharing its encoded rows where the plans match"""
+        shared = tuple(plans_compatible(shadow.plan, primary.plan) for shadow in self.shadows)
+        self.binding = (primary.plan, shared)
+        for shadow, reuse in zip(self.shadows, shared):
+            if reuse:
+                logger.info(f"✓ Shadow {shadow.version} shares the feature plan of {primary.version}")
+            else:
+                logger.info(f"✓ Shadow {shadow.version} encodes requests itself (features differ from {primary.version})")
+
+    def start(self):
+        if self.log_path:
+            self.log_file = open(self.log_path, 'a', buffering=1)
+        self.thread = threading.Thread(target=self._loop, name="shadow-scorer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the worker; calls still buffered are discarded"""
+        self.stopping.set()
+        self.batch_ready.set()
+        if self.thread is not None:
+            self.thread.join(timeout=INFERENCE_TIMEOUT)
+            if self.thread.is_alive():
+                # Still inside a model call; it may write more lines, so the
+                # log is left open and closed by the interpreter at exit
+                logger.warning(f"⚠ Shadow scorer did not stop within {INFERENCE_TIMEOUT:g}s; leaving its log open")
+                return
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    def submit(self, requests: Sequence[Any], X: np.ndarray, bundle: ModelBundle, probabilities: np.ndarray,
+               rows: Optional[Sequence[int]] = None):
+        """
+        Queue a scored call for the shadows (non-blocking; A/B variant calls are not mirrored)
+        
+        Args:
+            rows: Position of each request in the client's call (default:
+                0..n-1), logged with the call's request_id
+        """
+        if bundle is not model_registry.active:
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        with self.lock:
+            if len(self.pending) >= self.queue_size:
+                self.dropped += 1
+                return
+            self.pending.append((requests, X, bundle, probabilities, secrets.token_hex(8),
+                                 range(len(X)) if rows is None else rows))
+            self.pending_rows += len(X)
+            full = self.pending_rows >= self.batch_size
+        if full:
+            self.batch_ready.set()
+
+    def _loop(self):
+        while not self.stopping.is_set():
+            self.batch_ready.wait(SHADOW_MAX_WAIT_MS / 1000.0)
+            self.batch_ready.clear()
+            with self.lock:
+                calls, self.pending, self.pending_rows = self.pending, [], 0
+            if not calls or self.stopping.is_set():
+                continue
+            
+            wait_for_idle_inference(SHADOW_MAX_YIELD_MS / 1000.0)
+            # Calls answered by different primaries (across a swap) are compared
+            # separately; few large model calls cost far less than one per request
+            groups: Dict[int, List[Tuple[Any, ...]]] = {}
+            for call in calls:
+                groups.setdefault(id(call[2]), []).append(call)
+            for group in groups.values():
+                chunk, rows = [], 0
+                for call in group:
+                    chunk.append(call)
+                    rows += len(call[1])
+                    if rows >= self.batch_size:
+                        self._compare(chunk)
+                        chunk, rows = [], 0
+                if chunk:
+                    self._compare(chunk)
+
+    def _compare(self, calls: List[Tuple[Any, ...]]):
+        primary = calls[0][2]
+        requests = [request for call in calls for request in call[0]]
+        X = np.concatenate([call[1] for call in calls]) if len(calls) > 1 else calls[0][1]
+        primary_probabilities = np.concatenate([call[3] for call in calls])
+        primary_labels = predict_labels(primary_probabilities)
+        primary_levels = (primary_probabilities >= RISK_MEDIUM_THRESHOLD).astype(np.int8) + (primary_probabilities >= RISK_HIGH_THRESHOLD)
+        bound_plan, shared = self.binding
+        fields = None
+        # Shadow log lines name the call (request_id) and the row within it
+        request_ids = [call[4] for call in calls for _ in call[5]]
+        row_numbers = [row for call in calls for row in call[5]]
+        
+        for i, shadow in enumerate(self.shadows):
+            try:
+                if shared[i] and primary.plan is bound_plan:
+                    rows = X
+                else:
+                    if fields is None:
+                        # Fields the primary does not read are kept unparsed in the request extras
+                        fields = [
+                            request if isinstance(request, dict)
+                            else {**(request.__pydantic_extra__ or {}), **request.__dict__}
+                            for request in requests
+                        ]
+                    rows = encode_requests(shadow.plan, fields)
+                model_input = build_model_input(shadow.plan, rows)
+                probabilities = shadow.model.predict_proba(model_input, thread_count=SHADOW_THREAD_COUNT)[:, 1]
+            except Exception as e:
+                with self.lock:
+                    self.totals[i]["failed"] += len(requests)
+                logger.warning(f"⚠ Shadow {shadow.version} failed on {len(requests)} rows: {str(e)}")
+                continue
+            
+            deltas = probabilities - primary_probabilities
+            abs_deltas = np.abs(deltas)
+            label_agreement = int(np.sum(predict_labels(probabilities) == primary_labels))
+            levels = (probabilities >= RISK_MEDIUM_THRESHOLD).astype(np.int8) + (probabilities >= RISK_HIGH_THRESHOLD)
+            risk_agreement = int(np.sum(levels == primary_levels))
+            with self.lock:
+                totals = self.totals[i]
+                totals["compared"] += len(requests)
+                totals["abs_delta_sum"] += float(abs_deltas.sum())
+                totals["max_abs_delta"] = max(totals["max_abs_delta"], float(abs_deltas.max()))
+                totals["label_agreement"] += label_agreement
+                totals["risk_agreement"] += risk_agreement
+            
+            if self.log_file is not None:
+                timestamp = datetime.now().isoformat()
+                self.log_file.write("".join(
+                    json.dumps({
+                        "timestamp": timestamp,
+                        "request_id": request_id,
+                        "row": row,
+                        "primary_version": primary.version,
+                        "shadow_version": shadow.version,
+                        "primary_probability": p,
+                        "shadow_probability": q,
+                        "delta": d,
+                    }) + "\n"
+                    for request_id, row, p, q, d in zip(
+                        request_ids, row_numbers,
+                        primary_probabilities.tolist(), probabilities.tolist(), deltas.tolist(),
+                    )
+                ))
+            
+            if log_prediction_sampled():
+                logger.info(
+                    "✓ Shadow %s vs %s: %d rows, mean |delta| %.4f, label agreement %.1f%%",
+                    shadow.version, primary.version, len(requests), float(abs_deltas.mean()),
+                    100.0 * label_agreement / len(requests),
+                    extra={"event": "shadow_comparison", "model_version": primary.version,
+                           "shadow_version": shadow.version, "count": len(requests),
+                           "mean_abs_delta": float(abs_deltas.mean()), "max_abs_delta": float(abs_deltas.max()),
+                           "label_agreement": label_agreement, "risk_agreement": risk_agreement},
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        _, shared = self.binding
+        with self.lock:
+            models = []
+            for shadow, reuse, totals in zip(self.shadows, shared, self.totals):
+                compared = totals["compared"]
+                models.append({
+                    "version": shadow.version,
+                    "path": shadow.path,
+                    "shares_feature_plan": reuse,
+                    "compared": compared,
+                    "failed": totals["failed"],
+                    "mean_abs_delta": totals["abs_delta_sum"] / compared if compared else None,
+                    "max_abs_delta": totals["max_abs_delta"] if compared else None,
+                    "label_agreement": totals["label_agreement"] / compared if compared else None,
+                    "risk_agreement": totals["risk_agreement"] / compared if compared else None,
+                })
+            return {
+                "sample_rate": self.sample_rate,
+                "queue_depth": len(self.pending),
+                "dropped": self.dropped,
+                "models": models,
+            }
+
+
+# ============================================================================
+# EXPLANATIONS
+# ============================================================================
+
+def explain_encoded(X: np.ndarray, bundle: Optional[ModelBundle] = None) -> np.ndarray:
+    """
+    SHAP feature contributions for an encoded feature matrix (blocking)
+    
+    All rows missing from the explanation cache go through one vectorized
+    ShapValues call; batches above PREDICTION_CACHE_MAX_BATCH rows bypass
+    the cache. Contributions are in log-odds: each row's
+    contributions plus its last column (the expected value) sum to the
+    model's raw score.
+    
+    Args:
+        X: Matrix from encode_requests / encode_frame
+        bundle: Model to use (default: the active model)
+    
+    Returns:
+        Array of shape (len(X), n_features + 1)
+    """
+    bundle = bundle or model_registry.active
+    
+    def shap_values(rows: np.ndarray) -> np.ndarray:
+        started = time.perf_counter()
+        values = bundle.model.get_feature_importance(
+            build_model_input(bundle.plan, rows, backend='pool'),
+            type='ShapValues',
+            thread_count=MODEL_THREAD_COUNT,
+        )
+        if metrics is not None:
+            metrics.observe_stage('explain', time.perf_counter() - started)
+        return values
+    
+    if explanation_cache is None or len(X) > PREDICTION_CACHE_MAX_BATCH:
+        return shap_values(X)
+    
+    # Same content-addressed key as the prediction cache
+    keys = [feature_cache_key(bundle.fingerprint, row) for row in X]
+    contributions = np.empty((len(keys), len(bundle.feature_names) + 1), dtype=np.float64)
+    misses = []
+    for i, key in enumerate(keys):
+        cached = explanation_cache.get(key)
+        if cached is None:
+            misses.append(i)
+        else:
+            contributions[i] = cached
+    
+    if misses:
+        computed = shap_values(X[misses])
+        contributions[misses] = computed
+        for i, row in zip(misses, computed):
+            explanation_cache.put(keys[i], row)
+    
+    return contributions
+
+
+def explain_requests(requests: Sequence[Any], top_k: int, bundle: Optional[ModelBundle] = None) -> List[Dict[str, Any]]:
+    """
+    Encode requests and build their explanations (blocking)
+    
+    The probability is derived from the contributions (the sigmoid of
+    their sum equals predict_proba), so no separate model call is made.
+    
+    Args:
+        requests: PredictionRequest objects or plain dictionaries
+        top_k: Contributors returned per patient, by absolute size (0 = all)
+        bundle: Model to use (default: the active model)
+    
+    Returns:
+        One explanation dictionary per request
+    """
+    bundle = bundle or model_registry.active
+    X = encode_requests(bundle.plan if bundle else None, requests)
+    contributions = explain_encoded(X, bundle)
+    
+    features = contributions[:, :-1]
+    expected = contributions[:, -1]
+    probabilities = 1.0 / (1.0 + np.exp(-contributions.sum(axis=1)))
+    predictions = predict_labels(probabilities)
+    
+    n_features = features.shape[1]
+    k = n_features if top_k <= 0 else min(top_k, n_features)
+    order = np.argsort(-np.abs(features), axis=1, kind='stable')
+    
+    explanations = []
+    for i in range(len(X)):
+        top = order[i, :k].tolist()
+        values = features[i]
+        explanations.append({
+            "prediction": int(predictions[i]),
+            "probability": float(probabilities[i]),
+            "risk_level": get_risk_category(float(probabilities[i])),
+            "label": get_progression_label(int(predictions[i])),
+            "base_value": float(expected[i]),
+            "contributions": [
+                {
+                    "feature": bundle.feature_names[j],
+                    "value": None if isinstance(X[i, j], float) and np.isnan(X[i, j]) else X[i, j],
+                    "contribution": float(values[j]),
+                }
+                for j in top
+            ],
+            # Sum of the contributions not listed, so totals still add up
+            "other_contribution": float(values[order[i, k:]].sum()),
+        })
+    return explanations
+
+
+# ============================================================================
+# WHAT-IF ANALYSIS
+# ============================================================================
+
+def expand_what_if(body: WhatIfRequest, schema: RequestSchema) -> Tuple[Dict[str, Any], List[Tuple[str, Dict[str, Any]]]]:
+    """
+    Validate a /what-if body against the model's request schema
+    
+    Explicit variants come first, then one variant per grid value. Changes
+    may name request fields (diagnoses_tumor_grade) or model features
+    (diagnoses.tumor_grade); only fields the model consumes are allowed.
+    
+    Args:
+        body: Parsed /what-if body
+        schema: Request schema of the model that will score the variants
+    
+    Returns:
+        Tuple of (base patient values, list of (name, validated changes))
+    
+    Raises:
+        HTTPException: 400 for unknown fields or too many variants
+        RequestValidationError: 422 for values of the wrong type
+    """
+    try:
+        base = schema.model.model_validate(body.patient)
+    except ValidationError as e:
+        raise_body_validation_error(e, ("patient",))
+    
+    scenarios = [(variant.name, variant.changes, ("variants", i, "changes")) for i, variant in enumerate(body.variants)]
+    scenarios += [
+        (None, {key: value}, ("grid",))
+        for key, values in body.grid.items()
+        for value in values
+    ]
+    if len(scenarios) > WHAT_IF_MAX_VARIANTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many variants ({len(scenarios)}); at most {WHAT_IF_MAX_VARIANTS} per request"
+        )
+    
+    variants = []
+    for name, changes, loc in scenarios:
+        fields = {}
+        for key, value in changes.items():
+            field = key.replace('.', '_')
+            if field not in schema.field_types:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown feature or not used by the model: {key}"
+                )
+            fields[field] = value
+        try:
+            validated = schema.model.model_validate(fields)
+        except ValidationError as e:
+            raise_body_validation_error(e, loc)
+        fields = {field: getattr(validated, field) for field in fields}
+        variants.append((name or "; ".join(f"{field}={value}" for field, value in fields.items()), fields))
+    
+    return dict(base.__dict__), variants
+
+
+# ============================================================================
+# BATCH JOBS
+# ============================================================================
+
+JOB_FINISHED = ('succeeded', 'failed', 'cancelled')
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,               -- queued, running, succeeded, failed, cancelled
+    source TEXT NOT NULL,               -- records or file
+    path TEXT,
+    format TEXT,
+    id_column TEXT,
+    chunk_size INTEGER NOT NULL,
+    total INTEGER,                      -- unknown for files until the last chunk
+    processed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    next_chunk INTEGER NOT NULL DEFAULT 0,
+    model_version TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    lease_until REAL
+);
+CREATE TABLE IF NOT EXISTS job_chunks (
+    job_id TEXT NOT NULL,
+    chunk INTEGER NOT NULL,
+    input BLOB,                         -- NDJSON records (inline jobs)
+    results BLOB,                       -- NDJSON results, once scored
+    PRIMARY KEY (job_id, chunk)
+);
+"""
+
+
+class JobStore:
+    """
+    Durable job queue in a local SQLite database
+    
+    A chunk's results and the job's progress are committed together, so a
+    job interrupted at any point resumes at its first unscored chunk. Jobs
+    are claimed under a lease: a running job whose lease has expired (its
+    process died) is claimed again, also by other worker processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(JOBS_SCHEMA)
+
+    def create(self, source: str, chunk_size: int, chunks: Sequence[bytes] = (), total: Optional[int] = None,
+               path: Optional[str] = None, fmt: Optional[str] = None, id_column: Optional[str] = None) -> str:
+        """Queue a job (inline input already split into NDJSON chunks)"""
+        job_id = secrets.token_hex(8)
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.execute(
+                    "INSERT INTO jobs (id, status, source, path, format, id_column, chunk_size, total, created_at) "
+                    "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, source, path, fmt, id_column, chunk_size, total, datetime.now().isoformat()),
+                )
+                self.db.executemany(
+                    "INSERT INTO job_chunks (job_id, chunk, input) VALUES (?, ?, ?)",
+                    [(job_id, i, chunk) for i, chunk in enumerate(chunks)],
+                )
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Lease the oldest queued job, or a running one whose lease has expired"""
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    self.db.execute(
+                        "UPDATE jobs SET status = 'running', lease_until = ?, "
+                        "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                        (now + JOBS_LEASE_SECONDS, datetime.now().isoformat(), row["id"]),
+                    )
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        return dict(row) if row is not None else None
+
+    def release(self, job_id: str):
+        """Hand a running job back to the queue (shutdown, model not loaded)"""
+        with self.lock:
+            self.db.execute("UPDATE jobs SET status = 'queued', lease_until = NULL "
+                            "WHERE id = ? AND status = 'running'", (job_id,))
+
+    def input_chunks(self, job_id: str, start: int) -> Any:
+        """Yield (chunk index, NDJSON bytes) of an inline job from start on"""
+        chunk = start
+        while True:
+            with self.lock:
+                row = self.db.execute("SELECT input FROM job_chunks WHERE job_id = ? AND chunk = ?",
+                                      (job_id, chunk)).fetchone()
+            if row is None or row["input"] is None:
+                return
+            yield chunk, row["input"]
+            chunk += 1
+
+    def save_chunk(self, job_id: str, chunk: int, results: bytes, processed: int, failed: int,
+                   model_version: str) -> bool:
+        """
+        Store a chunk's results and advance the job past it, atomically
+        
+        Returns:
+            False if the job is no longer running at this chunk (cancelled,
+            deleted or taken over), in which case nothing is written
+        """
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                updated = self.db.execute(
+                    "UPDATE jobs SET next_chunk = next_chunk + 1, processed = processed + ?, failed = failed + ?, "
+                    "model_version = ?, lease_until = ? WHERE id = ? AND status = 'running' AND next_chunk = ?",
+                    (processed, failed, model_version, time.time() + JOBS_LEASE_SECONDS, job_id, chunk),
+                ).rowcount
+                if updated:
+                    self.db.execute(
+                        "INSERT INTO job_chunks (job_id, chunk, results) VALUES (?, ?, ?) "
+                        "ON CONFLICT (job_id, chunk) DO UPDATE SET results = excluded.results, input = NULL",
+                        (job_id, chunk, results),
+                    )
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        return bool(updated)
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None):
+        with self.lock:
+            self.db.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL, "
+                "total = COALESCE(total, processed) WHERE id = ? AND status IN ('queued', 'running')",
+                (status, error, datetime.now().isoformat(), job_id),
+            )
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Mark a queued or running job cancelled, keeping the results so far
+        
+        A running job stops at its next chunk: save_chunk no longer accepts it.
+        
+        Returns:
+            False if the job does not exist or has already finished
+        """
+        with self.lock:
+            updated = self.db.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ?, lease_until = NULL "
+                "WHERE id = ? AND status IN ('queued', 'running')",
+                (datetime.now().isoformat(), job_id),
+            ).rowcount
+        return bool(updated)
+
+    def delete(self, job_id: str) -> bool:
+        """Remove a job and its results (a running job stops at its next chunk)"""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = self.db.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount
+                self.db.execute("DELETE FROM job_chunks WHERE job_id = ?", (job_id,))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        return bool(deleted)
+
+    def results(self, job_id: str, start: int) -> List[Tuple[int, bytes]]:
+        """Scored chunks from start on, in order, up to the first gap"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT chunk, results FROM job_chunks WHERE job_id = ? AND chunk >= ? AND results IS NOT NULL "
+                "ORDER BY chunk",
+                (job_id, start),
+            ).fetchall()
+        ready = []
+        for row in rows:
+            if row["chunk"] != start + len(ready):
+                break
+            ready.append((row["chunk"], row["results"]))
+        return ready
+
+    def counts(self) -> Dict[str, int]:
+        with self.lock:
+            return {row["status"]: row["n"] for row in
+                    self.db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def describe_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of a job row"""
+    total = job["total"]
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "source": job["source"],
+        "total": total,
+        "processed": job["processed"],
+        "failed": job["failed"],
+        "progress": job["processed"] / total if total else (1.0 if job["status"] == 'succeeded' else None),
+        "model_version": job["model_version"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "results_url": f"/jobs/{job['id']}/results",
+    }
+
+
+def format_job_results(first_row: int, scored: List[Any], ids: Optional[List[Any]], id_column: Optional[str]) -> Tuple[bytes, int]:
+    """
+    NDJSON result lines for one scored chunk
+    
+    Returns:
+        Tuple of (NDJSON bytes, number of records that failed)
+    """
+    lines = []
+    failed = 0
+    for i, result in enumerate(scored):
+        line = {"row": first_row + i}
+        if id_column:
+            line[id_column] = ids[i] if ids is not None else None
+        if isinstance(result, tuple):
+            line.update(build_batch_prediction(*result))
+        else:
+            line["error"] = f"Prediction failed: {result}"
+            failed += 1
+        lines.append(json.dumps(line, default=str))
+    return "".join(line + "\n" for line in lines).encode(), failed
+
+
+class JobRunner:
+    """
+    Background threads that process queued jobs one chunk at a time
+    
+    Chunks are scored in these threads, not in the inference pool, so jobs
+    never take /predict's queue slots; before each chunk a job waits up to
+    JOBS_MAX_YIELD_MS for interactive inference to drain.
+    """
+
+    def __init__(self, store: JobStore, workers: int):
+        self.store = store
+        self.workers = max(1, workers)
+        self.stopping = threading.Event()
+        self.wake = threading.Event()
+        self.threads: List[threading.Thread] = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """Stop after the current chunks; unfinished jobs resume on the next start"""
+        self.stopping.set()
+        self.wake.set()
+        for thread in self.threads:
+            thread.join(timeout=INFERENCE_TIMEOUT)
+
+    def notify(self):
+        """A job was queued"""
+        self.wake.set()
+
+    def _loop(self):
+        while not self.stopping.is_set():
+            try:
+                job = self.store.claim()
+            except Exception as e:
+                logger.error(f"✗ Job queue error: {str(e)}")
+                job = None
+            if job is None:
+                self.wake.wait(1.0)
+                self.wake.clear()
+                continue
+            
+            try:
+                self._run(job)
+            except Exception as e:
+                self.store.finish(job["id"], 'failed', str(e))
+                logger.error(f"✗ Job {job['id']} failed: {str(e)}")
+
+    def _chunks(self, job: Dict[str, Any]) -> Any:
+        """Yield (chunk index, records or frame, ids) from the job's next chunk on"""
+        if job["source"] == 'records':
+            for chunk, data in self.store.input_chunks(job["id"], job["next_chunk"]):
+                records = [json.loads(line) for line in data.splitlines()]
+                ids = [record.get(job["id_column"]) for record in records] if job["id_column"] else None
+                yield chunk, records, ids
+        else:
+            # Same chunked reader as the offline bulk scorer
+            from bulk_score import read_chunks
+            frames = read_chunks(job["path"], job["format"], job["chunk_size"], skip_chunks=job["next_chunk"])
+            for chunk, frame in enumerate(frames, start=job["next_chunk"]):
+                id_column = job["id_column"]
+                ids = frame[id_column].tolist() if id_column and id_column in frame.columns else None
+                yield chunk, frame, ids
+
+    def _run(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        first_row = job["processed"]
+        logger.info(f"✓ Job {job_id} {'resumed' if job['next_chunk'] else 'started'} at chunk {job['next_chunk']}")
+        
+        for chunk, data, ids in self._chunks(job):
+            bundle = model_registry.active
+            if self.stopping.is_set() or bundle is None:
+                self.store.release(job_id)
+                return
+            
+            wait_for_idle_inference(JOBS_MAX_YIELD_MS / 1000.0)
+            if isinstance(data, pd.DataFrame):
+                scored = score_encoded_isolated(encode_frame(bundle.plan, data), bundle)
+            else:
+                scored = score_requests_isolated(data, bundle)
+            results, failed = format_job_results(first_row, scored, ids, job["id_column"])
+            
+            if not self.store.save_chunk(job_id, chunk, results, len(scored), failed, bundle.version):
+                logger.info(f"✓ Job {job_id} stopped (cancelled or taken over)")
+                return
+            first_row += len(scored)
+        
+        self.store.finish(job_id, 'succeeded')
+        logger.info(f"✓ Job {job_id} finished: {first_row} records")
+
+
+def resolve_job_file(path: str) -> Tuple[str, str]:
+    """
+    Resolve a file job's path inside JOBS_INPUT_DIR
+    
+    Returns:
+        Tuple of (absolute path, input format)
+    
+    Raises:
+        HTTPException: 400 if file jobs are disabled, the path leaves
+            JOBS_INPUT_DIR, or the file is missing or of an unknown type
+    """
+    if not JOBS_INPUT_DIR:
+        raise HTTPException(
+            status_code=400,
+            detail="File jobs are disabled (JOBS_INPUT_DIR is not set)"
+        )
+    from bulk_score import INPUT_FORMATS, detect_format
+    
+    root = os.path.realpath(JOBS_INPUT_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root or not os.path.isfile(resolved):
+        raise HTTPException(
+            status_code=400,
+            detail=f"No such file in JOBS_INPUT_DIR: {path}"
+        )
+    try:
+        return resolved, detect_format(resolved, INPUT_FORMATS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ============================================================================
+# ARROW / PARQUET INGEST
+# ============================================================================
+
+# Body content type -> format of /batch-predict/arrow (responses use the
+# first content type listed for a format)
+ARROW_CONTENT_TYPES = {
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+}
+RISK_LEVELS = ("Low", "Medium", "High")
+PROGRESSION_LABELS = ("No Progression", "Progression")
+
+
+def score_arrow(body: bytes, fmt: str, output: str, id_column: Optional[str], bundle: ModelBundle) -> Tuple[bytes, int]:
+    """
+    Score an Arrow IPC stream or Parquet body into a result table (blocking)
+    
+    The input goes through encode_arrow and one model call, and the output
+    columns are built from NumPy arrays, with risk level and label as
+    dictionary columns, so no Python object is created per row.
+    
+    Args:
+        body: Request body
+        fmt: Input format, "arrow" or "parquet"
+        output: Response format, "arrow" or "parquet"
+        id_column: Input column copied to the results
+        bundle: Model to use
+    
+    Returns:
+        Tuple of (encoded result table, number of rows)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    if fmt == "parquet":
+        table = pq.read_table(pa.BufferReader(body))
+    else:
+        table = pa.ipc.open_stream(pa.BufferReader(body)).read_all()
+    if id_column and id_column not in table.column_names:
+        raise ValueError(f"id_column '{id_column}' is not in the table")
+    
+    probabilities, predictions = score_features(
+        build_model_input(bundle.plan, encode_arrow(bundle.plan, table, bundle.request_schema)), bundle
+    )
+    
+    started = time.perf_counter()
+    levels = (probabilities >= RISK_MEDIUM_THRESHOLD).astype(np.int8) + (probabilities >= RISK_HIGH_THRESHOLD)
+    if metrics is not None:
+        for level, count in zip(RISK_LEVELS, np.bincount(levels, minlength=len(RISK_LEVELS)).tolist()):
+            if count:
+                metrics.count_prediction(level, count)
+    
+    columns = {id_column: table.column(id_column)} if id_column else {}
+    columns.update({
+        "prediction": pa.array(predictions),
+        "probability": pa.array(probabilities),
+        "risk_level": pa.DictionaryArray.from_arrays(pa.array(levels), pa.array(RISK_LEVELS)),
+        "label": pa.DictionaryArray.from_arrays(pa.array(predictions.astype(np.int8)), pa.array(PROGRESSION_LABELS)),
+    })
+    results = pa.table(columns)
+    
+    sink = pa.BufferOutputStream()
+    if output == "parquet":
+        pq.write_table(results, sink)
+    else:
+        with pa.ipc.new_stream(sink, results.schema) as writer:
+            writer.write_table(results)
+    if metrics is not None:
+        metrics.observe_stage('serialize', time.perf_counter() - started)
+    return sink.getvalue().to_pybytes(), table.num_rows
+
+
+# ============================================================================
+# PROFILING
+# ============================================================================
+
+# Where a sample's time goes: the first frame from the thread root that is
+# feature preparation or CatBoost decides it (Pool construction counts as
+# feature preparation), then request parsing/serialization, then framework
+PROFILE_FEATURE_FUNCTIONS = frozenset({
+    'encode_requests', 'encode_frame', 'build_model_input', 'prepare_features',
+    'prepare_features_batch', 'encode_feature_value', '_canonical',
+})
+PROFILE_PARSING_FUNCTIONS = frozenset({
+    'decode_json_body', 'parse_requests', 'fast_validate_request', 'json_response',
+})
+PROFILE_FRAMEWORK_PACKAGES = ('fastapi', 'starlette', 'uvicorn', 'anyio', 'asyncio', 'h11', 'httptools', 'pydantic')
+
+# Leaf frames of threads that are blocked waiting for work
+PROFILE_IDLE_FRAMES = frozenset({
+    ('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'), ('selectors.py', 'select'),
+    ('queue.py', 'get'), ('thread.py', '_worker'), ('tasks.py', 'sleep'),
+})
+
+
+def profile_category(stack: Sequence[Tuple[str, str]]) -> str:
+    """
+    Classify one sampled stack
+    
+    Args:
+        stack: (file path, function) pairs from the thread root to the leaf
+    
+    Returns:
+        "features", "catboost", "parsing", "framework" or "other"
+    """
+    for path, function in stack:
+        if function in PROFILE_FEATURE_FUNCTIONS and path == __file__:
+            return "features"
+        if f"{os.sep}catboost{os.sep}" in path:
+            return "catboost"
+    for path, function in stack:
+        if function in PROFILE_PARSING_FUNCTIONS and path == __file__:
+            return "parsing"
+    for path, _ in stack:
+        if any(f"{os.sep}{package}{os.sep}" in path for package in PROFILE_FRAMEWORK_PACKAGES):
+            return "framework"
+    return "other"
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for the whole process
+    
+    A thread started only for the profiling window snapshots every other
+    thread's Python stack (sys._current_frames) at a fixed interval, so
+    nothing runs and nothing is hooked while no profile is being taken.
+    Threads blocked waiting for work are skipped unless include_idle.
+    """
+
+    def __init__(self, interval: float, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks: Dict[Tuple[str, ...], int] = {}     # "thread;frame;...;leaf" parts -> samples
+        self.categories: Dict[str, int] = {}
+        self.frames: Dict[Tuple[str, str, int], int] = {}   # (function, file, line) -> speedscope index
+        self.timelines: Dict[str, List[List[int]]] = {}     # thread -> speedscope sample stacks
+        self.samples = 0
+        self.duration = 0.0
+
+    def run(self, seconds: float, stop: threading.Event):
+        """Sample until seconds elapse or stop is set (blocking)"""
+        me = threading.get_ident()
+        started = time.perf_counter()
+        deadline = started + seconds
+        while not stop.is_set() and time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    self._record(names.get(ident, str(ident)), frame)
+            self.samples += 1
+            stop.wait(self.interval)
+        self.duration = time.perf_counter() - started
+
+    def _record(self, thread_name: str, frame: Any):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        if not stack:
+            return
+        
+        leaf_path, leaf_function, _ = stack[-1]
+        if not self.include_idle and (os.path.basename(leaf_path), leaf_function) in PROFILE_IDLE_FRAMES:
+            return
+        
+        category = profile_category([(path, function) for path, function, _ in stack])
+        self.categories[category] = self.categories.get(category, 0) + 1
+        
+        labels = tuple(f"{function} ({os.path.basename(path)}:{line})" for path, function, line in stack)
+        key = (f"thread {thread_name}",) + labels
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+        
+        indices = []
+        for path, function, line in stack:
+            frame_key = (function, path, line)
+            if frame_key not in self.frames:
+                self.frames[frame_key] = len(self.frames)
+            indices.append(self.frames[frame_key])
+        self.timelines.setdefault(thread_name, []).append(indices)
+
+    def breakdown(self) -> Dict[str, Any]:
+        """Share of non-idle samples per category"""
+        total = sum(self.categories.values())
+        return {
+            category: {"samples": count, "share": count / total}
+            for category, count in sorted(self.categories.items(), key=lambda item: -item[1])
+        }
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed stack format (flamegraph.pl, speedscope)"""
+        return "".join(
+            f"{';'.join(label.replace(';', ',') for label in stack)} {count}\n"
+            for stack, count in sorted(self.stacks.items())
+        )
+
+    def speedscope(self) -> Dict[str, Any]:
+        """speedscope's file format, one sampled profile per thread"""
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"cancer-api profile ({self.duration:.1f}s)",
+            "exporter": "cancer-api",
+            "shared": {
+                "frames": [
+                    {"name": function, "file": path, "line": line}
+                    for (function, path, line), _ in sorted(self.frames.items(), key=lambda item: item[1])
+                ]
+            },
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": thread_name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": len(samples) * self.interval,
+                    "samples": samples,
+                    "weights": [self.interval] * len(samples),
+                }
+                for thread_name, samples in self.timelines.items()
+            ],
+        }
+
+
+# ============================================================================
+# REQUEST PARSING
+# ============================================================================
+
+# /predict and /batch-predict read their bodies here instead of through
+# FastAPI so that each request is validated against the schema of the model
+# that serves it (only the fields that model consumes)
+if FAST_JSON_ENABLED and orjson is None:
+    logger.warning("⚠ FAST_JSON_ENABLED is set but orjson is not installed; using the standard JSON path")
+FAST_JSON = FAST_JSON_ENABLED and orjson is not None
+
+
+def json_body_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """openapi_extra documenting a JSON request body read by the endpoint itself"""
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": schema}}}}
+
+
+def fast_validate_request(data: Any, schema: RequestSchema) -> Optional[Dict[str, Any]]:
+    """
+    Cheap type check of one decoded request object
+    
+    Accepts the common case - strings for text fields, JSON numbers for
+    numeric fields, nulls - and returns the values the schema model would
+    hold (numbers as floats; unused keys kept as-is or dropped per
+    REQUEST_UNUSED_FIELDS).
+    
+    Returns:
+        Dictionary for encode_requests, or None if anything needs pydantic
+        (coercion or a validation error)
+    """
+    if type(data) is not dict:
+        return None
+    
+    field_types = schema.field_types
+    passthrough = REQUEST_UNUSED_FIELDS == 'passthrough'
+    values = {}
+    for key, value in data.items():
+        expected = field_types.get(key)
+        if expected is None:
+            if passthrough:
+                values[key] = value
+            continue
+        if value is None:
+            continue
+        kind = type(value)
+        if expected is str:
+            if kind is not str:
+                return None
+        elif kind is int:
+            value = float(value)
+        elif kind is not float:
+            return None
+        values[key] = value
+    return values
+
+
+def raise_body_validation_error(error: ValidationError, loc: Tuple[Any, ...] = ()):
+    """Re-raise a pydantic error as FastAPI's 422 for the request body (or the part at loc)"""
+    raise RequestValidationError([
+        {**err, "loc": ("body", *loc, *err["loc"])}
+        for err in error.errors(include_url=False)
+    ])
+
+
+async def receive_body(request: Request) -> bytes:
+    """
+    Read the whole request body, timed as the 'receive' stage
+    
+    Raises:
+        RequestValidationError: Empty body
+    """
+    started = time.perf_counter()
+    body = await request.body()
+    if metrics is not None:
+        metrics.observe_stage('receive', time.perf_counter() - started)
+    if not body:
+        raise RequestValidationError([
+            {"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}
+        ])
+    return body
+
+
+def decode_json_body(request: Request, body: bytes) -> Any:
+    """
+    Decode a request body like FastAPI does for a JSON body parameter
+    
+    Returns:
+        Decoded JSON, or the raw bytes when the content type is not JSON
+        (which then fails validation)
+    
+    Raises:
+        RequestValidationError: Malformed JSON
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if not (content_type == "application/json"
+            or (content_type.startswith("application/") and content_type.endswith("+json"))):
+        return body
+    
+    try:
+        return orjson.loads(body) if FAST_JSON else json.loads(body)
+    except json.JSONDecodeError as e:   # orjson.JSONDecodeError subclasses it
+        raise RequestValidationError([
+            {"type": "json_invalid", "loc": ("body", e.pos), "msg": "JSON decode error",
+             "input": {}, "ctx": {"error": e.msg}}
+        ])
+
+
+def parse_requests(data: Any, schema: RequestSchema, many: bool = False) -> Any:
+    """
+    Validate a decoded /predict body (or /batch-predict body with many=True)
+    
+    With FAST_JSON the common case skips pydantic and yields dictionaries.
+    
+    Args:
+        data: Decoded request body
+        schema: Request schema of the model that will score the request
+        many: Body is a list of requests
+    
+    Returns:
+        Parsed request, or list of parsed requests
+    
+    Raises:
+        RequestValidationError: 422 in FastAPI's format
+    """
+    if FAST_JSON:
+        if not many:
+            values = fast_validate_request(data, schema)
+            if values is not None:
+                return values
+        elif type(data) is list:
+            values = [fast_validate_request(item, schema) for item in data]
+            if all(item is not None for item in values):
+                return values
+    
+    try:
+        if many:
+            return schema.batch_adapter.validate_python(data, from_attributes=True)
+        return schema.model.model_validate(data, from_attributes=True)
+    except ValidationError as e:
+        raise_body_validation_error(e)
+
+
+def json_response(content: Any) -> Response:
+    """JSON response for a prebuilt payload (orjson-encoded with FAST_JSON)"""
+    started = time.perf_counter()
+    if FAST_JSON:
+        response = Response(content=orjson.dumps(content), media_type="application/json")
+    else:
+        response = JSONResponse(content)
+    if metrics is not None:
+        metrics.observe_stage('serialize', time.perf_counter() - started)
+    return response
+
+
+# ============================================================================
+# ENDPOINTS
+# ============================================================================
+
+@app.on_event("startup")
+async def startup_event():
+    """Load and warm up the model and its A/B and shadow variants, then start the inference pool and job workers"""
+    start_async_logging()
+    logger.info("Starting Cancer Progression Prediction API...")
+    try:
+        check_thresholds()
+    except ValueError as e:
+        # Labels and risk levels would be wrong for every request
+        logger.error(f"✗ Invalid configuration: {str(e)}")
+        raise
+    if INFERENCE_BACKEND not in ('pool', 'pandas'):
+        logger.warning(f"⚠ Unknown INFERENCE_BACKEND '{INFERENCE_BACKEND}', using pandas")
+    logger.info(f"✓ Inference backend: {INFERENCE_BACKEND}")
+    
+    timings = {"imports": IMPORT_SECONDS}
+    
+    if model_loaded:
+        # Preloaded before fork; warm-up below still runs per worker so that
+        # CatBoost's thread pool is created after the fork
+        logger.info(f"✓ Using preloaded model (worker pid {os.getpid()})")
+    else:
+        started = time.perf_counter()
+        load_model()
+        timings["model_load"] = time.perf_counter() - started
+    
+    if metrics is not None:
+        metrics.start_exporting()
+    
+    if MODEL_RELOAD_FILE:
+        # Serve the model a reload activated in the other workers, if any
+        started = time.perf_counter()
+        model_registry.apply_requested_model()
+        model_registry.start_watching()
+        timings["reload_sync"] = time.perf_counter() - started
+    
+    if WARMUP_ENABLED:
+        started = time.perf_counter()
+        warm_up_model()
+        timings["warm_up"] = time.perf_counter() - started
+    
+    if AB_MODELS or SHADOW_MODELS:
+        started = time.perf_counter()
+        load_model_variants()
+        timings["variants"] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    global inference_executor
+    inference_executor = ThreadPoolExecutor(
+        max_workers=max(1, INFERENCE_WORKERS), thread_name_prefix="inference"
+    )
+    logger.info(f"✓ Inference pool: {INFERENCE_WORKERS} workers x {MODEL_THREAD_COUNT} model threads, queue size {INFERENCE_QUEUE_SIZE}")
+    
+    if MICROBATCH_ENABLED:
+        global micro_batcher
+        micro_batcher = MicroBatcher(MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS)
+        micro_batcher.start()
+        logger.info(f"✓ Micro-batching enabled (max {MICROBATCH_MAX_SIZE} requests / {MICROBATCH_MAX_WAIT_MS:g} ms)")
+    
+    if JOBS_DB_PATH:
+        global job_store, job_runner
+        try:
+            job_store = JobStore(JOBS_DB_PATH)
+            job_runner = JobRunner(job_store, JOBS_WORKERS)
+            job_runner.start()
+            logger.info(f"✓ Batch jobs: {JOBS_WORKERS} workers, queue in {JOBS_DB_PATH}")
+        except Exception as e:
+            job_store = None
+            logger.error(f"✗ Batch jobs disabled, cannot open {JOBS_DB_PATH}: {str(e)}")
+    timings["workers"] = time.perf_counter() - started
+    
+    timings["total"] = time.perf_counter() - IMPORT_STARTED
+    logger.info("✓ Startup timings: " + " | ".join(f"{phase} {seconds:.3f}s" for phase, seconds in timings.items()))
+    
+    if model_loaded:
+        logger.info("✓ API ready for predictions")
+    else:
+        logger.warning("⚠️  Model not loaded - API will return errors for predictions")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the micro-batcher, job workers, shadow scorer and the inference worker pool, flush the log queue"""
+    if micro_batcher is not None:
+        await micro_batcher.stop()
+    await asyncio.to_thread(model_registry.stop_watching)
+    if metrics is not None:
+        await asyncio.to_thread(metrics.stop_exporting)
+    if shadow_scorer is not None:
+        await asyncio.to_thread(shadow_scorer.stop)
+    if job_runner is not None:
+        # Running jobs resume from their last saved chunk on the next start
+        await asyncio.to_thread(job_runner.stop)
+        job_store.close()
+    if inference_executor is not None:
+        inference_executor.shutdown(wait=False, cancel_futures=True)
+    stop_async_logging()
+
+
+@app.get("/", tags=["Info"])
+async def root():
+    """Root endpoint with API information"""
+    return {
+        "name": "Cancer Progression Prediction API",
+        "version": "1.0.0",
+        "status": "running",
+        "model_loaded": model_loaded,
+        "decision_threshold": PREDICTION_THRESHOLD,
+        "endpoints": {
+            "health": "/health",
+            "predict": "/predict",
+            "batch_predict": "/batch-predict",
+            "batch_predict_stream": "/batch-predict/stream",
+            "batch_predict_arrow": "/batch-predict/arrow",
+            "what_if": "/what-if",
+            "jobs": "/jobs",
+            "explain": "/explain",
+            "batch_explain": "/batch-explain",
+            "stats": "/stats",
+            "metrics": "/metrics",
+            "admin_model": "/admin/model",
+            "docs": "/docs",
+            "openapi": "/openapi.json"
+        }
+    }
+
+
+@app.get("/stats", tags=["Info"])
+async def stats():
+    """
+    Serving statistics
+    
+    Returns:
+        Inference pool settings, micro-batching histograms, cache and
+        category normalization counters, A/B weights and shadow comparisons
+    """
+    bundle = model_registry.active
+    categories = bundle.plan.categories if bundle is not None and bundle.plan is not None else None
+    return {
+        "inference_pool": {
+            "workers": INFERENCE_WORKERS,
+            "queue_size": INFERENCE_QUEUE_SIZE,
+        },
+        "micro_batching": micro_batcher.stats() if micro_batcher is not None else None,
+        "prediction_cache": prediction_cache.stats() if prediction_cache is not None else None,
+        "explanation_cache": explanation_cache.stats() if explanation_cache is not None else None,
+        "category_normalization": categories.stats() if categories is not None else None,
+        "jobs": {"workers": JOBS_WORKERS, "by_status": job_store.counts()} if job_store is not None else None,
+        "ab_routing": [
+            {"version": variant.version, "weight": weight} for variant, weight in model_registry.variants
+        ] or None,
+        "shadow": shadow_scorer.stats() if shadow_scorer is not None else None,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.get("/metrics", tags=["Info"], response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Prometheus metrics: per-stage latency histograms, request and
+    prediction counters, batch sizes, queue depth and the active model
+    
+    Raises:
+        HTTPException: 404 if METRICS_ENABLED is off
+    """
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/health", response_model=HealthResponse, tags=["Health"])
+async def health_check():
+    """
+    Health check endpoint
+    
+    Returns:
+        Health status and model availability
+    """
+    return HealthResponse(
+        status="healthy" if model_loaded else "degraded",
+        model_loaded=model_loaded,
+        timestamp=datetime.now().isoformat()
+    )
+
+
+@app.post(
+    "/predict",
+    response_model=PredictionResponse,
+    tags=["Prediction"],
+    openapi_extra=json_body_schema(PredictionRequest.model_json_schema()),
+)
+async def predict(request: Request):
+    """
+    Generate cancer progression prediction
+    
+    Args:
+        request: Patient features in PredictionRequest format (JSON body)
+    
+    Returns:
+        Prediction with probability, risk level, and confidence
+    
+    Raises:
+        HTTPException: If model not loaded or prediction fails
+    """
+    
+    # Check if model is loaded; the request is validated against and served
+    # by this model (the active one or an A/B variant) even if another one
+    # is activated meanwhile
+    bundle = model_registry.route()
+    if bundle is None:
+        logger.error("Prediction requested but model not loaded")
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded. API temporarily unavailable."
+        )
+    
+    body = await receive_body(request)
+    started = time.perf_counter()
+    patient = parse_requests(decode_json_body(request, body), bundle.request_schema)
+    if metrics is not None:
+        metrics.observe_stage('parse', time.perf_counter() - started)
+    
+    try:
+        if micro_batcher is not None:
+            # Scored together with other concurrent calls
+            payload = (await micro_batcher.submit(patient, bundle)).model_dump()
+        else:
+            # Encode and score in the worker pool; the model runs once and
+            # the class comes from the decision threshold
+            probabilities, predictions = await run_inference(score_requests, [patient], bundle, True)
+            payload = build_prediction_payload(float(probabilities[0]), int(predictions[0]), bundle.version)
+        
+        if log_prediction_sampled():
+            logger.info(
+                "✓ Prediction generated: %s (%.4f)", payload['progression_label'], payload['progression_probability'],
+                extra={"event": "prediction", "risk_level": payload['risk_level'],
+                       "probability": payload['progression_probability'], "model_version": payload['model_version']},
+            )
+        
+        return json_response(payload)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"✗ Prediction error: {str(e)}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Prediction failed: {str(e)}"
+        )
+
+
+@app.post(
+    "/batch-predict",
+    tags=["Prediction"],
+    openapi_extra=json_body_schema({"type": "array", "items": PredictionRequest.model_json_schema()}),
+)
+async def batch_predict(request: Request):
+    """
+    Generate predictions for multiple patients
+    
+    Args:
+        request: JSON list of PredictionRequest objects
+    
+    Returns:
+        List of predictions
+    """
+    
+    bundle = model_registry.route()
+    if bundle is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded"
+        )
+    
+    body = await receive_body(request)
+    started = time.perf_counter()
+    requests = parse_requests(decode_json_body(request, body), bundle.request_schema, many=True)
+    if metrics is not None:
+        metrics.observe_stage('parse', time.perf_counter() - started)
+    
+    try:
+        predictions = []
+        
+        if requests:
+            # Encode the whole batch as one matrix and score it in a single
+            # native call, off the event loop
+            probabilities, labels = await run_inference(score_requests, requests, bundle, True)
+            
+            for pred, prob in zip(labels.tolist(), probabilities.tolist()):
+                predictions.append(build_batch_prediction(prob, pred))
+        
+        if log_prediction_sampled():
+            logger.info("✓ Batch predictions generated for %d patients", len(requests),
+                        extra={"event": "batch_prediction", "count": len(requests), "model_version": bundle.version})
+        
+        result = {
+            "success": True,
+            "count": len(predictions),
+            "predictions": predictions,
+            "model_version": bundle.version,
+            "timestamp": datetime.now().isoformat()
+        }
+        return json_response(result)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"✗ Batch prediction error: {str(e)}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch prediction failed: {str(e)}"
+        )
+
+
+async def stream_ndjson_predictions(spool, bundle: ModelBundle) -> Any:
+    """
+    Score NDJSON records in fixed-size chunks and yield NDJSON results
+    
+    Each output line carries the 1-based input line number and either the
+    prediction or an error for that record.
+    
+    Args:
+        spool: File object positioned at the start of the NDJSON upload
+        bundle: Model used for the whole stream
+    """
+    async def score_chunk(chunk: List[Tuple[int, bytes]]) -> bytes:
+        results = {}
+        valid = []
+        for line_no, line in chunk:
+            try:
+                valid.append((line_no, bundle.request_schema.model.model_validate_json(line)))
+            except ValidationError as e:
+                results[line_no] = {"line": line_no, "error": format_validation_error(e)}
+        
+        if valid:
+            while True:
+                try:
+                    scored = await run_inference(score_requests_isolated, [r for _, r in valid], bundle)
+                    break
+                except HTTPException as e:
+                    if e.status_code != 429:
+                        scored = [e.detail] * len(valid)
+                        break
+                    # Pool saturated: wait for capacity instead of failing the chunk
+                    await asyncio.sleep(INFERENCE_RETRY_AFTER)
+                except Exception as e:
+                    scored = [e] * len(valid)
+                    break
+            
+            for (line_no, _), result in zip(valid, scored):
+                if isinstance(result, tuple):
+                    results[line_no] = {"line": line_no, **build_batch_prediction(*result)}
+                else:
+                    results[line_no] = {"line": line_no, "error": f"Prediction failed: {result}"}
+        
+        return b"".join(json.dumps(results[line_no]).encode() + b"\n" for line_no, _ in chunk)
+    
+    try:
+        chunk = []
+        for line_no, line in enumerate(spool, start=1):
+            if not line.strip():
+                continue
+            chunk.append((line_no, line))
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield await score_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield await score_chunk(chunk)
+    finally:
+        spool.close()
+
+
+@app.post("/batch-predict/stream", tags=["Prediction"])
+async def batch_predict_stream(request: Request):
+    """
+    Stream predictions for an NDJSON body (one PredictionRequest per line)
+    
+    Records are scored in chunks of STREAM_CHUNK_SIZE and results are
+    streamed back as NDJSON as soon as each chunk is done. Invalid or
+    unscorable records are reported inline instead of failing the batch.
+    
+    Returns:
+        NDJSON stream with one result object per non-empty input line
+    """
+    
+    bundle = model_registry.active
+    if bundle is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded"
+        )
+    
+    # Spool the upload (to disk beyond STREAM_SPOOL_BYTES) so that parsing
+    # and scoring only ever hold one chunk in memory
+    spool = tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_BYTES)
+    async for part in request.stream():
+        spool.write(part)
+    spool.seek(0)
+    
+    logger.info("✓ Streaming batch predictions started")
+    
+    return StreamingResponse(
+        stream_ndjson_predictions(spool, bundle),
+        media_type="application/x-ndjson"
+    )
+
+
+@app.post("/batch-predict/arrow", tags=["Prediction"])
+async def batch_predict_arrow(request: Request, output: Optional[str] = None, id_column: Optional[str] = None):
+    """
+    Score a columnar Arrow IPC stream or Parquet body
+    
+    Columns are named like the model features (FEATURE_ORDER) or the
+    request fields; numeric columns should be numeric Arrow types.
+    
+    Args:
+        request: Body with content type application/vnd.apache.arrow.stream
+            or application/vnd.apache.parquet
+        output: "arrow" or "parquet" (default: the input format)
+        id_column: Input column to copy into the results
+    
+    Returns:
+        Table with prediction, probability, risk_level and label per row
+    """
+    
+    bundle = model_registry.active
+    if bundle is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded"
+        )
+    
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = ARROW_CONTENT_TYPES.get(content_type)
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Content type must be one of: {', '.join(ARROW_CONTENT_TYPES)}"
+        )
+    output = output or fmt
+    if output not in ("arrow", "parquet"):
+        raise HTTPException(
+            status_code=400,
+            detail="output must be arrow or parquet"
+        )
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise HTTPException(
+            status_code=501,
+            detail="Arrow and Parquet bodies require pyarrow on the server"
+        )
+    
+    try:
+        content, count = await run_inference(score_arrow, await request.body(), fmt, output, id_column, bundle)
+        
+        if log_prediction_sampled():
+            logger.info("✓ Arrow batch predictions generated for %d patients", count,
+                        extra={"event": "batch_prediction", "count": count, "model_version": bundle.version})
+        
+        media_type = next(name for name, kind in ARROW_CONTENT_TYPES.items() if kind == output)
+        return Response(content=content, media_type=media_type, headers={"X-Model-Version": bundle.version})
+    
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"✗ Prediction error: {str(e)}")
+        logger.error(f"✗ Arrow batch prediction error: {str(e)}")
         raise HTTPException(
             status_code=400,
-            detail=f"Prediction failed: {str(e)}"
+            detail=f"Batch prediction failed: {str(e)}"
         )
 
 
-@app.post("/batch-predict", tags=["Prediction"])
-async def batch_predict(requests: list[PredictionRequest]):
+@app.post("/what-if", tags=["Prediction"])
+async def what_if(body: WhatIfRequest):
     """
-    Generate predictions for multiple patients
+    Score variants of one patient and compare them with the patient as given
+    
+    The base patient and all variants are encoded as one matrix and scored
+    in a single model call.
     
     Args:
-        requests: List of PredictionRequest objects
+        body: Base patient, explicit variants (changed fields) and/or value
+            grids (one variant per value of a field)
     
     Returns:
-        List of predictions
+        Base prediction and, per variant, its prediction and the change in
+        probability from the base
     """
     
-    if not model_loaded or model is None:
+    bundle = model_registry.active
+    if bundle is None:
         raise HTTPException(
             status_code=503,
             detail="Model not loaded"
         )
     
+    started = time.perf_counter()
+    base, variants = expand_what_if(body, bundle.request_schema)
+    if metrics is not None:
+        metrics.observe_stage('parse', time.perf_counter() - started)
+    
     try:
-        predictions = []
+        rows = [base] + [{**base, **changes} for _, changes in variants]
+        probabilities, predictions = await run_inference(score_requests, rows, bundle)
+        probabilities = probabilities.tolist()
+        predictions = predictions.tolist()
         
-        for request in requests:
-            # Prepare features
-            data_dict = request.model_dump()
-            X = prepare_features(data_dict)
-            
-            # Make prediction (model already knows categorical features from training)
-            pred = model.predict(X)[0]
-            prob = model.predict_proba(X)[0, 1]
-            
-            predictions.append({
-                "prediction": int(pred),
-                "probability": float(prob),
-                "risk_level": get_risk_category(prob),
-                "label": get_progression_label(int(pred))
-            })
+        def outcome(i: int) -> Dict[str, Any]:
+            return {
+                "prediction": predictions[i],
+                "probability": probabilities[i],
+                "risk_level": get_risk_category(probabilities[i]),
+                "label": get_progression_label(predictions[i]),
+            }
         
-        logger.info(f"✓ Batch predictions generated for {len(requests)} patients")
+        results = [
+            {"name": name, "changes": changes, **outcome(i), "delta": probabilities[i] - probabilities[0]}
+            for i, (name, changes) in enumerate(variants, 1)
+        ]
         
-        return {
+        if log_prediction_sampled():
+            logger.info("✓ What-if analysis scored %d variants", len(results),
+                        extra={"event": "what_if", "count": len(results), "model_version": bundle.version})
+        
+        return json_response({
             "success": True,
-            "count": len(predictions),
-            "predictions": predictions,
+            "base": outcome(0),
+            "count": len(results),
+            "variants": results,
+            "model_version": bundle.version,
             "timestamp": datetime.now().isoformat()
-        }
+        })
     
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"✗ Batch prediction error: {str(e)}")
+        logger.error(f"✗ What-if analysis error: {str(e)}")
         raise HTTPException(
             status_code=400,
-            detail=f"Batch prediction failed: {str(e)}"
+            detail=f"What-if analysis failed: {str(e)}"
+        )
+
+
+def resolve_top_k(top_k: Optional[int]) -> int:
+    """top_k query parameter, defaulting to EXPLAIN_TOP_K (0 = all features)"""
+    top_k = EXPLAIN_TOP_K if top_k is None else top_k
+    if top_k < 0:
+        raise HTTPException(
+            status_code=400,
+            detail="top_k must be 0 (all features) or positive"
+        )
+    return top_k
+
+
+@app.post(
+    "/explain",
+    tags=["Explanation"],
+    openapi_extra=json_body_schema(PredictionRequest.model_json_schema()),
+)
+async def explain(request: Request, top_k: Optional[int] = None):
+    """
+    Explain one prediction with SHAP feature contributions
+    
+    Args:
+        request: Patient features in PredictionRequest format (JSON body)
+        top_k: Largest contributors to return (default EXPLAIN_TOP_K, 0 = all)
+    
+    Returns:
+        Prediction, base value and per-feature contributions in log-odds
+    """
+    
+    bundle = model_registry.active
+    if bundle is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded"
+        )
+    top_k = resolve_top_k(top_k)
+    
+    body = await receive_body(request)
+    started = time.perf_counter()
+    patient = parse_requests(decode_json_body(request, body), bundle.request_schema)
+    if metrics is not None:
+        metrics.observe_stage('parse', time.perf_counter() - started)
+    
+    try:
+        explanations = await run_inference(explain_requests, [patient], top_k, bundle)
+        return json_response({
+            "success": True,
+            **explanations[0],
+            "model_version": bundle.version,
+            "timestamp": datetime.now().isoformat()
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"✗ Explanation error: {str(e)}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Explanation failed: {str(e)}"
+        )
+
+
+@app.post(
+    "/batch-explain",
+    tags=["Explanation"],
+    openapi_extra=json_body_schema({"type": "array", "items": PredictionRequest.model_json_schema()}),
+)
+async def batch_explain(request: Request, top_k: Optional[int] = None):
+    """
+    Explain predictions for multiple patients in one SHAP computation
+    
+    Args:
+        request: JSON list of PredictionRequest objects
+        top_k: Largest contributors to return per patient (default
+            EXPLAIN_TOP_K, 0 = all)
+    
+    Returns:
+        List of explanations
+    """
+    
+    bundle = model_registry.active
+    if bundle is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Model not loaded"
+        )
+    top_k = resolve_top_k(top_k)
+    
+    body = await receive_body(request)
+    started = time.perf_counter()
+    requests = parse_requests(decode_json_body(request, body), bundle.request_schema, many=True)
+    if metrics is not None:
+        metrics.observe_stage('parse', time.perf_counter() - started)
+    
+    try:
+        explanations = await run_inference(explain_requests, requests, top_k, bundle) if requests else []
+        
+        if log_prediction_sampled():
+            logger.info("✓ Explanations generated for %d patients", len(explanations),
+                        extra={"event": "batch_explanation", "count": len(explanations), "model_version": bundle.version})
+        
+        return json_response({
+            "success": True,
+            "count": len(explanations),
+            "explanations": explanations,
+            "model_version": bundle.version,
+            "timestamp": datetime.now().isoformat()
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"✗ Batch explanation error: {str(e)}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch explanation failed: {str(e)}"
+        )
+
+
+def require_jobs() -> JobStore:
+    """The job store, or 503 when batch jobs are disabled"""
+    if job_store is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Batch jobs are disabled (JOBS_DB_PATH is not set)"
+        )
+    return job_store
+
+
+@app.post("/jobs", status_code=202, tags=["Jobs"])
+async def submit_job(body: JobRequest):
+    """
+    Queue a batch scoring job
+    
+    Inline records are validated now (422 like /batch-predict) and stored;
+    a file reference is read in chunks while the job runs.
+    
+    Args:
+        body: Either records (list of PredictionRequest objects) or path
+            (file under JOBS_INPUT_DIR), plus an optional id_column
+    
+    Returns:
+        Job status with its ID; poll GET /jobs/{job_id}
+    """
+    store = require_jobs()
+    if (body.records is None) == (body.path is None):
+        raise HTTPException(
+            status_code=400,
+            detail="Provide either records or path"
+        )
+    
+    if body.path is not None:
+        path, fmt = resolve_job_file(body.path)
+        job_id = await asyncio.to_thread(
+            store.create, 'file', JOBS_CHUNK_SIZE, path=path, fmt=fmt, id_column=body.id_column
+        )
+    else:
+        bundle = model_registry.active
+        if bundle is None:
+            raise HTTPException(
+                status_code=503,
+                detail="Model not loaded"
+            )
+        
+        def store_records() -> str:
+            try:
+                validated = bundle.request_schema.batch_adapter.validate_python(body.records)
+            except ValidationError as e:
+                raise_body_validation_error(e, ("records",))
+            lines = []
+            for record, original in zip(validated, body.records):
+                values = dict(record.__dict__)
+                if body.id_column:
+                    values[body.id_column] = original.get(body.id_column)
+                lines.append(json.dumps(values).encode())
+            size = max(1, JOBS_CHUNK_SIZE)
+            chunks = [b"\n".join(lines[i:i + size]) for i in range(0, len(lines), size)]
+            return store.create('records', size, chunks, total=len(lines), id_column=body.id_column)
+        
+        job_id = await asyncio.to_thread(store_records)
+    
+    job_runner.notify()
+    job = store.get(job_id)
+    logger.info(f"✓ Job {job_id} queued ({job['source']}, {job['total'] if job['total'] is not None else '?'} records)")
+    return JSONResponse(describe_job(job), status_code=202, headers={"Location": f"/jobs/{job_id}"})
+
+
+@app.get("/jobs/{job_id}", tags=["Jobs"])
+async def get_job(job_id: str):
+    """Status and progress of a batch job"""
+    job = require_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Job not found: {job_id}"
+        )
+    return describe_job(job)
+
+
+@app.get("/jobs/{job_id}/results", tags=["Jobs"])
+async def get_job_results(job_id: str, follow: bool = False):
+    """
+    Results of a batch job as NDJSON, in input order
+    
+    Args:
+        follow: Keep the response open and stream chunks as they are
+            scored, until the job finishes (default: scored chunks so far)
+    
+    Returns:
+        NDJSON stream with one result object per input record
+    """
+    store = require_jobs()
+    if store.get(job_id) is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Job not found: {job_id}"
+        )
+    
+    async def stream_results() -> Any:
+        cursor = 0
+        while True:
+            # Status first, so chunks saved before the job finished are not missed
+            job = await asyncio.to_thread(store.get, job_id)
+            for chunk, results in await asyncio.to_thread(store.results, job_id, cursor):
+                yield results
+                cursor = chunk + 1
+            if not follow or job is None or job["status"] in JOB_FINISHED:
+                return
+            await asyncio.sleep(0.5)
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@app.post("/jobs/{job_id}/cancel", tags=["Jobs"])
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued or running batch job
+    
+    A running job stops after its current chunk. Results scored so far stay
+    available from GET /jobs/{job_id}/results until the job is deleted.
+    
+    Returns:
+        Job status ("cancelled")
+    """
+    store = require_jobs()
+    if not await asyncio.to_thread(store.cancel, job_id):
+        job = store.get(job_id)
+        if job is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Job not found: {job_id}"
+            )
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job {job_id} has already finished ({job['status']})"
+        )
+    logger.info(f"✓ Job {job_id} cancelled")
+    return describe_job(store.get(job_id))
+
+
+@app.delete("/jobs/{job_id}", tags=["Jobs"])
+async def delete_job(job_id: str):
+    """Cancel a batch job if it is still running and delete it with its results"""
+    if not await asyncio.to_thread(require_jobs().delete, job_id):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Job not found: {job_id}"
+        )
+    logger.info(f"✓ Job {job_id} deleted")
+    return {"success": True, "job_id": job_id, "deleted": True}
+
+
+def require_admin(token: Optional[str]):
+    """
+    Check the X-Admin-Token header against ADMIN_TOKEN
+    
+    Raises:
+        HTTPException: 403 if admin endpoints are disabled, 401 on a bad token
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403,
+            detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)"
+        )
+    if token is None or not secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid admin token"
+        )
+
+
+@app.get("/admin/model", tags=["Admin"])
+async def admin_model(x_admin_token: Optional[str] = Header(None)):
+    """
+    Report the active model and the state of the last reload
+    
+    Returns:
+        Active model version, path and fingerprint, plus reload status, of
+        the worker answering; with MODEL_RELOAD_FILE also the requested
+        model and the state of every worker
+    """
+    require_admin(x_admin_token)
+    return {
+        **model_registry.describe(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.post("/admin/model/reload", status_code=202, tags=["Admin"])
+async def admin_model_reload(
+    body: Optional[ModelReloadRequest] = None,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Load a model in the background and activate it once it passes warm-up
+    
+    Requests keep being served by the current model during the reload and
+    in-flight requests finish on it; poll GET /admin/model for the result.
+    With MODEL_RELOAD_FILE every worker process reloads, each within
+    MODEL_RELOAD_POLL_SECONDS.
+    
+    Args:
+        body: Optional model path and version label
+    
+    Returns:
+        Reload status
+    
+    Raises:
+        HTTPException: 400 if the file does not exist, 409 if a reload is
+            already running
+    """
+    require_admin(x_admin_token)
+    body = body or ModelReloadRequest()
+    path = body.path or MODEL_PATH
+    
+    if not os.path.isfile(path):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Model file not found: {path}"
+        )
+    
+    if not model_registry.request_reload(path, body.version):
+        raise HTTPException(
+            status_code=409,
+            detail="A model reload is already in progress"
+        )
+    
+    logger.info(f"✓ Model reload started from {path}")
+    return {
+        "success": True,
+        "reload": dict(model_registry.last_reload),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.post("/admin/profile", tags=["Admin"])
+async def admin_profile(
+    seconds: float = 10,
+    interval_ms: float = PROFILE_INTERVAL_MS,
+    output: str = "collapsed",
+    include_idle: bool = False,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Sample all threads of this process for a bounded window
+    
+    The response arrives when the window ends. Requests keep being served
+    meanwhile; nothing is sampled outside the window.
+    
+    Args:
+        seconds: Window length (at most PROFILE_MAX_SECONDS)
+        interval_ms: Sampling interval
+        output: "collapsed" (flamegraph.pl / speedscope import), "speedscope"
+            (speedscope JSON) or "summary" (breakdown and top stacks)
+        include_idle: Keep samples of threads blocked waiting for work
+    
+    Returns:
+        Profile; the time breakdown into features, catboost, parsing,
+        framework and other is in the X-Profile-Breakdown header
+    
+    Raises:
+        HTTPException: 400 on bad parameters, 409 if a profile is running
+    """
+    require_admin(x_admin_token)
+    if output not in ("collapsed", "speedscope", "summary"):
+        raise HTTPException(
+            status_code=400,
+            detail="output must be collapsed, speedscope or summary"
+        )
+    if not 0 < seconds <= PROFILE_MAX_SECONDS or not 1 <= interval_ms <= 1000:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS:g}] and interval_ms in [1, 1000]"
+        )
+    if not profile_lock.acquire(blocking=False):
+        raise HTTPException(
+            status_code=409,
+            detail="A profile is already being taken"
         )
+    
+    profiler = SamplingProfiler(interval_ms / 1000.0, include_idle)
+    stop = threading.Event()
+    try:
+        logger.info(f"✓ Profiling for {seconds:g}s every {interval_ms:g} ms")
+        thread = threading.Thread(target=profiler.run, args=(seconds, stop), name="profiler", daemon=True)
+        thread.start()
+        while thread.is_alive():
+            await asyncio.sleep(min(0.1, seconds))
+    finally:
+        # Also ends the window if the client goes away
+        stop.set()
+        profile_lock.release()
+    
+    breakdown = profiler.breakdown()
+    headers = {
+        "X-Profile-Samples": str(profiler.samples),
+        "X-Profile-Breakdown": ",".join(f"{name}={entry['share']:.3f}" for name, entry in breakdown.items()),
+    }
+    logger.info(f"✓ Profile taken: {profiler.samples} samples, breakdown {headers['X-Profile-Breakdown']}")
+    
+    if output == "collapsed":
+        return PlainTextResponse(profiler.collapsed(), headers=headers)
+    if output == "speedscope":
+        return JSONResponse(profiler.speedscope(), headers=headers)
+    top_stacks = sorted(profiler.stacks.items(), key=lambda item: -item[1])[:20]
+    return JSONResponse({
+        "seconds": profiler.duration,
+        "interval_ms": interval_ms,
+        "samples": profiler.samples,
+        "breakdown": breakdown,
+        "top_stacks": [{"stack": ";".join(stack), "samples": count} for stack, count in top_stacks],
+        "timestamp": datetime.now().isoformat()
+    }, headers=headers)
+
+
+# ============================================================================
+# PRELOAD
+# ============================================================================
+
+# Only load here; scoring before fork would start CatBoost threads that
+# forked workers do not inherit
+if PRELOAD_MODEL:
+    load_model()
 
 
 # ============================================================================
@@ -562,6 +4620,10 @@ async def batch_predict(requests: list[PredictionRequest]):
 if __name__ == "__main__":
     import uvicorn
     
+    # Modules that `import main` (bulk_score, for file jobs) get this module
+    # instead of a second copy
+    sys.modules.setdefault('main', sys.modules[__name__])
+    
     # Get port from environment or use default
     port = int(os.getenv("PORT", 8000))
     
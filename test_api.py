@@ -5,6 +5,7 @@ Run this to test the API without needing curl or Postman
 
 import requests
 import json
+import math
 from typing import Dict, Any
 
 # Configuration
@@ -352,9 +353,87 @@ def test_batch_prediction():
         return False
 
 
+def test_stream_prediction():
+    """Test streaming NDJSON batch prediction with an invalid record"""
+    print_header("TEST 6: Streaming Batch Prediction (NDJSON)")
+    
+    lines = [json.dumps(p) for p in (LOW_RISK_PATIENT, HIGH_RISK_PATIENT, MEDIUM_RISK_PATIENT)]
+    lines.append('{"diagnoses_age_at_diagnosis": "not a number"}')
+    
+    try:
+        response = requests.post(
+            f"{API_URL}/batch-predict/stream",
+            data="\n".join(lines) + "\n",
+            headers={"Content-Type": "application/x-ndjson"},
+            stream=True,
+            timeout=10
+        )
+        
+        if response.status_code != 200:
+            print(f"\n✗ Request failed with status {response.status_code}")
+            print(f"  Response: {response.text}")
+            return False
+        
+        results = [json.loads(line) for line in response.iter_lines() if line]
+        
+        print(f"\n✓ Streamed {len(results)} results\n")
+        for result in results:
+            if "error" in result:
+                print(f"    Line {result['line']}: error - {result['error']}")
+            else:
+                print(f"    Line {result['line']}: {result['label']} ({result['probability']:.1%} probability)")
+        
+        if len(results) != len(lines) or "error" not in results[-1]:
+            print(f"\n✗ Expected {len(lines)} results with the last one reported as an error")
+            return False
+        
+        return True
+    except Exception as e:
+        print(f"\n✗ Streaming prediction failed: {str(e)}")
+        return False
+
+
+def test_batch_explanation():
+    """Test SHAP explanations for multiple patients"""
+    print_header("TEST 7: Batch Explanation (Top Contributors)")
+    
+    try:
+        response = requests.post(
+            f"{API_URL}/batch-explain",
+            params={"top_k": 3},
+            json=[LOW_RISK_PATIENT, HIGH_RISK_PATIENT],
+            timeout=10
+        )
+        
+        if response.status_code != 200:
+            print(f"\n✗ Request failed with status {response.status_code}")
+            print(f"  Response: {response.text}")
+            return False
+        
+        result = response.json()
+        
+        print(f"\n✓ Explanations Generated Successfully\n")
+        for i, explanation in enumerate(result['explanations'], 1):
+            print(f"  Patient {i}: {explanation['risk_level']} ({explanation['probability']:.1%} probability)")
+            for contributor in explanation['contributions']:
+                print(f"    {contributor['contribution']:+.3f}  {contributor['feature']} = {contributor['value']}")
+            
+            # Contributions add up to the model's log-odds
+            total = (explanation['base_value'] + explanation['other_contribution']
+                     + sum(c['contribution'] for c in explanation['contributions']))
+            if len(explanation['contributions']) != 3 or abs(1 / (1 + math.exp(-total)) - explanation['probability']) > 1e-6:
+                print(f"\n✗ Expected 3 contributors summing to the probability")
+                return False
+        
+        return True
+    except Exception as e:
+        print(f"\n✗ Batch explanation failed: {str(e)}")
+        return False
+
+
 def test_partial_data():
     """Test prediction with complete data from actual patient example"""
-    print_header("TEST 6: Complete Patient Data (Real-World Example)")
+    print_header("TEST 8: Complete Patient Data (Real-World Example)")
     
     # Use a complete patient record - all fields filled
     complete_patient = {
@@ -451,6 +530,8 @@ def main():
         ("High Risk Prediction", test_high_risk_prediction),
         ("Medium Risk Prediction", test_medium_risk_prediction),
         ("Batch Prediction", test_batch_prediction),
+        ("Streaming Batch Prediction", test_stream_prediction),
+        ("Batch Explanation", test_batch_explanation),
         ("Missing Fields", test_partial_data),
     ]
     
@@ -0,0 +1,116 @@
+"""
+Tests for category normalization across every encoding path
+
+Pins which input spellings are mapped onto the model's training spellings,
+and checks that encode_requests, prepare_features_batch and the flat scorer
+(export_model.py / flat_scorer.py) apply the same mapping.
+
+Run with: python -m pytest test_category_normalization.py
+"""
+
+import numpy as np
+import pytest
+
+import main
+from export_model import export_flat_model
+from flat_scorer import FlatModel
+from test_api import LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT
+
+FIXTURES = [LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT]
+
+# (feature, request value, value the model sees)
+CHANGED = [
+    ('diagnoses.tumor_grade', '3', 'G3'),
+    ('diagnoses.tumor_grade', 'grade 2', 'G2'),
+    ('diagnoses.tumor_grade', ' g1 ', 'G1'),
+    ('demographic.race', 'White', 'white'),
+    ('demographic.race', 'black', 'black or african american'),
+    ('demographic.gender', 'Female', 'female'),
+    ('exposures.tobacco_smoking_status', 'never', 'Lifelong Non-Smoker'),
+    ('demographic.country_of_residence_at_enrollment', 'USA', 'United States'),
+    ('treatments.treatment_type', 'surgery', 'Surgery, NOS'),
+    ('treatments.treatment_type', 'Radiation', 'Radiation Therapy, NOS'),
+    ('treatments.treatment_intent_type', 'palliative', 'Palliative'),
+    ('pathology_details.perineural_invasion_present', 'no', 'No'),
+    ('pathology_details.vascular_invasion_present', 'yes', 'Yes'),
+]
+
+# Known spellings, and values with no known variant, pass through
+UNCHANGED = [
+    ('diagnoses.tumor_grade', 'G2'),
+    ('diagnoses.tumor_grade', 'G7'),
+    ('demographic.race', 'white'),
+    ('cases.primary_site', 'Unknown'),
+    ('diagnoses.morphology', 'infiltrating_ductal_carcinoma'),
+    ('treatments.treatment_type', 'unseen-treatment'),
+]
+
+
+@pytest.fixture(scope='module')
+def bundle():
+    if not main.load_model():
+        pytest.skip("Model file not available")
+    return main.model_registry.active
+
+
+@pytest.fixture(scope='module')
+def flat(bundle):
+    arrays = export_flat_model(bundle)
+    # Round-trip through the .npz representation (strings and JSON meta)
+    return FlatModel({name: np.asarray(value) for name, value in arrays.items()})
+
+
+def request_with(feature: str, value: str) -> dict:
+    return dict(MEDIUM_RISK_PATIENT, **{feature.replace('.', '_'): value})
+
+
+def encoded_value(X: np.ndarray, bundle, feature: str):
+    return X[0, bundle.plan.feature_names.index(feature)]
+
+
+class TestCanonicalSpellings:
+    @pytest.mark.parametrize('feature, value, expected', CHANGED)
+    def test_changed(self, bundle, feature, value, expected):
+        X = main.encode_requests(bundle.plan, [request_with(feature, value)])
+        assert encoded_value(X, bundle, feature) == expected
+
+    @pytest.mark.parametrize('feature, value', UNCHANGED)
+    def test_unchanged(self, bundle, feature, value):
+        X = main.encode_requests(bundle.plan, [request_with(feature, value)])
+        assert encoded_value(X, bundle, feature) == value
+
+    def test_missing_stays_unknown(self, bundle):
+        X = main.encode_requests(bundle.plan, [request_with('demographic.race', '')])
+        assert encoded_value(X, bundle, 'demographic.race') == 'Unknown'
+
+
+class TestParity:
+    def test_prepare_features_batch(self, bundle):
+        rows = FIXTURES + [request_with(feature, value) for feature, value, _ in CHANGED]
+        frame = main.prepare_features_batch(rows)
+        X = main.encode_requests(bundle.plan, rows)
+        for col in sorted(bundle.plan.categories.columns):
+            assert frame.iloc[:, col].tolist() == X[:, col].tolist(), bundle.plan.feature_names[col]
+        expected = bundle.model.predict_proba(main.build_model_input(bundle.plan, X))
+        assert np.array_equal(bundle.model.predict_proba(frame), expected)
+
+    @pytest.mark.parametrize('feature, value, expected', CHANGED)
+    def test_flat_scorer_encoding(self, bundle, flat, feature, value, expected):
+        X = flat.encode_records([request_with(feature, value)])
+        assert encoded_value(X, bundle, feature) == expected
+
+    def test_flat_scorer_scores(self, bundle, flat):
+        rows = FIXTURES + [request_with(feature, value) for feature, value, _ in CHANGED]
+        rows += [request_with(feature, value) for feature, value in UNCHANGED]
+        expected = bundle.model.predict_proba(
+            main.build_model_input(bundle.plan, main.encode_requests(bundle.plan, rows))
+        )[:, 1]
+        np.testing.assert_allclose(flat.score_records(rows), expected, rtol=0, atol=1e-9)
+
+    def test_export_without_normalization(self, bundle, monkeypatch):
+        monkeypatch.setattr(main, 'CATEGORY_NORMALIZATION', False)
+        plan = bundle.plan._replace(categories=main.build_category_normalizer(bundle.model, bundle.plan))
+        flat = FlatModel({name: np.asarray(value) for name, value in export_flat_model(bundle._replace(plan=plan)).items()})
+        assert flat.categories is None
+        X = flat.encode_records([request_with('demographic.race', 'black')])
+        assert encoded_value(X, bundle, 'demographic.race') == 'black'
@@ -0,0 +1,105 @@
+"""
+Tests for worker sizing in gunicorn.conf.py
+
+Run with: python -m pytest test_gunicorn_conf.py
+"""
+
+import importlib.util
+import os
+from unittest import mock
+
+import pytest
+
+CONF_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+
+
+@pytest.fixture
+def conf():
+    """gunicorn.conf.py as a module; the environment it sets at import is restored afterwards"""
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', CONF_PATH)
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch.dict(os.environ):
+        spec.loader.exec_module(module)
+    return module
+
+
+def write_cgroup(root, files):
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return str(root)
+
+
+@pytest.fixture
+def eight_cores():
+    with mock.patch.object(os, 'sched_getaffinity', return_value=set(range(8)), create=True):
+        yield
+
+
+@pytest.mark.usefixtures('eight_cores')
+class TestUsableCpuCount:
+    def test_no_cgroup_uses_affinity(self, conf, tmp_path):
+        assert conf.usable_cpu_count(str(tmp_path)) == 8
+
+    def test_cgroup_v2_without_quota(self, conf, tmp_path):
+        root = write_cgroup(tmp_path, {'cpu.max': 'max 100000\n'})
+        assert conf.usable_cpu_count(root) == 8
+
+    def test_cgroup_v2_quota(self, conf, tmp_path):
+        root = write_cgroup(tmp_path, {'cpu.max': '200000 100000\n'})
+        assert conf.usable_cpu_count(root) == 2
+
+    def test_cgroup_v2_fractional_quota_rounds_down_to_one(self, conf, tmp_path):
+        root = write_cgroup(tmp_path, {'cpu.max': '50000 100000\n'})
+        assert conf.usable_cpu_count(root) == 1
+
+    def test_cgroup_v1_quota(self, conf, tmp_path):
+        root = write_cgroup(tmp_path, {'cpu/cpu.cfs_quota_us': '300000\n', 'cpu/cpu.cfs_period_us': '100000\n'})
+        assert conf.usable_cpu_count(root) == 3
+
+    def test_cgroup_v1_without_quota(self, conf, tmp_path):
+        root = write_cgroup(tmp_path, {'cpu/cpu.cfs_quota_us': '-1\n', 'cpu/cpu.cfs_period_us': '100000\n'})
+        assert conf.usable_cpu_count(root) == 8
+
+    def test_quota_above_affinity_is_capped(self, conf, tmp_path):
+        root = write_cgroup(tmp_path, {'cpu.max': '1600000 100000\n'})
+        assert conf.usable_cpu_count(root) == 8
+
+
+class TestServingLayout:
+    def test_one_worker_per_core(self, conf):
+        assert conf.serving_layout(8, {}) == {'workers': 8, 'INFERENCE_WORKERS': 1, 'MODEL_THREAD_COUNT': 1}
+
+    def test_cores_split_between_fewer_workers(self, conf):
+        layout = conf.serving_layout(8, {'WEB_CONCURRENCY': '2'})
+        assert layout == {'workers': 2, 'INFERENCE_WORKERS': 4, 'MODEL_THREAD_COUNT': 4}
+
+    def test_more_workers_than_cores_keeps_one_thread(self, conf):
+        layout = conf.serving_layout(2, {'WEB_CONCURRENCY': '4'})
+        assert layout == {'workers': 4, 'INFERENCE_WORKERS': 1, 'MODEL_THREAD_COUNT': 1}
+
+    def test_thread_overrides_win(self, conf):
+        layout = conf.serving_layout(8, {'WEB_CONCURRENCY': '2', 'INFERENCE_WORKERS': '3', 'MODEL_THREAD_COUNT': '1'})
+        assert layout == {'workers': 2, 'INFERENCE_WORKERS': 3, 'MODEL_THREAD_COUNT': 1}
+
+    def test_module_applies_layout_to_environment(self, conf):
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '1'}, clear=False):
+            os.environ.pop('INFERENCE_WORKERS', None)
+            os.environ.pop('MODEL_THREAD_COUNT', None)
+            spec = importlib.util.spec_from_file_location('gunicorn_conf_env', CONF_PATH)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            assert module.workers == 1
+            assert os.environ['INFERENCE_WORKERS'] == str(module.cores)
+            assert os.environ['MODEL_THREAD_COUNT'] == str(module.cores)
+            assert os.environ['PRELOAD_MODEL'] == 'true'
+
+    def test_module_gives_each_server_its_own_shared_paths(self, conf):
+        with mock.patch.dict(os.environ, {'METRICS_MULTIPROC_DIR': '/srv/metrics'}, clear=False):
+            os.environ.pop('MODEL_RELOAD_FILE', None)
+            spec = importlib.util.spec_from_file_location('gunicorn_conf_paths', CONF_PATH)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            assert os.environ['MODEL_RELOAD_FILE'].endswith(f'cancer-api-reload-{os.getpid()}.json')
+            assert os.environ['METRICS_MULTIPROC_DIR'] == '/srv/metrics'
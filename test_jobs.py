@@ -0,0 +1,275 @@
+"""
+Tests for the batch job queue (JobStore / JobRunner and the /jobs endpoints)
+
+Each test gets its own SQLite database under tmp_path and a chunk size of a
+few rows, so a handful of records spans several chunks.
+
+Run with: python -m pytest test_jobs.py
+"""
+
+import json
+import time
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from test_api import LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT
+
+CHUNK_SIZE = 3
+JOB_TIMEOUT = 30    # seconds a test waits for a job to finish
+
+
+def make_records(n: int) -> list:
+    """n distinct patients, each tagged with a patient_id"""
+    fixtures = [LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT]
+    return [
+        dict(fixtures[i % len(fixtures)], patient_id=f"p{i}", diagnoses_age_at_diagnosis=15000 + 500 * i)
+        for i in range(n)
+    ]
+
+
+@pytest.fixture(scope='module')
+def bundle():
+    if not main.load_model():
+        pytest.skip("Model file not available")
+    return main.model_registry.active
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'jobs.sqlite3')
+
+
+@pytest.fixture
+def store(bundle, db_path, monkeypatch):
+    """Job store installed as the API's; no runner threads are started"""
+    monkeypatch.setattr(main, 'JOBS_CHUNK_SIZE', CHUNK_SIZE)
+    store = main.JobStore(db_path)
+    monkeypatch.setattr(main, 'job_store', store)
+    monkeypatch.setattr(main, 'job_runner', main.JobRunner(store, 1))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def runner(store, monkeypatch):
+    """Started job runner for the store"""
+    runner = main.JobRunner(store, 1)
+    monkeypatch.setattr(main, 'job_runner', runner)
+    runner.start()
+    yield runner
+    runner.stop()
+
+
+@pytest.fixture
+def client():
+    # No context manager: the startup hook (model pools, job threads) is not run
+    return TestClient(main.app)
+
+
+def submit(client, records) -> str:
+    response = client.post('/jobs', json={"records": records, "id_column": "patient_id"})
+    assert response.status_code == 202, response.text
+    return response.json()["job_id"]
+
+
+def wait_until_finished(client, job_id: str) -> dict:
+    deadline = time.monotonic() + JOB_TIMEOUT
+    while time.monotonic() < deadline:
+        job = client.get(f'/jobs/{job_id}').json()
+        if job["status"] in main.JOB_FINISHED:
+            return job
+        time.sleep(0.05)
+    pytest.fail(f"Job {job_id} did not finish within {JOB_TIMEOUT}s")
+
+
+def read_results(client, job_id: str) -> list:
+    response = client.get(f'/jobs/{job_id}/results')
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def run_first_chunk_then(store, job_id: str, after_first_chunk):
+    """
+    Run a claimed job in this thread, calling after_first_chunk() once its
+    first chunk is saved (stop the runner, cancel the job, ...)
+    """
+    runner = main.JobRunner(store, 1)
+    save_chunk = store.save_chunk
+
+    def save_and_interrupt(*args, **kwargs):
+        saved = save_chunk(*args, **kwargs)
+        if args[1] == 0:
+            after_first_chunk(runner)
+        return saved
+
+    store.save_chunk = save_and_interrupt
+    try:
+        job = store.claim()
+        assert job["id"] == job_id
+        runner._run(job)
+    finally:
+        store.save_chunk = save_chunk
+
+
+class TestInlineJobs:
+    def test_submit_and_poll_until_succeeded(self, client, runner):
+        records = make_records(7)
+        job_id = submit(client, records)
+
+        job = wait_until_finished(client, job_id)
+        assert job["status"] == 'succeeded'
+        assert job["total"] == job["processed"] == 7
+        assert job["failed"] == 0
+        assert job["progress"] == 1.0
+        assert job["model_version"] == main.model_registry.active.version
+
+    def test_results_in_input_order(self, client, runner, bundle):
+        records = make_records(8)
+        job_id = submit(client, records)
+        wait_until_finished(client, job_id)
+
+        results = read_results(client, job_id)
+        assert [line["row"] for line in results] == list(range(8))
+        assert [line["patient_id"] for line in results] == [record["patient_id"] for record in records]
+        expected = main.score_requests_isolated(records, bundle)
+        assert [line["probability"] for line in results] == [probability for probability, _ in expected]
+
+    def test_invalid_records_rejected_at_submit(self, client, store):
+        response = client.post('/jobs', json={"records": [{"diagnoses_age_at_diagnosis": "old"}]})
+        assert response.status_code == 422
+        assert store.counts() == {}
+
+    def test_records_or_path_required(self, client, store):
+        assert client.post('/jobs', json={}).status_code == 400
+
+    def test_disabled_without_database(self, client, monkeypatch):
+        monkeypatch.setattr(main, 'job_store', None)
+        assert client.post('/jobs', json={"records": make_records(1)}).status_code == 503
+
+
+class TestResume:
+    def test_restart_resumes_without_duplicates(self, client, store, db_path, monkeypatch):
+        records = make_records(8)
+        job_id = submit(client, records)
+
+        # Stop the runner once the first chunk is saved: the job goes back to the queue
+        run_first_chunk_then(store, job_id, lambda runner: runner.stopping.set())
+        job = store.get(job_id)
+        assert job["status"] == 'queued'
+        assert (job["next_chunk"], job["processed"]) == (1, CHUNK_SIZE)
+
+        # "Restart": a new store on the same database and a new runner
+        store.close()
+        restarted = main.JobStore(db_path)
+        monkeypatch.setattr(main, 'job_store', restarted)
+        runner = main.JobRunner(restarted, 1)
+        runner.start()
+        try:
+            job = wait_until_finished(client, job_id)
+        finally:
+            runner.stop()
+
+        assert job["status"] == 'succeeded'
+        assert job["processed"] == 8
+        results = read_results(client, job_id)
+        assert [line["row"] for line in results] == list(range(8))
+        assert [line["patient_id"] for line in results] == [record["patient_id"] for record in records]
+        restarted.close()
+
+    def test_expired_lease_taken_over(self, client, store, db_path, monkeypatch):
+        job_id = submit(client, make_records(4))
+        monkeypatch.setattr(main, 'JOBS_LEASE_SECONDS', 0.0)
+        assert store.claim()["id"] == job_id
+
+        # The first owner went silent; another process claims the job
+        other = main.JobStore(db_path)
+        try:
+            time.sleep(0.01)
+            taken = other.claim()
+            assert taken["id"] == job_id
+            assert taken["next_chunk"] == 0
+            assert other.save_chunk(job_id, 0, b"", CHUNK_SIZE, 0, "v") is True
+            # The old owner's save of the same chunk is rejected: no duplicate rows
+            assert store.save_chunk(job_id, 0, b"", CHUNK_SIZE, 0, "v") is False
+        finally:
+            other.close()
+        assert store.get(job_id)["processed"] == CHUNK_SIZE
+
+    def test_live_lease_not_taken_over(self, client, store, db_path):
+        job_id = submit(client, make_records(4))
+        assert store.claim()["id"] == job_id
+        other = main.JobStore(db_path)
+        try:
+            assert other.claim() is None
+        finally:
+            other.close()
+
+
+class TestCancel:
+    def test_cancel_running_job(self, client, store):
+        job_id = submit(client, make_records(8))
+        responses = []
+        run_first_chunk_then(store, job_id, lambda runner: responses.append(client.post(f'/jobs/{job_id}/cancel')))
+
+        assert responses[0].status_code == 200
+        assert responses[0].json()["status"] == 'cancelled'
+        job = client.get(f'/jobs/{job_id}').json()
+        assert job["status"] == 'cancelled'
+        assert job["processed"] == CHUNK_SIZE
+        # Results scored before the cancel stay available
+        assert [line["row"] for line in read_results(client, job_id)] == list(range(CHUNK_SIZE))
+
+    def test_cancel_queued_job(self, client, store):
+        job_id = submit(client, make_records(2))
+        assert client.post(f'/jobs/{job_id}/cancel').json()["status"] == 'cancelled'
+        assert store.claim() is None
+
+    def test_cancel_finished_job_conflicts(self, client, runner):
+        job_id = submit(client, make_records(2))
+        wait_until_finished(client, job_id)
+        assert client.post(f'/jobs/{job_id}/cancel').status_code == 409
+
+    def test_cancel_unknown_job(self, client, store):
+        assert client.post('/jobs/0123456789abcdef/cancel').status_code == 404
+
+
+class TestFileJobs:
+    @pytest.fixture
+    def input_dir(self, tmp_path, monkeypatch):
+        root = tmp_path / 'inputs'
+        root.mkdir()
+        monkeypatch.setattr(main, 'JOBS_INPUT_DIR', str(root))
+        return root
+
+    def test_csv_job(self, client, runner, input_dir):
+        records = make_records(7)
+        pd.DataFrame(records).to_csv(input_dir / 'cohort.csv', index=False)
+        response = client.post('/jobs', json={"path": "cohort.csv", "id_column": "patient_id"})
+        assert response.status_code == 202, response.text
+        job_id = response.json()["job_id"]
+
+        job = wait_until_finished(client, job_id)
+        assert job["status"] == 'succeeded'
+        assert job["total"] == 7
+        results = read_results(client, job_id)
+        assert [line["patient_id"] for line in results] == [record["patient_id"] for record in records]
+        assert not any("error" in line for line in results)
+
+    @pytest.mark.parametrize('path', ['../secret.csv', 'nested/../../secret.csv', '/etc/passwd'])
+    def test_paths_outside_input_dir_rejected(self, client, store, input_dir, path):
+        (input_dir.parent / 'secret.csv').write_text("a\n1\n")
+        response = client.post('/jobs', json={"path": path})
+        assert response.status_code == 400
+        assert store.counts() == {}
+
+    def test_missing_file_rejected(self, client, store, input_dir):
+        assert client.post('/jobs', json={"path": "absent.csv"}).status_code == 400
+
+    def test_disabled_without_input_dir(self, client, store, monkeypatch):
+        monkeypatch.setattr(main, 'JOBS_INPUT_DIR', '')
+        response = client.post('/jobs', json={"path": "cohort.csv"})
+        assert response.status_code == 400
+        assert "JOBS_INPUT_DIR" in response.json()["detail"]
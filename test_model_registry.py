@@ -0,0 +1,186 @@
+"""
+Tests for model hot-swap (ModelRegistry) and the MODEL_RELOAD_FILE fan-out
+
+The replacement model is the production model cut to half its trees, so it
+has its own fingerprint and gives different scores.
+
+Run with: python -m pytest test_model_registry.py
+"""
+
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from test_api import LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT
+
+FIXTURES = [LOW_RISK_PATIENT, MEDIUM_RISK_PATIENT, HIGH_RISK_PATIENT]
+RELOAD_TIMEOUT = 30     # seconds a test waits for a reload
+ADMIN_TOKEN = 'test-token'
+
+
+@pytest.fixture(scope='module')
+def original():
+    if not main.load_model():
+        pytest.skip("Model file not available")
+    bundle = main.model_registry.active
+    yield bundle
+    # Later tests see the production model again
+    main.model_registry.activate(bundle)
+
+
+@pytest.fixture(scope='module')
+def replacement_path(original, tmp_path_factory):
+    model = original.model.copy()
+    model.shrink(ntree_end=model.tree_count_ // 2)
+    path = str(tmp_path_factory.mktemp('models') / 'half.cbm')
+    model.save_model(path)
+    return path
+
+
+@pytest.fixture
+def registry(original, monkeypatch):
+    """Fresh registry serving the original model, installed as the API's"""
+    registry = main.ModelRegistry()
+    registry.activate(original)
+    monkeypatch.setattr(main, 'model_registry', registry)
+    yield registry
+    registry.stop_watching()
+
+
+@pytest.fixture
+def reload_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'model-reload.json')
+    monkeypatch.setattr(main, 'MODEL_RELOAD_FILE', path)
+    monkeypatch.setattr(main, 'MODEL_RELOAD_POLL_SECONDS', 0.05)
+    return path
+
+
+def wait_until(condition, what: str):
+    deadline = time.monotonic() + RELOAD_TIMEOUT
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail(f"Timed out waiting for {what}")
+        time.sleep(0.02)
+
+
+def wait_for_reload(registry) -> dict:
+    wait_until(lambda: registry.last_reload["status"] != 'loading' and not registry.reload_lock.locked(),
+               "the reload to finish")
+    return registry.last_reload
+
+
+def score(bundle) -> list:
+    X = main.encode_requests(bundle.plan, FIXTURES)
+    return main.score_encoded(X, bundle)[0].tolist()
+
+
+class TestReload:
+    def test_reload_activates_new_model(self, registry, original, replacement_path):
+        assert registry.start_reload(replacement_path, 'v2')
+        reload = wait_for_reload(registry)
+
+        assert reload["status"] == 'succeeded'
+        assert reload["previous_version"] == original.version
+        assert registry.active.version == 'v2'
+        assert registry.active.fingerprint != original.fingerprint
+        assert registry.active.path == replacement_path
+        assert main.model_version == 'v2'
+
+    def test_failed_reload_keeps_active_model(self, registry, original, tmp_path):
+        bad = tmp_path / 'bad.cbm'
+        bad.write_bytes(b"not a catboost model")
+        assert registry.start_reload(str(bad), 'broken')
+        reload = wait_for_reload(registry)
+
+        assert reload["status"] == 'failed'
+        assert reload["error"]
+        assert registry.active is original
+        assert score(registry.active) == score(original)
+
+    def test_concurrent_reload_refused(self, registry, replacement_path):
+        assert registry.reload_lock.acquire(blocking=False)
+        try:
+            assert not registry.start_reload(replacement_path, 'v2')
+        finally:
+            registry.reload_lock.release()
+
+    def test_swap_clears_prediction_cache(self, registry, original, replacement_path):
+        if main.prediction_cache is None:
+            pytest.skip("Prediction cache disabled")
+        before = score(original)
+        assert main.prediction_cache.stats()["size"] > 0
+
+        registry.activate(main.load_bundle(replacement_path, 'v2'))
+        assert main.prediction_cache.stats()["size"] == 0
+        after = score(registry.active)
+        assert after != before
+
+    def test_in_flight_request_finishes_on_its_bundle(self, registry, original, replacement_path):
+        # A handler reads `active` once, then the model is swapped under it
+        bundle = registry.active
+        expected = score(original)
+        registry.activate(main.load_bundle(replacement_path, 'v2'))
+
+        assert registry.active is not bundle
+        assert score(bundle) == expected
+        assert score(registry.active) != expected
+
+    def test_admin_endpoint(self, registry, original, replacement_path, monkeypatch):
+        monkeypatch.setattr(main, 'ADMIN_TOKEN', ADMIN_TOKEN)
+        client = TestClient(main.app)
+        headers = {"X-Admin-Token": ADMIN_TOKEN}
+
+        missing = client.post('/admin/model/reload', json={"path": replacement_path + '.missing'}, headers=headers)
+        assert missing.status_code == 400
+        response = client.post('/admin/model/reload', json={"path": replacement_path, "version": "v2"}, headers=headers)
+        assert response.status_code == 202
+        wait_for_reload(registry)
+
+        described = client.get('/admin/model', headers=headers).json()
+        assert described["active"]["version"] == 'v2'
+        assert described["active"]["fingerprint"] != original.fingerprint
+        assert described["reload"]["status"] == 'succeeded'
+
+
+class TestReloadFanOut:
+    def test_other_worker_applies_requested_model(self, registry, original, replacement_path, reload_file):
+        other = main.ModelRegistry()
+        other.activate(original)
+
+        assert registry.request_reload(replacement_path, 'v2')
+        wait_for_reload(registry)
+        assert main.read_json_file(reload_file)["path"] == replacement_path
+
+        # A worker started after the reload serves the reloaded model
+        other.apply_requested_model()
+        assert other.active.version == 'v2'
+        assert other.active.fingerprint == registry.active.fingerprint
+        assert other.applied_request == registry.applied_request
+
+    def test_watcher_follows_reload_requests(self, registry, original, replacement_path, reload_file):
+        other = main.ModelRegistry()
+        other.activate(original)
+        other.start_watching()
+        try:
+            assert registry.request_reload(replacement_path, 'v2')
+            wait_until(lambda: other.active.version == 'v2', "the watching registry to reload")
+            assert other.active.fingerprint != original.fingerprint
+
+            # Each watching worker publishes its state for GET /admin/model
+            wait_until(lambda: [state["active"]["version"] for state in registry.worker_states()] == ['v2'],
+                       "the watching registry to publish its state")
+        finally:
+            other.stop_watching()
+
+    def test_no_request_keeps_model(self, registry, original, reload_file):
+        registry.apply_requested_model()
+        assert registry.active is original
+        assert registry.applied_request is None
+
+    def test_unloadable_request_keeps_model(self, registry, original, reload_file, tmp_path):
+        main.write_json_atomic(reload_file, {"id": "abc", "path": str(tmp_path / 'absent.cbm'), "version": "v3"})
+        registry.apply_requested_model()
+        assert registry.active is original
+        assert registry.applied_request is None